@@ -0,0 +1,284 @@
+# نقطه ورود ASGI برای production:
+#   gunicorn -c gunicorn.conf.py asgi:app
+#
+# مسیرهای /، /search، /search/batch، /suggest، /api/status و /health مستقیم و با asyncio
+# پاسخ داده می‌شوند؛ بقیه مسیرها (stream، metrics و درخواست‌های پروفایل) به همان اپ
+# Flask از طریق WSGIMiddleware در thread pool سپرده می‌شوند.
+import asyncio
+import json
+import time
+import urllib.parse
+
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+import async_search
+import metrics
+import settings
+from finder_price import (SOURCES, app as flask_app, build_price_report, note_search, price_finder,
+                          status_payload, typeahead)
+from log_setup import get_logger
+from query_utils import normalize_persian
+from tracing import trace
+
+logger = get_logger('asgi')
+
+wsgi_app = WSGIMiddleware(flask_app, workers=settings.ASGI_WSGI_THREADS)
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type,Authorization'),
+    (b'access-control-allow-methods', b'GET,PUT,POST,DELETE,OPTIONS'),
+]
+
+_index_html = None
+
+
+async def _send_response(send, status, body, content_type, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode()),
+                    (b'content-length', str(len(body)).encode())] + list(headers) + CORS_HEADERS,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_json(send, payload, status=200, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await _send_response(send, status, body, 'application/json; charset=utf-8', headers)
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def _header(scope, name):
+    name = name.lower().encode()
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _debug_flag(scope, name):
+    """همان قاعده finder_price._debug_flag"""
+    if _header(scope, f'X-Debug-{name.title()}') == '1':
+        return True
+    query = urllib.parse.parse_qs(scope.get('query_string', b'').decode())
+    return query.get(name, [None])[0] == '1'
+
+
+async def index(scope, receive, send):
+    global _index_html
+    if _index_html is None:
+        from flask import render_template
+        with flask_app.app_context():
+            _index_html = render_template('index.html').encode('utf-8')
+    await _send_response(send, 200, _index_html, 'text/html; charset=utf-8')
+
+
+async def search(scope, receive, send):
+    """نسخه async از finder_price.search_products با همان ورودی و خروجی"""
+    started = time.perf_counter()
+    try:
+        try:
+            data = json.loads(await _read_body(receive) or b'null')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or 'product_name' not in data:
+            await _send_json(send, {"success": False, "message": "product_name is required"}, 400)
+            return
+
+        product_name = normalize_persian(data['product_name'])
+        logger.info("🔍 جستجو برای: %s", product_name)
+        note_search(product_name)
+
+        root = None
+        if _debug_flag(scope, 'trace'):
+            with trace('search', product_name=product_name) as root:
+                response_data = await _search_report(product_name, data)
+        else:
+            response_data = await _search_report(product_name, data)
+
+        if root is not None:
+            response_data["trace"] = root.to_dict()
+        await _send_json(send, response_data)
+
+    except Exception as e:
+        logger.exception("❌ خطا در جستجو: %s", e)
+        await _send_json(send, {"success": False, "message": f"خطا در جستجو: {str(e)}"}, 500)
+    finally:
+        metrics.SEARCH_LATENCY.labels('search').observe(time.perf_counter() - started)
+
+
+async def _search_report(product_name, data):
+    results_by_shop, results_breakdown = await async_search.search_all_sources(
+        price_finder, product_name, SOURCES)
+    for shop, info in results_breakdown.items():
+        logger.info("✅ %s: %s محصول (%s, %sms)", shop, info['count'], info['status'], info['elapsed_ms'])
+    return build_price_report(product_name, results_by_shop, results_breakdown,
+                              data.get('calculated_price'), data.get('strategy', 'balanced'))
+
+
+async def _iter_ndjson_items(receive):
+    """آیتم‌های بدنه NDJSON به محض رسیدن هر خط (بدون خواندن کل بدنه)"""
+    buffer = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get('more_body', False)
+        buffer += message.get('body', b'')
+        lines = buffer.split(b'\n')
+        buffer = b'' if not more_body else lines.pop()
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+async def _iter_list(items):
+    for item in items:
+        yield item
+
+
+async def _price_batch_item(index, item):
+    """معادل finder_price._safe_price_batch_item"""
+    try:
+        if not isinstance(item, dict) or not item.get('product_name'):
+            report = {"success": False, "message": "product_name is required"}
+        else:
+            report = await _search_report(normalize_persian(item['product_name']), item)
+    except Exception as e:
+        logger.exception("❌ خطا در آیتم %s: %s", index, e)
+        report = {"success": False, "message": f"خطا در جستجو: {str(e)}"}
+    return dict(report, index=index)
+
+
+async def _iter_batch_reports(items, max_concurrency):
+    """
+    معادل finder_price.iter_batch_reports: حداکثر max_concurrency آیتم همزمان و
+    گزارش هر آیتم به محض آماده شدن؛ با بسته شدن generator آیتم‌های باقیمانده لغو می‌شوند.
+    """
+    in_flight = set()
+    index = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(in_flight) < max_concurrency:
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                in_flight.add(asyncio.ensure_future(_price_batch_item(index, item)))
+                index += 1
+
+            if not in_flight:
+                return
+
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+async def search_batch(scope, receive, send):
+    """
+    نسخه async از finder_price.search_batch: ورودی NDJSON خط به خط خوانده و هر گزارش
+    به محض آماده شدن فرستاده می‌شود، پس حافظه به اندازه آیتم‌های در حال پردازش است.
+    """
+    content_type = (_header(scope, 'content-type') or '').split(';')[0].strip().lower()
+    if content_type == 'application/x-ndjson':
+        items = _iter_ndjson_items(receive)
+    else:
+        try:
+            data = json.loads(await _read_body(receive) or b'null')
+        except ValueError:
+            data = None
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            await _send_json(send, {"success": False, "message": "a list of items is required"}, 400)
+            return
+        items = _iter_list(items)
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson')] + CORS_HEADERS,
+    })
+    reports = _iter_batch_reports(items, settings.BATCH_MAX_CONCURRENCY)
+    try:
+        async for report in reports:
+            line = json.dumps(report, ensure_ascii=False) + '\n'
+            await send({'type': 'http.response.body', 'body': line.encode('utf-8'), 'more_body': True})
+    finally:
+        await reports.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def api_status(scope, receive, send):
+    payload = status_payload()
+    payload["server"] = "asgi"
+    await _send_json(send, payload)
+
+
+async def suggest(scope, receive, send):
+    """نسخه async از finder_price.suggest"""
+    if typeahead is None:
+        await _send_json(send, {"success": False, "message": "پیشنهاد خودکار غیرفعال است"}, 404)
+        return
+    query = urllib.parse.parse_qs(scope.get('query_string', b'').decode()).get('q', [''])[0]
+    payload = await typeahead.suggest_async(query, async_search.torob.suggestion)
+    await _send_json(send, payload, headers=[
+        (b'cache-control', f"private, max-age={settings.SUGGEST_BROWSER_CACHE}".encode())])
+
+
+async def health(scope, receive, send):
+    await _send_json(send, {"status": "ok"})
+
+
+ROUTES = {
+    ('GET', '/'): index,
+    ('POST', '/search'): search,
+    ('POST', '/search/batch'): search_batch,
+    ('GET', '/api/status'): api_status,
+    ('GET', '/suggest'): suggest,
+    ('GET', '/health'): health,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_search.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    handler = ROUTES.get((scope['method'], scope['path']))
+    # پروفایل نمونه‌برداری روی threadهاست؛ این درخواست‌ها در مسیر Flask اجرا می‌شوند
+    if handler is None or (handler is search and _debug_flag(scope, 'profile')):
+        await wsgi_app(scope, receive, send)
+        return
+    await handler(scope, receive, send)
@@ -0,0 +1,346 @@
+# مسیر asyncio جستجو برای حالت ASGI: همان tierها، parserها و fallbackهای PriceFinder
+# ولی درخواست‌های بیرونی با aiohttp، تا یک worker صدها جستجوی در انتظار upstream را نگه دارد.
+import asyncio
+import json
+import time
+import urllib.parse
+
+import aiohttp
+
+import settings
+from circuit_breaker import CircuitOpenError, get_breaker
+from finder_price import TorobCandidates, failed_source_info, source_info
+from hedging import LatencyTracker
+from http_client import is_failure_status
+from log_setup import get_logger
+from metrics import observe
+from price_history import records
+from query_utils import normalize_query
+from rate_limit import RateLimitedError, acquire_async, wait_scope
+from result_cache import result_cache
+from singleflight import flights
+from torob_integration.async_api import AsyncTorob
+from tracing import annotate, bind, span, traced
+
+logger = get_logger('async_search')
+
+
+class AsyncFetcher:
+    """GET با aiohttp از طریق circuit breaker هر endpoint (معادل http_client.get)"""
+
+    def __init__(self):
+        self._session = None
+
+    def _get_session(self):
+        # session باید داخل event loop جاری ساخته شود
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.ASYNC_HTTP_LIMIT,
+                limit_per_host=settings.HTTP_POOL_MAXSIZE,
+                ttl_dns_cache=300,
+                ssl=False,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def get(self, url, endpoint, headers, timeout=15):
+        """(status, body متنی)"""
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(endpoint)
+
+        # aiohttp بدون پکیج brotli پاسخ br را باز نمی‌کند؛ Accept-Encoding پیش‌فرض خودش استفاده می‌شود
+        headers = {k: v for k, v in headers.items() if k.lower() != 'accept-encoding'}
+        host = urllib.parse.urlsplit(url).netloc
+        with span('http', endpoint=endpoint, host=host):
+            try:
+                await acquire_async(host, timeout)
+            except BaseException:
+                breaker.release()
+                raise
+            started = time.monotonic()
+            try:
+                async with self._get_session().get(
+                        url, headers=headers,
+                        timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    body = await response.text()
+            except BaseException:
+                breaker.record(False, time.monotonic() - started)
+                raise
+            breaker.record(not is_failure_status(response.status), time.monotonic() - started)
+            annotate(status=response.status)
+            return response.status, body
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+fetcher = AsyncFetcher()
+torob = AsyncTorob()
+basalam_primary_latency = LatencyTracker(
+    settings.BASALAM_HEDGE_DELAY,
+    percentile=settings.BASALAM_HEDGE_PERCENTILE,
+    minimum=settings.BASALAM_HEDGE_MIN_DELAY,
+    maximum=settings.BASALAM_HEDGE_MAX_DELAY,
+)
+
+
+def _decode_json(body):
+    with span('json_decode', bytes=len(body)):
+        return json.loads(body)
+
+
+async def _parse_html(parse, *args):
+    """parse HTML (کار CPU) در thread pool تا event loop بلوکه نشود"""
+    return await asyncio.get_running_loop().run_in_executor(None, bind(parse), *args)
+
+
+async def close():
+    await fetcher.close()
+    await torob.close()
+
+
+# --- دیجی‌کالا ---
+
+@observe('digikala_api_search')
+@traced('digikala_api_search')
+async def digikala_api_search(finder, product_name):
+    try:
+        api_url, headers = finder.digikala_api_request(product_name)
+        status, body = await fetcher.get(api_url, 'digikala_api', headers)
+        if status == 200:
+            return finder.parse_digikala_api(_decode_json(body))
+        return []
+    except Exception as e:
+        logger.warning("❌ خطا در API دیجی‌کالا: %s", e)
+        return []
+
+
+@observe('digikala_web_scraping')
+@traced('digikala_web_scraping')
+async def digikala_web_scraping(finder, product_name):
+    try:
+        search_url, headers = finder.digikala_web_request(product_name)
+        status, body = await fetcher.get(search_url, 'digikala_web', headers)
+        if status == 200:
+            return await _parse_html(finder.parse_digikala_web, body)
+        return []
+    except Exception as e:
+        logger.warning("❌ خطا در وب اسکرپینگ دیجی‌کالا: %s", e)
+        return []
+
+
+@records('digikala')
+async def search_digikala(finder, product_name):
+    try:
+        results = await digikala_api_search(finder, product_name)
+        if results:
+            return results
+
+        results = await digikala_web_scraping(finder, product_name)
+        if results:
+            return results
+
+        logger.warning("⚠️ همه روش‌های جستجو در دیجی‌کالا شکست خوردند")
+        return finder.digikala_fallback(product_name)
+    except Exception as e:
+        logger.warning("❌ خطا در جستجوی دیجی‌کالا: %s", e)
+        return finder.digikala_fallback(product_name)
+
+
+# --- ترب ---
+
+@records('torob')
+@traced('search_torob')
+async def search_torob(finder, product_name):
+    try:
+        picker = TorobCandidates(product_name)
+        with span('torob.search'):
+            products = torob.search_pages(product_name)
+            try:
+                async for product in products:
+                    if picker.add(product):
+                        break
+            finally:
+                await products.aclose()
+        candidates = picker.result()
+        if candidates is None:
+            return finder.torob_fallback(product_name)
+
+        with_search_id = [p for p in candidates if p.get('search_id')]
+        details_list = []
+        if with_search_id:
+            with span('torob.details_many'):
+                details_list = await torob.details_many(
+                    [p['prk'] for p in with_search_id],
+                    [p['search_id'] for p in with_search_id],
+                )
+        details_by_prk = {p['prk']: d for p, d in zip(with_search_id, details_list)}
+
+        return finder.build_torob_results(product_name, candidates, details_by_prk)
+    except Exception as e:
+        logger.warning("❌ خطا کلی: %s", e)
+        return finder.torob_fallback(product_name)
+
+
+# --- باسلام ---
+
+@observe('basalam_primary_search')
+@traced('basalam_primary_search')
+async def basalam_primary_search(finder, product_name):
+    try:
+        primary_url, headers = finder.basalam_primary_request(product_name)
+        status, body = await fetcher.get(primary_url, 'basalam_primary', headers)
+        if status == 200:
+            return finder.parse_basalam_primary(_decode_json(body))
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError, RateLimitedError) as e:
+        logger.warning("❌ Error during Primary API request: %s", e)
+    except json.JSONDecodeError as e:
+        logger.warning("❌ Error decoding JSON from Primary API: %s", e)
+    return []
+
+
+@observe('basalam_alternative_search')
+@traced('basalam_alternative_search')
+async def basalam_alternative_search(finder, product_name):
+    try:
+        status, body = await fetcher.get(finder.basalam_alternative_url(product_name),
+                                         'basalam_alternative', finder.headers)
+        if status == 200:
+            return finder.parse_basalam_alternative(_decode_json(body))
+    except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError, RateLimitedError) as e:
+        logger.warning("❌ Error during Alternative API request: %s", e)
+    except json.JSONDecodeError as e:
+        logger.warning("❌ Error decoding JSON from Alternative API: %s", e)
+    return []
+
+
+@observe('basalam_web_scraping')
+@traced('basalam_web_scraping')
+async def basalam_web_scraping(finder, product_name):
+    try:
+        status, body = await fetcher.get(finder.basalam_scrape_url(product_name),
+                                         'basalam_scrape', finder.headers)
+        if status == 200:
+            return await _parse_html(finder.parse_basalam_scrape, product_name, body)
+    except Exception as e:
+        logger.warning("❌ Error during web scraping: %s", e)
+    return []
+
+
+async def basalam_hedged_search(finder, product_name):
+    """
+    مثل PriceFinder.basalam_hedged_search؛ اینجا درخواست بازنده واقعاً لغو می‌شود.
+    """
+    async def timed_primary():
+        started = time.monotonic()
+        try:
+            return await basalam_primary_search(finder, product_name)
+        finally:
+            basalam_primary_latency.add(time.monotonic() - started)
+
+    pending = {asyncio.ensure_future(timed_primary())}
+    alternative_started = False
+    delay = basalam_primary_latency.hedge_delay()
+
+    try:
+        while pending:
+            timeout = None if alternative_started else delay
+            done, pending = await asyncio.wait(pending, timeout=timeout,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    results = task.result()
+                except Exception as e:
+                    logger.warning("❌ خطا در tier باسلام: %s", e)
+                    results = []
+                if results:
+                    return results
+
+            if not alternative_started:
+                pending.add(asyncio.ensure_future(basalam_alternative_search(finder, product_name)))
+                alternative_started = True
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return await basalam_web_scraping(finder, product_name)
+
+
+@records('basalam')
+async def search_basalam(finder, product_name):
+    try:
+        if settings.BASALAM_HEDGE:
+            results = await basalam_hedged_search(finder, product_name)
+        else:
+            results = (await basalam_primary_search(finder, product_name)
+                       or await basalam_alternative_search(finder, product_name)
+                       or await basalam_web_scraping(finder, product_name))
+        if results:
+            return results
+        return finder.basalam_fallback(product_name)
+    except Exception as e:
+        logger.warning("❌ خطا کلی در باسلام: %s", e)
+        return finder.basalam_fallback(product_name)
+
+
+# --- fan-out ---
+
+SEARCHES = {
+    'search_digikala': search_digikala,
+    'search_torob': search_torob,
+    'search_basalam': search_basalam,
+}
+
+
+async def _timed_search(finder, method, product_name, deadline=None):
+    """معادل finder_price._timed_search: از طریق cache و single-flight"""
+    search = SEARCHES[method]
+    coalesced_key = (method[len('search_'):], normalize_query(product_name))
+
+    async def fetch():
+        return await flights.do_async(coalesced_key, lambda: search(finder, product_name)) or []
+
+    started = time.monotonic()
+    with span('source', source=method) as current, wait_scope(deadline) as waits:
+        if result_cache is not None:
+            results, cache_meta = await result_cache.get_or_fetch_async(method, product_name, fetch)
+        else:
+            results, cache_meta = await fetch(), None
+        if current is not None and cache_meta is not None:
+            current.attrs.update(cache_hit=cache_meta["hit"], stale=cache_meta["stale"])
+    return results or [], cache_meta, time.monotonic() - started, waits.waited
+
+
+async def search_all_sources(finder, product_name, sources, deadline=None):
+    """
+    معادل finder_price.search_all_sources با asyncio.wait و مهلت کلی؛
+    فروشگاه‌هایی که در مهلت تمام نشوند لغو می‌شوند.
+    """
+    if deadline is None:
+        deadline = settings.SEARCH_DEADLINE
+    started = time.monotonic()
+
+    tasks = {asyncio.ensure_future(_timed_search(finder, method, product_name, started + deadline)): (shop, method)
+             for shop, method in sources}
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+    collected = {}
+    for task in done:
+        shop, method = tasks[task]
+        try:
+            results, cache_meta, elapsed, waited = task.result()
+            collected[shop] = (results, source_info(method, results, cache_meta, elapsed, waited))
+        except Exception as e:
+            logger.warning("❌ خطا در جستجوی %s: %s", shop, e)
+            collected[shop] = ([], failed_source_info(method, "error", time.monotonic() - started))
+    for task in pending:
+        task.cancel()
+        shop, method = tasks[task]
+        logger.warning("⏱️ %s در مهلت %s ثانیه پاسخ نداد", shop, deadline)
+        collected[shop] = ([], failed_source_info(method, "timeout", deadline))
+
+    results_by_shop = {shop: collected[shop][0] for shop, _ in sources}
+    breakdown = {shop: collected[shop][1] for shop, _ in sources}
+    return results_by_shop, breakdown
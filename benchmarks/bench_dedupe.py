@@ -0,0 +1,137 @@
+"""
+صحت و سرعت dedupe روی آگهی‌های مصنوعی (بدون شبکه).
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_dedupe.py [--listings 30] [--batch 1000 10000 50000] [--seed 1] [--json]
+
+برای هر محصول چند آگهی از دیجی‌کالا و باسلام ساخته می‌شود و ترب بخشی از آن‌ها را با
+همان قیمت و املای دیگر (ي/ك، ZWNJ، ارقام فارسی) تکرار می‌کند؛ مدل‌های مشابه با قیمت
+متفاوت تکراری نیستند. خروجی dedupe_many با مقایسه همه جفت‌ها (همان قاعده بدون MinHash)
+مقایسه می‌شود، سپس زمان dedupe یک محصول (p50/p99) برای اندازه‌های معمول نتایج و
+زمان dedupe_many دسته‌ای به ازای هر آگهی برای تعدادهای مختلف محصول گزارش می‌شود.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dedupe  # noqa: E402
+
+BRANDS = ('سامسونگ', 'شیائومی', 'اپل', 'ال جی', 'هواوی', 'نوکیا', 'سونی', 'ایسوس')
+KINDS = ('گوشی موبایل', 'هدفون بی سیم', 'کیف چرمی زنانه', 'ساعت هوشمند', 'لپ تاپ', 'کفش ورزشی')
+SPECS = ('ظرفیت 128 گیگابایت', 'رنگ مشکی', 'مدل پرو', 'سایز بزرگ', 'نسخه جهانی', '')
+THRESHOLD = 0.8
+PRICE_TOLERANCE = 0.01
+
+
+def persian_variant(title, rnd):
+    """همان عنوان با املای دیگر (مثل آگهی تکراری ترب)"""
+    title = title.replace('ی', 'ي').replace('ک', 'ك')
+    if rnd.random() < 0.5:
+        title = title.replace(' ', '\u200c', 1)
+    if rnd.random() < 0.5:
+        title = title.translate(str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹'))
+    return title
+
+
+def make_listings(count, rnd):
+    listings = []
+    for i in range(count):
+        title = f"{rnd.choice(KINDS)} {rnd.choice(BRANDS)} {rnd.choice(SPECS)} کد {rnd.randint(100, 999)}"
+        price = rnd.randint(100_000, 50_000_000)
+        shop = rnd.choice(('دیجی‌کالا', 'باسلام'))
+        listings.append({'title': title, 'price': price, 'shop': shop, 'url': f'https://{shop}/{i}'})
+        if rnd.random() < 0.3:
+            listings.append({'title': persian_variant(title, rnd), 'price': price, 'shop': 'ترب',
+                             'url': f'https://torob.com/p/{i}/'})
+    rnd.shuffle(listings)
+    return listings[:count]
+
+
+def reference(results):
+    """همان قاعده dedupe با مقایسه همه جفت‌ها (بدون MinHash/LSH)"""
+    ngrams = [dedupe.title_ngrams(r['title']) for r in results]
+    parent = list(range(len(results)))
+    for i in range(len(results)):
+        for j in range(i + 1, len(results)):
+            if dedupe._close_prices(results[i], results[j], PRICE_TOLERANCE) and \
+                    dedupe._jaccard(ngrams[i], ngrams[j]) >= THRESHOLD:
+                parent[dedupe._find(parent, j)] = dedupe._find(parent, i)
+    roots = {}
+    for i in range(len(results)):
+        roots.setdefault(dedupe._find(parent, i), i)
+    return len(results) - len(roots)
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--listings', type=int, default=30, help='تعداد آگهی هر محصول در دسته‌ای')
+    parser.add_argument('--batch', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='تعداد محصول‌های dedupe_many')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='خروجی JSON برای مقایسه اجراها')
+    args = parser.parse_args()
+    rnd = random.Random(args.seed)
+
+    checks = [make_listings(rnd.randint(5, 60), rnd) for _ in range(500)]
+    expected = [reference(results) for results in checks]
+    got = [removed for _, removed in dedupe.dedupe_many(checks, THRESHOLD, PRICE_TOLERANCE)]
+    report = {
+        "checked_products": len(checks),
+        "duplicates": sum(expected),
+        "missed": sum(max(0, e - g) for e, g in zip(expected, got)),
+        "extra": sum(max(0, g - e) for e, g in zip(expected, got)),
+        "single": {},
+        "batch": {},
+    }
+
+    for size in (15, 30, 60, 120):
+        results = make_listings(size, rnd)
+        samples = timed(lambda: dedupe.dedupe(results, THRESHOLD, PRICE_TOLERANCE), 300)
+        report["single"][size] = {
+            "p50_ms": round(statistics.median(samples) * 1000, 3),
+            "p99_ms": round(samples[int(len(samples) * 0.99) - 1] * 1000, 3),
+        }
+
+    for products in args.batch:
+        lists = [make_listings(args.listings, rnd) for _ in range(products)]
+        listings = sum(len(results) for results in lists)
+        elapsed = timed(lambda: dedupe.dedupe_many(lists, THRESHOLD, PRICE_TOLERANCE), 1)[0]
+        report["batch"][products] = {
+            "listings": listings,
+            "seconds": round(elapsed, 3),
+            "us_per_listing": round(elapsed / listings * 1e6, 2),
+        }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{report['checked_products']} products checked: {report['duplicates']} duplicates, "
+              f"{report['missed']} missed, {report['extra']} extra")
+        for size, row in report["single"].items():
+            print(f"dedupe {size:>4} listings: p50 {row['p50_ms']:.3f} ms  p99 {row['p99_ms']:.3f} ms")
+        for products, row in report["batch"].items():
+            print(f"dedupe_many {products:>7,} products ({row['listings']:,} listings): "
+                  f"{row['seconds']}s, {row['us_per_listing']} µs/listing")
+
+    # LSH ممکن است به ندرت جفتی را از دست بدهد؛ حذف اضافه یعنی خطا
+    sys.exit(1 if report["extra"] else 0)
+
+
+if __name__ == '__main__':
+    main()
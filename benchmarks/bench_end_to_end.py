@@ -0,0 +1,213 @@
+"""
+بنچمارک آفلاین end-to-end با پاسخ‌های ضبط شده فروشگاه‌ها (بدون شبکه).
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_end_to_end.py [--requests 200] [--concurrency 8]
+        [--latency 0] [--case search_products ...] [--cache] [--history] [--json]
+        [--compare baseline.json]
+
+درخواست‌های http_client (دیجی‌کالا و باسلام) و AsyncTorob با فایل‌های fixtures/
+پاسخ داده می‌شوند؛ --latency تأخیر ثابت (میلی‌ثانیه) هر پاسخ upstream را
+شبیه‌سازی می‌کند. برای هر case توان عملیاتی، p50/p95/p99 زمان پاسخ و حافظه
+اوج پروسه (RSS) گزارش می‌شود. cache نتایج به‌طور پیش‌فرض خاموش است (--cache)
+و هر درخواست عبارت جستجوی متفاوتی دارد تا single-flight آن‌ها را ادغام نکند.
+تاریخچه قیمت هم خاموش است؛ --history آن را در یک فایل موقت روشن می‌کند.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# endpoint (همان نام circuit breaker) → فایل پاسخ ضبط شده
+RECORDINGS = {
+    'digikala_api': 'digikala_api.json',
+    'digikala_web': 'digikala_search.html',
+    'torob_search': 'torob_search.json',
+    'torob_details': 'torob_details.json',
+    'torob_price_chart': 'torob_price_chart.json',
+    'basalam_primary': 'basalam_primary.json',
+    'basalam_alternative': 'basalam_alternative.json',
+    'basalam_scrape': 'basalam_search.html',
+}
+
+QUERY = 'گوشی موبایل'
+
+
+class Replay:
+    """جایگزین لایه HTTP که پاسخ‌های ضبط شده را با تأخیر اختیاری برمی‌گرداند"""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000
+        self.bodies = {}
+        for endpoint, filename in RECORDINGS.items():
+            with open(os.path.join(FIXTURES, filename), encoding='utf-8') as f:
+                self.bodies[endpoint] = f.read()
+
+    def send(self, url, host, endpoint, **kwargs):
+        """به جای http_client._send"""
+        import requests
+
+        if self.latency:
+            time.sleep(self.latency)
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response._content = self.bodies[endpoint].encode('utf-8')
+        response.elapsed = datetime.timedelta(seconds=self.latency)
+        return response
+
+    def install(self):
+        import http_client
+        from torob_integration.async_api import AsyncTorob
+
+        replay = self
+
+        async def torob_get(client, url, params, timeout, endpoint):
+            if replay.latency:
+                await asyncio.sleep(replay.latency)
+            return 200, replay.bodies[endpoint]
+
+        http_client._send = self.send
+        AsyncTorob._get = torob_get
+
+
+def percentile(sorted_values, pct):
+    """nearest-rank percentile"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS بایت برمی‌گرداند، لینوکس کیلوبایت
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_case(func, requests_count, concurrency):
+    latencies = []
+
+    def one(i):
+        started = time.perf_counter()
+        func(f"{QUERY} {i}")
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests_count,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests_count / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def build_cases(finder_price):
+    finder = finder_price.price_finder
+    client = finder_price.app.test_client()
+
+    def search_products(query):
+        response = client.post('/search', json={'product_name': query})
+        if response.status_code != 200 or not response.get_json().get('success'):
+            raise RuntimeError(f"/search failed: {response.status_code}")
+
+    return {
+        'search_products': search_products,
+        'search_digikala': finder.search_digikala,
+        'digikala_web_scraping': finder.digikala_web_scraping,
+        'search_torob': finder.search_torob,
+        'search_basalam': finder.search_basalam,
+        'basalam_web_scraping': finder.basalam_web_scraping,
+    }
+
+
+def compare(report, baseline):
+    """درصد تغییر نسبت به اجرای قبلی (منفی در زمان یعنی بهبود)"""
+    rows = {}
+    for name, row in report["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if not old:
+            continue
+        rows[name] = {
+            key: round(100 * (row[key] - old[key]) / old[key], 1) if old[key] else None
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_kb")
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='تعداد درخواست در هر case')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0, help='تأخیر شبیه‌سازی شده upstream (ms)')
+    parser.add_argument('--case', action='append', help='اجرای فقط caseهای نام برده')
+    parser.add_argument('--cache', action='store_true', help='روشن بودن cache نتایج')
+    parser.add_argument('--history', action='store_true', help='ثبت تاریخچه قیمت در فایل موقت')
+    parser.add_argument('--json', action='store_true', help='خروجی JSON برای مقایسه اجراها')
+    parser.add_argument('--compare', metavar='BASELINE', help='فایل JSON اجرای قبلی')
+    args = parser.parse_args()
+
+    # تنظیمات پیش از import برنامه خوانده می‌شوند
+    os.environ['RESULT_CACHE_ENABLED'] = '1' if args.cache else '0'
+    os.environ['PRICE_HISTORY_DB'] = (os.path.join(tempfile.mkdtemp(), 'price_history.db')
+                                      if args.history else '')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    Replay(args.latency).install()
+    import finder_price
+
+    cases = build_cases(finder_price)
+    selected = args.case or list(cases)
+    unknown = set(selected) - set(cases)
+    if unknown:
+        parser.error(f"unknown case: {', '.join(sorted(unknown))}")
+
+    report = {
+        "config": {"requests": args.requests, "concurrency": args.concurrency,
+                   "latency_ms": args.latency, "cache": args.cache,
+                   "python": sys.version.split()[0]},
+        "cases": {},
+    }
+    for name in selected:
+        cases[name](QUERY)  # warm-up (import‌های تنبل، ساخت sessionها)
+        report["cases"][name] = run_case(cases[name], args.requests, args.concurrency)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report["compare_pct"] = compare(report, json.load(f))
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"requests={args.requests} concurrency={args.concurrency} latency={args.latency}ms cache={args.cache}")
+    for name, row in report["cases"].items():
+        print(f"{name:22} {row['throughput_rps']:>9.1f} req/s  p50 {row['p50_ms']:>8.2f}  "
+              f"p95 {row['p95_ms']:>8.2f}  p99 {row['p99_ms']:>8.2f} ms  rss {row['peak_rss_kb']:>7,} KB")
+    for name, row in report.get("compare_pct", {}).items():
+        print(f"  Δ {name:20} " + "  ".join(f"{key} {value:+.1f}%" for key, value in row.items()
+                                            if value is not None))
+
+
+if __name__ == '__main__':
+    main()
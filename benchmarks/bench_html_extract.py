@@ -0,0 +1,111 @@
+"""
+مقایسه زمان parse و حافظه اوج استخراج HTML:
+روش قبلی (BeautifulSoup + html.parser روی کل صفحه) در برابر html_extract (lxml افزایشی).
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_html_extract.py [--repeat 20] [--json]
+
+فایل‌های fixtures/*.html نمونه ذخیره شده صفحات جستجو هستند (ساختار کارت‌ها،
+اسکریپت __NEXT_DATA__، منو و پاورقی حجیم) و داده محصولات در آن‌ها ساختگی است.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extract import extract_digikala_products, extract_price_texts  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def legacy_digikala(html, limit=5):
+    """همان منطق قبلی digikala_web_scraping"""
+    soup = BeautifulSoup(html, 'html.parser')
+    products = []
+    for link in soup.find_all('a', href=re.compile(r'/product/'))[:limit]:
+        price_element = link.find('span', {'data-testid': 'price-final'}) or \
+            link.find_next('span', string=re.compile(r'تومان'))
+        title_element = link.find('h3') or link.find('p') or link
+        products.append({
+            'href': link.get('href', ''),
+            'title': title_element.get_text().strip(),
+            'price_text': price_element.get_text().strip() if price_element else None,
+        })
+    return products
+
+
+def legacy_basalam(html, limit=5):
+    """همان منطق قبلی اسکرپ باسلام"""
+    soup = BeautifulSoup(html, 'html.parser')
+    elements = soup.find_all('span', string=re.compile(r'تومان|ریال'))
+    return [element.get_text().strip() for element in elements[:limit]]
+
+
+def measure(func, html, repeat):
+    """بهترین و میانه زمان اجرا (میلی‌ثانیه) و حافظه اوج (KB)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(html)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "best_ms": round(timings[0], 2),
+        "median_ms": round(timings[len(timings) // 2], 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+CASES = (
+    ('digikala', 'digikala_search.html', legacy_digikala, extract_digikala_products),
+    ('basalam', 'basalam_search.html', legacy_basalam, extract_price_texts),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='خروجی JSON برای مقایسه اجراها')
+    args = parser.parse_args()
+
+    report = {}
+    for name, filename, legacy, current in CASES:
+        with open(os.path.join(FIXTURES, filename), encoding='utf-8') as f:
+            html = f.read()
+
+        if legacy(html) != current(html):
+            print(f"⚠️ خروجی دو روش برای {name} یکسان نیست", file=sys.stderr)
+
+        report[name] = {
+            "page_kb": round(len(html.encode('utf-8')) / 1024, 1),
+            "legacy": measure(legacy, html, args.repeat),
+            "html_extract": measure(current, html, args.repeat),
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for name, row in report.items():
+        legacy, current = row['legacy'], row['html_extract']
+        print(f"{name} ({row['page_kb']} KB)")
+        print(f"  legacy       : {legacy['median_ms']:8.2f} ms  peak {legacy['peak_kb']:9.1f} KB")
+        print(f"  html_extract : {current['median_ms']:8.2f} ms  peak {current['peak_kb']:9.1f} KB"
+              f"  ({legacy['median_ms'] / max(current['median_ms'], 0.001):.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+صحت و سرعت price_parser روی مجموعه متن‌های قیمت fixtures/price_strings.json.
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_price_parser.py [--count 100000] [--json]
+
+ابتدا خروجی هر متن با مقدار expected مقایسه می‌شود، سپس throughput (متن در ثانیه)
+نسخه دسته‌ای parse_prices، فراخوانی تکی parse_price و روش قبلی (re.findall
+بدون کامپایل روی هر متن) اندازه‌گیری می‌شود.
+
+parse_prices کل دسته را یک بار نرمال‌سازی و یک بار توکن‌بندی می‌کند و حدود ۱۰
+درصد از حلقه parse_price سریع‌تر است. روش قبلی حدود سه برابر سریع‌تر از هر دو است
+چون واحد را تشخیص نمی‌دهد و ریال را تبدیل نمی‌کند؛ تعداد متن‌هایی از corpus که
+روش قبلی اشتباه می‌خواند در خروجی (legacy_wrong) آمده است.
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_parser import parse_price, parse_prices  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'price_strings.json')
+
+
+def legacy_parse(text):
+    """روش قبلی اسکرپرها (بدون تشخیص واحد)"""
+    numbers = re.findall(r'[\d,]+', text.replace('٬', ','))
+    if numbers:
+        try:
+            return int(numbers[0].replace(',', ''))
+        except ValueError:
+            return None
+    return None
+
+
+def throughput(func, texts):
+    started = time.perf_counter()
+    func(texts)
+    elapsed = time.perf_counter() - started
+    return {"seconds": round(elapsed, 4), "per_second": int(len(texts) / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000, help='تعداد متن در هر اجرا')
+    parser.add_argument('--json', action='store_true', help='خروجی JSON برای مقایسه اجراها')
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding='utf-8') as f:
+        corpus = json.load(f)
+
+    failures = []
+    for case in corpus:
+        result = parse_price(case['text'], case['default_unit'])
+        if result != case['expected']:
+            failures.append({"text": case['text'], "expected": case['expected'], "got": result})
+
+    legacy_wrong = sum(1 for case in corpus if legacy_parse(case['text']) != case['expected'])
+
+    texts = list(itertools.islice(itertools.cycle(case['text'] for case in corpus), args.count))
+    report = {
+        "corpus": len(corpus),
+        "failures": failures,
+        "count": len(texts),
+        "parse_prices": throughput(parse_prices, texts),
+        "parse_price": throughput(lambda items: [parse_price(t) for t in items], texts),
+        "legacy": throughput(lambda items: [legacy_parse(t) for t in items], texts),
+        "legacy_wrong": legacy_wrong,
+    }
+    report["batch_speedup"] = round(report["parse_prices"]["per_second"] / report["parse_price"]["per_second"], 2)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"corpus: {len(corpus)} cases, {len(failures)} failures")
+        for failure in failures:
+            print(f"  ❌ {failure['text']!r}: expected {failure['expected']}, got {failure['got']}")
+        for name in ('parse_prices', 'parse_price', 'legacy'):
+            row = report[name]
+            print(f"{name:13}: {row['per_second']:>10,} strings/s ({row['seconds']}s for {len(texts):,})")
+        print(f"parse_prices / parse_price: {report['batch_speedup']}x")
+        print(f"legacy wrong on {legacy_wrong} of {len(corpus)} corpus cases (no unit detection)")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+صحت و سرعت price_stats روی محصولات مصنوعی (بدون شبکه).
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_price_stats.py [--products 5000] [--prices 15] [--repeat 5] [--seed 1] [--json]
+
+برای هر محصول لیستی از قیمت‌ها (با چند داده پرت) در سه فروشگاه ساخته می‌شود.
+ابتدا خروجی summarize و suggest_price با روش اصلی build_price_report
+(remove_outliers با statistics.median، میانه، min/max/sum جداگانه هر فروشگاه)
+مقایسه می‌شود، سپس throughput (محصول در ثانیه) هر دو اندازه‌گیری می‌شود (بهترین از
+--repeat اجرا). اگر خروجی‌ها متفاوت باشند یا price_stats کندتر از روش اصلی باشد،
+کد خروج 1 است.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import price_stats  # noqa: E402
+
+SHOPS = ('دیجی‌کالا', 'ترب', 'باسلام')
+
+
+def legacy_remove_outliers(prices):
+    if len(prices) < 4:
+        return prices
+    sorted_prices = sorted(prices)
+    q1 = statistics.median(sorted_prices[:len(sorted_prices)//2])
+    q3 = statistics.median(sorted_prices[(len(sorted_prices)+1)//2:])
+    iqr = q3 - q1
+    lower = q1 - 1.5 * iqr
+    upper = q3 + 1.5 * iqr
+    return [p for p in prices if lower <= p <= upper]
+
+
+def legacy_stats(prices, shops, calculated_price, strategy):
+    """بخش آماری build_price_report قبل از جدا شدن price_stats"""
+    filtered_prices = legacy_remove_outliers(prices) or prices
+    sorted_prices = sorted(filtered_prices)
+    n = len(sorted_prices)
+    if n % 2 == 0:
+        fair_price = (sorted_prices[n//2 - 1] + sorted_prices[n//2]) / 2
+    else:
+        fair_price = sorted_prices[n//2]
+    if calculated_price:
+        market_weight, your_weight, _ = price_stats.strategy_weights(strategy)
+        suggested = int((fair_price * market_weight) + (float(calculated_price) * your_weight))
+    else:
+        suggested = int(fair_price)
+
+    by_shop = {}
+    for shop, price in zip(shops, prices):
+        by_shop.setdefault(shop, []).append(price)
+    return {
+        "min": min(filtered_prices),
+        "max": max(filtered_prices),
+        "avg": sum(filtered_prices) / len(filtered_prices),
+        "fair_price": fair_price,
+        "suggested": suggested,
+        "shops": {shop: {"count": len(p), "min": min(p), "max": max(p), "avg": sum(p) / len(p)}
+                  for shop, p in by_shop.items()},
+    }
+
+
+def current_stats(prices, shops, calculated_price, strategy):
+    summary = price_stats.summarize(prices, shops)
+    return {
+        "min": summary["min"], "max": summary["max"], "avg": summary["avg"],
+        "fair_price": summary["fair_price"],
+        "suggested": price_stats.suggest_price(summary["fair_price"], calculated_price, strategy),
+        "shops": {shop: {key: stats[key] for key in ("count", "min", "max", "avg")}
+                  for shop, stats in summary["shops"].items()},
+    }
+
+
+def make_products(count, prices_per_product, rnd):
+    products = []
+    for _ in range(count):
+        base = rnd.randint(100_000, 50_000_000)
+        n = rnd.randint(1, prices_per_product * 2)
+        prices = [int(base * rnd.uniform(0.8, 1.25)) for _ in range(n)]
+        if n > 4 and rnd.random() < 0.5:
+            prices[rnd.randrange(n)] = base * rnd.choice((10, 20)) // 100 or 1001
+        shops = [rnd.choice(SHOPS) for _ in range(n)]
+        calculated = rnd.choice((None, base, int(base * 1.1)))
+        strategy = rnd.choice(('balanced', 'competitive', 'value-based'))
+        products.append((prices, shops, calculated, strategy))
+    return products
+
+
+def throughput(func, count, repeat=1):
+    elapsed = float('inf')
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        func()
+        elapsed = min(elapsed, time.perf_counter() - started)
+    return {"seconds": round(elapsed, 4), "per_second": int(count / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=5000, help='تعداد محصول')
+    parser.add_argument('--prices', type=int, default=15, help='میانگین تعداد قیمت هر محصول')
+    parser.add_argument('--repeat', type=int, default=5, help='تعداد تکرار زمان‌سنجی (بهترین اجرا)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='خروجی JSON برای مقایسه اجراها')
+    args = parser.parse_args()
+
+    products = make_products(args.products, args.prices, random.Random(args.seed))
+
+    mismatches = sum(1 for product in products if legacy_stats(*product) != current_stats(*product))
+
+    report = {
+        "products": len(products),
+        "prices": sum(len(product[0]) for product in products),
+        "mismatches": mismatches,
+        "legacy": throughput(lambda: [legacy_stats(*product) for product in products], len(products), args.repeat),
+        "price_stats": throughput(lambda: [current_stats(*product) for product in products], len(products), args.repeat),
+    }
+    report["slower"] = report["price_stats"]["per_second"] < report["legacy"]["per_second"]
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"{report['products']:,} products, {report['prices']:,} prices, {mismatches} mismatches")
+        for name in ('legacy', 'price_stats'):
+            row = report[name]
+            print(f"{name:15}: {row['per_second']:>10,} products/s ({row['seconds']}s)")
+        if report["slower"]:
+            print("❌ price_stats کندتر از روش اصلی است")
+
+    sys.exit(1 if mismatches or report["slower"] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+سرور جایگزین محلی فروشگاه‌ها برای تست بار /search با تأخیر و خطای قابل تنظیم.
+
+اجرا از ریشه پروژه:
+    python benchmarks/standin_server.py [--port 8900] [--latency lognormal:120,0.5]
+        [--error-rate 0.02] [--rate-limit-rate 0.02] [--timeout-rate 0.01]
+        [--truncate-rate 0.01] [--config faults.json] [--seed 1]
+
+endpointهایی که PriceFinder و Torob صدا می‌زنند با پاسخ‌های ضبط شده fixtures/
+شبیه‌سازی می‌شوند. هر فروشگاه زیر یک پیشوند است و برنامه با متغیرهای محیطی
+*_BASE_URL به آن اشاره می‌کند (سرور هنگام شروع آن‌ها را چاپ می‌کند).
+
+توزیع تأخیر (میلی‌ثانیه):
+    fixed:50 | uniform:20,200 | lognormal:<median>,<sigma> | exp:<mean>
+
+فایل --config تنظیمات پیش‌فرض و اختصاصی هر endpoint را دارد:
+    {"default": {"latency": "lognormal:150,0.6", "error_rate": 0.01},
+     "endpoints": {"torob_details": {"latency": "uniform:300,2000", "rate_limit_rate": 0.1}}}
+
+GET /__stats تعداد پاسخ‌ها به تفکیک endpoint و نتیجه را برمی‌گرداند.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import math
+import os
+import random
+
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (متد، مسیر، نام endpoint، فایل پاسخ، content type)
+ROUTES = (
+    ('GET', '/digikala-api/v1/search/', 'digikala_api', 'digikala_api.json', 'application/json'),
+    ('GET', '/digikala/search/', 'digikala_web', 'digikala_search.html', 'text/html'),
+    ('GET', '/torob/v4/base-product/search/', 'torob_search', 'torob_search.json', 'application/json'),
+    ('GET', '/torob/v4/base-product/details/', 'torob_details', 'torob_details.json', 'application/json'),
+    ('GET', '/torob/v4/base-product/price-chart/', 'torob_price_chart', 'torob_price_chart.json',
+     'application/json'),
+    ('GET', '/torob/suggestion2/', 'torob_suggestion', None, 'application/json'),
+    ('GET', '/basalam-search/ai-engine/api/v2.0/product/search', 'basalam_primary',
+     'basalam_primary.json', 'application/json'),
+    ('GET', '/basalam-api/api/v2/product/search', 'basalam_alternative',
+     'basalam_alternative.json', 'application/json'),
+    ('GET', '/basalam/search', 'basalam_scrape', 'basalam_search.html', 'text/html'),
+)
+
+# متغیر محیطی برنامه → پیشوند مسیر در این سرور
+BASE_URLS = (
+    ('DIGIKALA_API_BASE_URL', '/digikala-api'),
+    ('DIGIKALA_WEB_BASE_URL', '/digikala'),
+    ('TOROB_API_BASE_URL', '/torob'),
+    ('BASALAM_SEARCH_BASE_URL', '/basalam-search'),
+    ('BASALAM_API_BASE_URL', '/basalam-api'),
+    ('BASALAM_WEB_BASE_URL', '/basalam'),
+)
+
+SUGGESTION_BODY = json.dumps({"results": [{"text": f"گوشی موبایل {i}"} for i in range(8)]},
+                             ensure_ascii=False)
+
+
+def parse_latency(spec):
+    """تابعی که هر بار یک تأخیر (ثانیه) از توزیع داده شده برمی‌گرداند"""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v]
+    if kind == 'fixed':
+        return lambda rnd: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rnd: rnd.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal':
+        median, sigma = values
+        return lambda rnd: rnd.lognormvariate(math.log(median), sigma) / 1000
+    if kind == 'exp':
+        return lambda rnd: rnd.expovariate(1 / values[0]) / 1000
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+class Faults:
+    """رفتار یک endpoint: توزیع تأخیر و احتمال 500، 429، timeout و بدنه ناقص"""
+
+    FIELDS = ('latency', 'error_rate', 'rate_limit_rate', 'timeout_rate', 'truncate_rate')
+
+    def __init__(self, latency='fixed:0', error_rate=0.0, rate_limit_rate=0.0,
+                 timeout_rate=0.0, truncate_rate=0.0):
+        self.latency_spec = latency
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.truncate_rate = truncate_rate
+
+    def override(self, options):
+        merged = {field: getattr(self, field) for field in self.FIELDS[1:]}
+        merged['latency'] = self.latency_spec
+        merged.update(options)
+        return Faults(**merged)
+
+    def pick(self, rnd):
+        """نتیجه این درخواست: ok / error / rate_limited / timeout / truncated"""
+        roll = rnd.random()
+        for outcome, rate in (('error', self.error_rate), ('rate_limited', self.rate_limit_rate),
+                              ('timeout', self.timeout_rate), ('truncated', self.truncate_rate)):
+            if roll < rate:
+                return outcome
+            roll -= rate
+        return 'ok'
+
+
+class StandinServer:
+
+    def __init__(self, default_faults, endpoint_faults=None, hang_seconds=60, seed=None):
+        self.default_faults = default_faults
+        self.endpoint_faults = endpoint_faults or {}
+        self.hang_seconds = hang_seconds
+        self.random = random.Random(seed)
+        self.stats = collections.defaultdict(collections.Counter)
+        self.bodies = {}
+        for _, _, endpoint, filename, _ in ROUTES:
+            if filename is None:
+                self.bodies[endpoint] = SUGGESTION_BODY.encode('utf-8')
+            else:
+                with open(os.path.join(FIXTURES, filename), 'rb') as f:
+                    self.bodies[endpoint] = f.read()
+
+    def faults_for(self, endpoint):
+        return self.endpoint_faults.get(endpoint, self.default_faults)
+
+    def handler(self, endpoint, content_type):
+        async def handle(request):
+            faults = self.faults_for(endpoint)
+            outcome = faults.pick(self.random)
+            self.stats[endpoint][outcome] += 1
+            await asyncio.sleep(faults.latency(self.random))
+
+            if outcome == 'error':
+                return web.json_response({"error": "internal error"}, status=500)
+            if outcome == 'rate_limited':
+                return web.json_response({"error": "too many requests"}, status=429,
+                                         headers={'Retry-After': '1'})
+            if outcome == 'timeout':
+                # کلاینت قبل از پایان این انتظار timeout می‌دهد
+                await asyncio.sleep(self.hang_seconds)
+
+            body = self.bodies[endpoint]
+            if outcome == 'truncated':
+                response = web.StreamResponse(headers={'Content-Type': f'{content_type}; charset=utf-8',
+                                                       'Content-Length': str(len(body))})
+                await response.prepare(request)
+                await response.write(body[:len(body) // 2])
+                request.transport.close()
+                return response
+            return web.Response(body=body, content_type=content_type, charset='utf-8')
+        return handle
+
+    async def handle_stats(self, request):
+        return web.json_response({endpoint: dict(counts) for endpoint, counts in self.stats.items()})
+
+    def build_app(self):
+        app = web.Application()
+        for method, path, endpoint, _, content_type in ROUTES:
+            app.router.add_route(method, path, self.handler(endpoint, content_type))
+        app.router.add_get('/__stats', self.handle_stats)
+        return app
+
+
+def load_config(path, default_faults):
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    default_faults = default_faults.override(config.get('default', {}))
+    endpoint_faults = {endpoint: default_faults.override(options)
+                       for endpoint, options in config.get('endpoints', {}).items()}
+    return default_faults, endpoint_faults
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', default='fixed:0', help='توزیع تأخیر، مثلا lognormal:120,0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='احتمال پاسخ 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='احتمال پاسخ 429')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='احتمال پاسخ ندادن')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='احتمال قطع اتصال وسط بدنه')
+    parser.add_argument('--hang-seconds', type=float, default=60, help='مدت انتظار در حالت timeout')
+    parser.add_argument('--config', help='فایل JSON تنظیمات هر endpoint')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    default_faults = Faults(args.latency, args.error_rate, args.rate_limit_rate,
+                            args.timeout_rate, args.truncate_rate)
+    endpoint_faults = {}
+    if args.config:
+        default_faults, endpoint_faults = load_config(args.config, default_faults)
+
+    server = StandinServer(default_faults, endpoint_faults, args.hang_seconds, args.seed)
+    base = f"http://{args.host}:{args.port}"
+    print("# تنظیمات برنامه برای استفاده از این سرور:")
+    for variable, prefix in BASE_URLS:
+        print(f"export {variable}={base}{prefix}")
+    web.run_app(server.build_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == '__main__':
+    main()
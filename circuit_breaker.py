@@ -0,0 +1,130 @@
+# circuit breaker برای هر endpoint بیرونی
+import threading
+import time
+from collections import deque
+
+import requests
+
+import settings
+from log_setup import get_logger
+
+logger = get_logger('circuit_breaker')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """درخواست به endpointی که breaker آن باز است بدون ارسال رد می‌شود"""
+
+    def __init__(self, name):
+        super().__init__(f"circuit breaker '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    نرخ خطا و درخواست‌های کند را در یک پنجره زمانی نگه می‌دارد.
+    بعد از عبور از آستانه باز می‌شود، پس از open_seconds فقط یک درخواست
+    آزمایشی (half-open) عبور می‌کند و با موفقیت آن دوباره بسته می‌شود.
+    """
+
+    def __init__(self, name, window=None, min_calls=None, error_rate=None,
+                 slow_call=None, open_seconds=None):
+        self.name = name
+        self.window = window if window is not None else settings.BREAKER_WINDOW
+        self.min_calls = min_calls if min_calls is not None else settings.BREAKER_MIN_CALLS
+        self.error_rate = error_rate if error_rate is not None else settings.BREAKER_ERROR_RATE
+        self.slow_call = slow_call if slow_call is not None else settings.BREAKER_SLOW_CALL
+        self.open_seconds = open_seconds if open_seconds is not None else settings.BREAKER_OPEN_SECONDS
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._calls = deque()  # (زمان، موفق، مدت)
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def allow(self):
+        """آیا درخواست می‌تواند ارسال شود؟"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok, latency):
+        """ثبت نتیجه یک درخواست (درخواست کندتر از slow_call خطا حساب می‌شود)"""
+        failed = not ok or latency >= self.slow_call
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = CLOSED
+                    self._calls.clear()
+                return
+
+            self._calls.append((now, not failed, latency))
+            self._trim(now)
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for _, success, _ in self._calls if not success)
+                if failures / len(self._calls) >= self.error_rate:
+                    self._open(now)
+
+    def release(self):
+        """درخواستی که لغو شد (بدون نتیجه) ثبت نمی‌شود؛ فقط جای درخواست آزمایشی آزاد می‌شود"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        logger.warning("🔌 circuit breaker '%s' باز شد", self.name)
+
+    def snapshot(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = len(self._calls)
+            failures = sum(1 for _, success, _ in self._calls if not success)
+            latencies = [latency for _, _, latency in self._calls]
+            return {
+                "state": self.state,
+                "calls": calls,
+                "error_rate": round(failures / calls, 3) if calls else 0.0,
+                "avg_latency_ms": int(sum(latencies) / calls * 1000) if calls else 0,
+                "rejected": self.rejected,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """breaker اختصاصی یک endpoint"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def breaker_states():
+    """وضعیت همه breakerها برای /api/status"""
+    with _breakers_lock:
+        breakers = list(_breakers.items())
+    return {name: breaker.snapshot() for name, breaker in breakers}
@@ -0,0 +1,185 @@
+# حذف آگهی‌های تکراری بین فروشگاه‌ها (مثلا محصول دیجی‌کالا یا باسلام که ترب هم با
+# همان قیمت برمی‌گرداند) قبل از محاسبه آمار قیمت.
+#
+# هر عنوان (بعد از normalize_query) به مجموعه n-gram کاراکتری تبدیل می‌شود و امضای
+# MinHash همه عنوان‌های همه محصولات با یک عملیات برداری numpy ساخته می‌شود. با LSH
+# (تقسیم امضا به bandها) فقط جفت‌هایی که در یک band هم‌سطل‌اند بررسی می‌شوند، پس
+# هزینه با تعداد آگهی‌ها خطی است. جفت کاندیدا وقتی تکراری است که شباهت Jaccard واقعی
+# n-gramها حداقل threshold باشد یا لینک یکسان داشته باشند، و در هر دو حالت قیمت‌ها
+# نزدیک باشند. نتایج شبیه‌سازی شده (fallback) هرگز حذف نمی‌شوند.
+import hashlib
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from query_utils import normalize_query
+
+# طول n-gram کاراکتری عنوان
+NGRAM = 3
+# امضای MinHash: BANDS × ROWS تابع hash (آستانه تقریبی LSH: (1/BANDS)^(1/ROWS) ≈ 0.59)
+BANDS = 8
+ROWS = 4
+# حداکثر آگهی هر پیمایش dedupe_many (حافظه ماتریس hash با تعداد n-gramها رشد می‌کند)
+CHUNK_SIZE = 4096
+
+_rng = np.random.RandomState(20240501)
+_MULTIPLIERS = _rng.randint(1, 2 ** 62, size=BANDS * ROWS, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+_OFFSETS = _rng.randint(0, 2 ** 62, size=BANDS * ROWS, dtype=np.int64).astype(np.uint64)
+# ترکیب ROWS مقدار هر band در یک کلید uint64، و جدا کردن کلید bandها و محصولات مختلف
+_BAND_MIX = _rng.randint(1, 2 ** 62, size=ROWS, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+_BAND_SALT = _rng.randint(1, 2 ** 62, size=BANDS, dtype=np.int64).astype(np.uint64)
+_GROUP_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+_PUNCTUATION_RE = re.compile(r'[^\w ]+')
+
+
+def title_ngrams(title):
+    """مجموعه n-gramهای کاراکتری عنوان نرمال‌شده (بدون علائم نگارشی)"""
+    text = _PUNCTUATION_RE.sub(' ', normalize_query(title))
+    text = ' '.join(text.split())
+    if len(text) <= NGRAM:
+        return {text} if text else set()
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+@lru_cache(maxsize=1 << 16)
+def _shingle_hash(gram):
+    """
+    hash پایدار 64 بیتی یک n-gram؛ hash() داخلی پایتون با PYTHONHASHSEED در هر پروسه
+    فرق می‌کند و امضاها بین workerها و اجراها یکسان نمی‌ماند. n-gramها تکراری‌اند و
+    نتیجه cache می‌شود.
+    """
+    return int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), 'little')
+
+
+def _signatures(ngram_sets):
+    """امضای MinHash هر مجموعه (سطرهای آرایه n × BANDS*ROWS) در یک پیمایش برداری"""
+    counts = np.fromiter((len(s) for s in ngram_sets), dtype=np.int64, count=len(ngram_sets))
+    hashes = np.fromiter((_shingle_hash(g) for s in ngram_sets for g in s), dtype=np.uint64,
+                         count=int(counts.sum()))
+    # ضرب و جمع uint64 با سرریز طبیعی (خانواده hash ضربی)؛ بیت‌های بالا برای min
+    mixed = (hashes[:, None] * _MULTIPLIERS + _OFFSETS) >> np.uint64(16)
+    signatures = np.full((len(ngram_sets), BANDS * ROWS), np.iinfo(np.uint64).max, dtype=np.uint64)
+    present = counts > 0
+    if present.any():
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        signatures[present] = np.minimum.reduceat(mixed, starts[present], axis=0)
+    return signatures
+
+
+def _candidate_pairs(signatures, groups, present):
+    """
+    جفت‌های (i, j) با i < j که حداقل در یک band امضای یکسان دارند. کلیدهای همه bandها
+    با numpy ساخته و مرتب می‌شوند؛ حلقه پایتون فقط روی کلیدهای تکراری است.
+    """
+    n = len(signatures)
+    keys = (signatures.reshape(n, BANDS, ROWS) * _BAND_MIX).sum(axis=2, dtype=np.uint64)
+    keys ^= _BAND_SALT + groups.astype(np.uint64)[:, None] * _GROUP_MIX
+    owners = np.repeat(np.arange(n), BANDS)[np.repeat(present, BANDS)]
+    keys = keys[present].ravel()
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    same = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1])
+    pairs = set()
+    if not len(same):
+        return pairs
+    # هر دنباله از کلیدهای برابر یک سطل است
+    run_starts = same[np.r_[True, np.diff(same) > 1]]
+    run_ends = same[np.r_[np.diff(same) > 1, True]] + 2
+    owners = owners[order].tolist()
+    for start, end in zip(run_starts.tolist(), run_ends.tolist()):
+        bucket = sorted(set(owners[start:end]))
+        for a in range(len(bucket)):
+            for b in range(a + 1, len(bucket)):
+                pairs.add((bucket[a], bucket[b]))
+    return pairs
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _close_prices(a, b, price_tolerance):
+    price_a, price_b = a.get('price') or 0, b.get('price') or 0
+    return abs(price_a - price_b) <= price_tolerance * max(price_a, price_b)
+
+
+def dedupe_many(result_lists, threshold=0.8, price_tolerance=0.01, prefer=None):
+    """
+    برای هر لیست نتایج (یک محصول) لیست بدون تکرار با حفظ ترتیب و تعداد حذف شده‌ها:
+    [(kept, removed), ...]. از هر خوشه تکراری اولین آگهی که prefer(item) برایش True
+    است (مثلا فروشگاه اصلی به جای ترب) و در غیر این صورت اولین آگهی نگه داشته می‌شود.
+    """
+    if sum(len(results) for results in result_lists) > CHUNK_SIZE and len(result_lists) > 1:
+        # محصولات مستقل‌اند؛ دسته‌های بزرگ تکه تکه پردازش می‌شوند
+        output, chunk, size = [], [], 0
+        for results in result_lists:
+            if chunk and size + len(results) > CHUNK_SIZE:
+                output.extend(_dedupe_chunk(chunk, threshold, price_tolerance, prefer))
+                chunk, size = [], 0
+            chunk.append(results)
+            size += len(results)
+        output.extend(_dedupe_chunk(chunk, threshold, price_tolerance, prefer))
+        return output
+    return _dedupe_chunk(result_lists, threshold, price_tolerance, prefer)
+
+
+def _dedupe_chunk(result_lists, threshold, price_tolerance, prefer):
+    items = [item for results in result_lists for item in results]
+    if not items:
+        return [(list(results), 0) for results in result_lists]
+    group_ids = np.repeat(np.arange(len(result_lists)),
+                          [len(results) for results in result_lists])
+    groups = group_ids.tolist()
+    ngrams = [set() if item.get('fallback') else title_ngrams(item.get('title', ''))
+              for item in items]
+    present = np.fromiter((bool(g) for g in ngrams), dtype=bool, count=len(items))
+
+    parent = list(range(len(items)))
+    for i, j in sorted(_candidate_pairs(_signatures(ngrams), group_ids, present)):
+        # کلید مشترک فقط احتمال شباهت است؛ محصول، قیمت و شباهت واقعی بررسی می‌شوند
+        if groups[i] == groups[j] and _find(parent, i) != _find(parent, j) and \
+                _close_prices(items[i], items[j], price_tolerance) and \
+                _jaccard(ngrams[i], ngrams[j]) >= threshold:
+            parent[_find(parent, j)] = _find(parent, i)
+
+    # لینک یکسان با قیمت نزدیک هم تکراری است (حتی با عنوان متفاوت)
+    by_url = {}
+    for i, (group, item) in enumerate(zip(groups, items)):
+        url = item.get('url')
+        if url and url != '#' and not item.get('fallback'):
+            first = by_url.setdefault((group, url), i)
+            if first != i and _close_prices(items[first], item, price_tolerance):
+                parent[_find(parent, i)] = _find(parent, first)
+
+    # نماینده هر خوشه
+    chosen = {}
+    for i, item in enumerate(items):
+        root = _find(parent, i)
+        current = chosen.get(root)
+        if current is None or (prefer is not None and not prefer(items[current]) and prefer(item)):
+            chosen[root] = i
+    keep = set(chosen.values())
+
+    output = []
+    offset = 0
+    for results in result_lists:
+        kept = [item for i, item in enumerate(results, offset) if i in keep]
+        output.append((kept, len(results) - len(kept)))
+        offset += len(results)
+    return output
+
+
+def dedupe(results, threshold=0.8, price_tolerance=0.01, prefer=None):
+    """(kept, removed) برای یک لیست نتایج"""
+    return dedupe_many([results], threshold, price_tolerance, prefer)[0]
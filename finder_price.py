@@ -1,23 +1,88 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import requests
-from bs4 import BeautifulSoup
-import re
-import statistics
+import csv
+import datetime
+import io
+import math
 import time
 import random
 import urllib.parse
 import json
 import urllib3
 import os
+import threading
+import hmac
+from contextlib import ExitStack, closing
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
 # Import the Torob API
 from torob_integration.api import Torob
+import settings
+import http_client
+from result_cache import result_cache
+from singleflight import coalesce, flights
+from circuit_breaker import breaker_states
+from rate_limit import limiter_states, wait_scope
+from hedging import LatencyTracker
+from html_extract import extract_digikala_products, extract_price_texts
+from price_parser import RIAL, TOMAN, parse_number, parse_price, parse_prices
+import price_stats
+from price_history import EXPORT_COLUMNS, price_history, records
+from torob_integration.price_chart import chart_momentum, chart_sync
+from prewarm import create_scheduler
+from typeahead import create_typeahead
+from dedupe import dedupe
+from query_utils import normalize_persian
+from log_setup import get_logger, log_payload
+import metrics
+from metrics import observe
+from tracing import bind, span, trace, traced
+from profiling import ProfilerBusy, profile_request
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+logger = get_logger('finder')
+
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False  # برای نمایش درست فارسی
 
+
+class TorobCandidates:
+    """
+    انتخاب محصولات ترب از جریان نتایج جستجو: محصولات دارای prk نگه داشته می‌شوند و
+    add وقتی True برمی‌گرداند که به اندازه کافی محصول با قیمت معتبر جمع شده باشد
+    (محصولات بدون قیمت هم نگه داشته می‌شوند چون ممکن است details قیمت بدهد).
+    """
+
+    def __init__(self, product_name, limit=None):
+        self.product_name = product_name
+        self.limit = limit or settings.TOROB_SEARCH_RESULTS
+        self.candidates = []
+        self.priced = 0
+        self.seen = 0
+
+    def add(self, product):
+        self.seen += 1
+        log_payload(logger, 'torob', "Torob product", product)
+        if not product.get('prk'):
+            logger.warning("⚠️ محصول بدون prk: %s", product.get('name1', self.product_name))
+            return False
+        self.candidates.append(product)
+        price = parse_price(product.get('price'), TOMAN)
+        if price and price > 1000:
+            self.priced += 1
+        # سقف کل کاندیداها تا تعداد درخواست details محدود بماند
+        return self.priced >= self.limit or len(self.candidates) >= self.limit * 2
+
+    def result(self):
+        """کاندیداها؛ None یعنی باید از fallback استفاده شود"""
+        if not self.seen:
+            logger.warning("❌ هیچ محصولی یافت نشد")
+            return None
+        logger.debug("📦 %s محصول بررسی شد، %s کاندیدا", self.seen, len(self.candidates))
+        return self.candidates
+
+
 class PriceFinder:
     def __init__(self):
         self.headers = {
@@ -35,173 +100,172 @@ class PriceFinder:
     
     def extract_price_from_text(self, text):
         """استخراج قیمت از متن"""
-        price_patterns = [
-            r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',
-            r'(\d+)',
-        ]
-        
-        for pattern in price_patterns:
-            matches = re.findall(pattern, text.replace(',', ''))
-            if matches:
-                try:
-                    return float(matches[0])
-                except:
-                    continue
-        return None
+        return parse_number(text)
     
+    @coalesce('digikala')
+    @records('digikala')
     def search_digikala(self, product_name):
         """جستجو در دیجی‌کالا با روش‌های مختلف"""
         try:
-            print(f"📱 جستجو در دیجی‌کالا برای: {product_name}")
+            logger.debug("📱 جستجو در دیجی‌کالا برای: %s", product_name)
             
             # روش اول: استفاده از API جستجوی دیجی‌کالا
             results = self.digikala_api_search(product_name)
             if results:
-                print(f"✅ نتایج دریافت شده از API دیجی‌کالا: {len(results)} محصول")
+                logger.debug("✅ نتایج دریافت شده از API دیجی‌کالا: %s محصول", len(results))
                 return results
             
             # روش دوم: وب اسکرپینگ مستقیم
             results = self.digikala_web_scraping(product_name)
             if results:
-                print(f"✅ نتایج دریافت شده از وب اسکرپینگ: {len(results)} محصول")
+                logger.debug("✅ نتایج دریافت شده از وب اسکرپینگ: %s محصول", len(results))
                 return results
             
             # اگر همه روش‌ها شکست خوردند
-            print("⚠️ همه روش‌های جستجو در دیجی‌کالا شکست خوردند")
+            logger.warning("⚠️ همه روش‌های جستجو در دیجی‌کالا شکست خوردند")
             return self.digikala_fallback(product_name)
                 
         except Exception as e:
-            print(f"❌ خطا در جستجوی دیجی‌کالا: {e}")
+            logger.warning("❌ خطا در جستجوی دیجی‌کالا: %s", e)
             return self.digikala_fallback(product_name)
     
+    @observe('digikala_api_search')
+    @traced('digikala_api_search')
     def digikala_api_search(self, product_name):
         """جستجو با استفاده از API رسمی دیجی‌کالا"""
         try:
-            encoded_name = urllib.parse.quote(product_name)
-            api_url = f"https://api.digikala.com/v1/search/?q={encoded_name}"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'application/json',
-                'Referer': 'https://www.digikala.com/',
-            }
+            api_url, headers = self.digikala_api_request(product_name)
             
-            print(f"🔗 ارسال درخواست به API دیجی‌کالا: {api_url}")
-            response = requests.get(api_url, headers=headers, timeout=15, verify=False)
+            logger.debug("🔗 ارسال درخواست به API دیجی‌کالا: %s", api_url)
+            response = http_client.get(api_url, endpoint='digikala_api', headers=headers, timeout=15, verify=False)
             
             if response.status_code == 200:
-                data = response.json()
-                results = []
-                
-                if 'data' in data and 'products' in data['data']:
-                    products = data['data']['products']
-                    
-                    for product in products[:8]:
-                        if 'default_variant' in product and product['default_variant']:
-                            variant = product['default_variant']
-                            if 'price' in variant and variant['price']:
-                                price_info = variant['price']
-                                
-                                # استخراج اطلاعات محصول
-                                product_info = {
-                                    'price': 0,
-                                    'title': product.get('title_fa', 'محصول'),
-                                    'url': f"https://www.digikala.com/product/dkp-{product.get('id', '')}/",
-                                    'shop': 'دیجی‌کالا',
-                                    'image': product.get('images', {}).get('main', {}).get('url', [None])[0] if product.get('images') else None
-                                }
-                                
-                                # قیمت با تخفیف
-                                if 'selling_price' in price_info and price_info['selling_price']:
-                                    price = price_info['selling_price'] // 10
-                                    if price > 1000:
-                                        product_info['price'] = price
-                                        results.append(product_info)
-                                
-                                # قیمت اصلی
-                                elif 'rrp_price' in price_info and price_info['rrp_price']:
-                                    price = price_info['rrp_price'] // 10
-                                    if price > 1000:
-                                        product_info['price'] = price
-                                        results.append(product_info)
-                
-                return results[:5] if results else []
+                return self.parse_digikala_api(http_client.decode_json(response))
             
             return []
             
         except Exception as e:
-            print(f"❌ خطا در API دیجی‌کالا: {e}")
+            logger.warning("❌ خطا در API دیجی‌کالا: %s", e)
             return []
     
+    def digikala_api_request(self, product_name):
+        """آدرس و هدرهای API جستجوی دیجی‌کالا"""
+        encoded_name = urllib.parse.quote(product_name)
+        api_url = f"{settings.DIGIKALA_API_BASE_URL}/v1/search/?q={encoded_name}"
+        
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept': 'application/json',
+            'Referer': 'https://www.digikala.com/',
+        }
+        return api_url, headers
+    
+    def parse_digikala_api(self, data):
+        """استخراج محصولات از پاسخ JSON API دیجی‌کالا"""
+        results = []
+        
+        if 'data' in data and 'products' in data['data']:
+            products = data['data']['products']
+            
+            for product in products[:8]:
+                if 'default_variant' in product and product['default_variant']:
+                    variant = product['default_variant']
+                    if 'price' in variant and variant['price']:
+                        price_info = variant['price']
+                        
+                        # استخراج اطلاعات محصول
+                        product_info = {
+                            'price': 0,
+                            'title': product.get('title_fa', 'محصول'),
+                            'url': f"https://www.digikala.com/product/dkp-{product.get('id', '')}/",
+                            'shop': 'دیجی‌کالا',
+                            'image': product.get('images', {}).get('main', {}).get('url', [None])[0] if product.get('images') else None
+                        }
+                        
+                        # قیمت با تخفیف
+                        # API دیجی‌کالا قیمت‌ها را به ریال برمی‌گرداند
+                        if 'selling_price' in price_info and price_info['selling_price']:
+                            price = parse_price(price_info['selling_price'], RIAL)
+                            if price and price > 1000:
+                                product_info['price'] = price
+                                results.append(product_info)
+                        
+                        # قیمت اصلی
+                        elif 'rrp_price' in price_info and price_info['rrp_price']:
+                            price = parse_price(price_info['rrp_price'], RIAL)
+                            if price and price > 1000:
+                                product_info['price'] = price
+                                results.append(product_info)
+        
+        return results[:5] if results else []
+    
+    @observe('digikala_web_scraping')
+    @traced('digikala_web_scraping')
     def digikala_web_scraping(self, product_name):
         """وب اسکرپینگ مستقیم از دیجی‌کالا"""
         try:
-            encoded_name = urllib.parse.quote(product_name)
-            search_url = f"https://www.digikala.com/search/?q={encoded_name}"
+            search_url, headers = self.digikala_web_request(product_name)
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'fa-IR,fa;q=0.9,en;q=0.8',
-                'Referer': 'https://www.digikala.com/',
-                'Connection': 'keep-alive',
-            }
-            
-            print(f"🌐 وب اسکرپینگ از: {search_url}")
-            response = requests.get(search_url, headers=headers, timeout=15, verify=False)
+            logger.debug("🌐 وب اسکرپینگ از: %s", search_url)
+            response = http_client.get(search_url, endpoint='digikala_web', headers=headers, timeout=15, verify=False)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                results = []
-                
-                # جستجوی محصولات
-                product_links = soup.find_all('a', href=re.compile(r'/product/'))
-                
-                for i, link in enumerate(product_links[:5]):
-                    try:
-                        href = link.get('href', '')
-                        if href.startswith('/'):
-                            href = 'https://www.digikala.com' + href
-                        
-                        # استخراج قیمت از عنصر
-                        price_element = link.find('span', {'data-testid': 'price-final'}) or \
-                                      link.find_next('span', string=re.compile(r'تومان'))
-                        
-                        if price_element:
-                            price_text = price_element.get_text().strip()
-                            numbers = re.findall(r'[\d,]+', price_text.replace('٬', ','))
-                            
-                            if numbers:
-                                price = int(numbers[0].replace(',', ''))
-                                if 1000 < price < 100000000:
-                                    if price > 1000000:
-                                        price = price // 10
-                                    
-                                    # استخراج عنوان
-                                    title_element = link.find('h3') or link.find('p') or link
-                                    title = title_element.get_text().strip()[:50] if title_element else f"محصول {i+1}"
-                                    
-                                    results.append({
-                                        'price': price,
-                                        'title': title,
-                                        'url': href,
-                                        'shop': 'دیجی‌کالا',
-                                        'image': None
-                                    })
-                    except:
-                        continue
-                
-                return results[:5]
+                return self.parse_digikala_web(response.text)
             
             return []
             
         except Exception as e:
-            print(f"❌ خطا در وب اسکرپینگ دیجی‌کالا: {e}")
+            logger.warning("❌ خطا در وب اسکرپینگ دیجی‌کالا: %s", e)
             return []
     
+    def digikala_web_request(self, product_name):
+        """آدرس و هدرهای صفحه جستجوی دیجی‌کالا"""
+        encoded_name = urllib.parse.quote(product_name)
+        search_url = f"{settings.DIGIKALA_WEB_BASE_URL}/search/?q={encoded_name}"
+        
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'fa-IR,fa;q=0.9,en;q=0.8',
+            'Referer': 'https://www.digikala.com/',
+            'Connection': 'keep-alive',
+        }
+        return search_url, headers
+    
+    def parse_digikala_web(self, html):
+        """استخراج محصولات از HTML صفحه جستجوی دیجی‌کالا"""
+        results = []
+        
+        # استخراج هدفمند لینک‌های محصول و متن قیمت
+        products = extract_digikala_products(html, limit=5)
+        
+        for i, product in enumerate(products):
+            try:
+                href = product['href']
+                if href.startswith('/'):
+                    href = 'https://www.digikala.com' + href
+                
+                # قیمت‌های صفحه دیجی‌کالا به تومان نمایش داده می‌شوند
+                price = parse_price(product['price_text'], TOMAN)
+                if price and 1000 < price < 100000000:
+                    title = product['title'][:50] or f"محصول {i+1}"
+                    
+                    results.append({
+                        'price': price,
+                        'title': title,
+                        'url': href,
+                        'shop': 'دیجی‌کالا',
+                        'image': None
+                    })
+            except:
+                continue
+        
+        return results[:5]
+    
     def digikala_fallback(self, product_name):
         """روش جایگزین برای دیجی‌کالا در صورت خطا"""
-        print("🔄 استفاده از نتایج شبیه‌سازی شده محلی برای دیجی‌کالا")
+        logger.info("🔄 استفاده از نتایج شبیه‌سازی شده محلی برای دیجی‌کالا")
+        metrics.FALLBACKS.labels('digikala').inc()
         results = []
         base_price = random.randint(100000, 1000000)
         
@@ -213,122 +277,118 @@ class PriceFinder:
                 'title': f"{product_name} - نمونه {i+1}",
                 'url': f"https://www.digikala.com/search/?q={urllib.parse.quote(product_name)}",
                 'shop': 'دیجی‌کالا',
-                'image': None
+                'image': None,
+                'fallback': True
             })
         return results
     
+    @coalesce('torob')
+    @records('torob')
+    @traced('search_torob')
     def search_torob(self, product_name):
         """
         جستجو در ترب با دریافت قیمت و عکس واقعی هر محصول و لینک به صفحه اختصاصی محصول
         """
         try:
-            print(f"🛒 شروع جستجو در ترب برای: {product_name}")
+            logger.debug("🛒 شروع جستجو در ترب برای: %s", product_name)
 
             if not hasattr(self, 'torob') or self.torob is None:
-                print("❌ Torob API در دسترس نیست")
+                logger.warning("❌ Torob API در دسترس نیست")
                 return self.torob_fallback(product_name)
 
-            # جستجو در ترب
-            search_result = self.torob.search(product_name, page=0)
-            import json
-            print("Torob search_result:", json.dumps(search_result, ensure_ascii=False, indent=2))
-            if not search_result or "results" not in search_result:
-                print("❌ پاسخ خالی از API")
+            # جستجو در ترب: صفحه‌ها فقط تا وقتی گرفته می‌شوند که محصول کافی پیدا شود
+            with closing(self.torob.search_iter(product_name)) as products:
+                candidates = self.torob_candidates(product_name, products)
+            if candidates is None:
                 return self.torob_fallback(product_name)
 
-            products = search_result["results"]
-            if not products:
-                print("❌ هیچ محصولی یافت نشد")
-                return self.torob_fallback(product_name)
+            # دریافت همزمان جزئیات همه محصولات دارای search_id
+            with_search_id = [p for p in candidates if p.get('search_id')]
+            details_list = self.torob.details_many(
+                [p['prk'] for p in with_search_id],
+                [p['search_id'] for p in with_search_id],
+            ) if with_search_id else []
+            details_by_prk = {p['prk']: d for p, d in zip(with_search_id, details_list)}
 
-            print(f"📦 {len(products)} محصول یافت شد")
-            results = []
+            return self.build_torob_results(product_name, candidates, details_by_prk)
 
-            for i, product in enumerate(products[:5]):
-                try:
-                    print(f"Product: {json.dumps(product, ensure_ascii=False)}")
-                    prk = product.get('prk')
-                    search_id = product.get('search_id')
-                    title = product.get('name1', product_name)
-                    if not prk:
-                        print(f"⚠️ محصول بدون prk: {title}")
-                        continue
-                    url = f"https://torob.com/p/{prk}/"
-
-                    # دریافت جزئیات محصول برای قیمت و عکس دقیق
-                    details = self.torob.details(prk, search_id) if prk and search_id else {}
-                    print("Torob details:", json.dumps(details, ensure_ascii=False, indent=2))
-
-                    # قیمت
-                    price = None
-                    if details and 'min_price' in details and details['min_price']:
-                        price = int(details['min_price'])
-                    elif 'price' in product and product['price']:
-                        price = self.normalize_price(product['price'])
-
-                    # عکس
-                    image_url = None
-                    if details and 'image_url' in details and details['image_url']:
-                        image_url = details['image_url']
-                    elif 'image_url' in product and product['image_url']:
-                        image_url = product['image_url']
-
-                    if price and price > 1000:
-                        results.append({
-                            'price': price,
-                            'title': title[:100],
-                            'url': url,
-                            'shop': 'ترب',
-                            'image': image_url
-                        })
-                        print(f"✅ محصول اضافه شد: {title} | {price} | {url}")
-                    else:
-                        print(f"❌ قیمت معتبر نیست: {price}")
+        except Exception as e:
+            logger.exception("❌ خطا کلی در ترب: %s", e)
+            return self.torob_fallback(product_name)
 
-                except Exception as e:
-                    print(f"❌ خطا در محصول {i+1}: {e}")
-                    continue
+    def torob_candidates(self, product_name, products):
+        """
+        محصولات دارای prk از جریان نتایج جستجوی ترب (Torob.search_iter)؛ مصرف به محض
+        جمع شدن محصول کافی متوقف می‌شود. None یعنی باید از fallback استفاده شود
+        """
+        picker = TorobCandidates(product_name)
+        for product in products:
+            if picker.add(product):
+                break
+        return picker.result()
 
-            if results:
-                print(f"🎉 {len(results)} محصول معتبر پیدا شد")
-                return results
-            else:
-                print("❌ هیچ محصول معتبری نبود، استفاده از fallback")
-                return self.torob_fallback(product_name)
+    def build_torob_results(self, product_name, candidates, details_by_prk):
+        """ترکیب محصولات جستجو با جزئیات آن‌ها (قیمت و عکس دقیق)"""
+        results = []
+        for i, product in enumerate(candidates):
+            try:
+                prk = product.get('prk')
+                title = product.get('name1', product_name)
+                url = f"https://torob.com/p/{prk}/"
 
-        except Exception as e:
-            print(f"❌ خطا کلی: {e}")
-            import traceback
-            traceback.print_exc()
+                # جزئیات محصول برای قیمت و عکس دقیق
+                details = details_by_prk.get(prk) or {}
+                log_payload(logger, 'torob', "Torob details", details)
+
+                # قیمت
+                price = None
+                if details and 'min_price' in details and details['min_price']:
+                    price = parse_price(details['min_price'], TOMAN)
+                elif 'price' in product and product['price']:
+                    price = self.normalize_price(product['price'])
+
+                # عکس
+                image_url = None
+                if details and 'image_url' in details and details['image_url']:
+                    image_url = details['image_url']
+                elif 'image_url' in product and product['image_url']:
+                    image_url = product['image_url']
+
+                if price and price > 1000:
+                    results.append({
+                        'price': price,
+                        'title': title[:100],
+                        'url': url,
+                        'shop': 'ترب',
+                        'image': image_url,
+                        'prk': prk
+                    })
+                    # نمودار قیمت محصولات دیده شده در پس‌زمینه همگام می‌شود
+                    if chart_sync is not None:
+                        chart_sync.schedule(prk, product.get('search_id'))
+                    logger.debug("✅ محصول اضافه شد: %s | %s | %s", title, price, url)
+                else:
+                    logger.warning("❌ قیمت معتبر نیست: %s", price)
+
+            except Exception as e:
+                logger.warning("❌ خطا در محصول %s: %s", i+1, e)
+                continue
+
+        if results:
+            logger.debug("🎉 %s محصول معتبر پیدا شد", len(results))
+            return results
+        else:
+            logger.warning("❌ هیچ محصول معتبری نبود، استفاده از fallback")
             return self.torob_fallback(product_name)
 
     def normalize_price(self, price):
-        """تبدیل قیمت به عدد صحیح"""
-        try:
-            if price is None:
-                return None
-            
-            if isinstance(price, (int, float)):
-                return int(price) if price > 0 else None
-            
-            if isinstance(price, str):
-                # حذف کاراکترهای غیرعددی
-                import re
-                clean = re.sub(r'[^\d]', '', price.replace('٬', '').replace(',', ''))
-                if clean:
-                    num = int(clean)
-                    # تبدیل ریال به تومان
-                    if num > 10000000:
-                        num = num // 10
-                    return num if num > 0 else None
-                
-            return None
-        except:
-            return None
+        """تبدیل قیمت به عدد صحیح (تومان)"""
+        return parse_price(price, TOMAN)
 
     def torob_fallback(self, product_name):
         """نتایج شبیه‌سازی شده برای ترب"""
-        print("🔄 استفاده از نتایج شبیه‌سازی شده برای ترب")
+        logger.info("🔄 استفاده از نتایج شبیه‌سازی شده برای ترب")
+        metrics.FALLBACKS.labels('torob').inc()
         results = []
         base_price = random.randint(150000, 1500000)
         
@@ -340,139 +400,268 @@ class PriceFinder:
                 'title': f"{product_name} - نمونه ترب {i+1}",
                 'url': f"https://torob.com/search/?query={urllib.parse.quote(product_name)}",
                 'shop': 'ترب',
-                'image': None
+                'image': None,
+                'fallback': True
             })
         
         return results
     
+    @coalesce('basalam')
+    @records('basalam')
     def search_basalam(self, product_name):
         """جستجو در باسلام با لینک‌های محصولات"""
         try:
-            print(f"🏪 جستجو در باسلام برای: {product_name}")
-            results = []
-            encoded_name = urllib.parse.quote(product_name)
+            logger.debug("🏪 جستجو در باسلام برای: %s", product_name)
+
+            if settings.BASALAM_HEDGE:
+                results = self.basalam_hedged_search(product_name)
+            else:
+                results = (self.basalam_primary_search(product_name)
+                           or self.basalam_alternative_search(product_name)
+                           or self.basalam_web_scraping(product_name))
+            if results:
+                return results
+
+            # اگر نتیجه‌ای نداشتیم، fallback استفاده کنیم
+            return self.basalam_fallback(product_name)
+            
+        except Exception as e:
+            logger.warning("❌ خطا کلی در باسلام: %s", e)
+            return self.basalam_fallback(product_name)
+
+    def basalam_hedged_search(self, product_name):
+        """
+        اجرای hedge شده tierهای باسلام: API اصلی فوراً شروع می‌شود، اگر در
+        hedge delay (بر اساس تأخیرهای اخیر) پاسخ نداد API جایگزین هم شروع می‌شود
+        و اولین نتیجه قابل استفاده برگردانده می‌شود. اسکرپ فقط وقتی اجرا می‌شود
+        که هر دو API بدون نتیجه تمام شوند.
+
+        timeout هر tier hedge شده ضریبی از hedge delay است تا tier بازنده بعد از
+        برگشتن نتیجه زود تمام شود و thread خود را آزاد کند؛ بدنه پاسخ بازنده هم
+        دانلود نمی‌شود. هر جستجو حداکثر یک thread بازنده در hedge_executor باقی
+        می‌گذارد و اگر hedge_executor ظرفیت آزاد نداشته باشد tierها پشت سر هم
+        در همین thread اجرا می‌شوند.
+        """
+        cancel = threading.Event()
+        delay = basalam_primary_latency.hedge_delay()
+        timeout = min(15, delay * settings.BASALAM_HEDGE_TIMEOUT_FACTOR)
 
-            # --- 1. Primary API Request ---
+        def timed_primary():
+            started = time.monotonic()
             try:
-                primary_url = f"https://search.basalam.com/ai-engine/api/v2.0/product/search?from=0&q={encoded_name}&dynamicFacets=true&size=12&enableNavigations=true"
-                headers = {
-                    "Accept": "application/json",
-                    "User-Agent": self.headers.get('User-Agent', 'Mozilla/5.0')
-                }
-
-                print(f"🔗 ارسال درخواست به API اصلی باسلام: {primary_url}")
-                response = requests.get(primary_url, headers=headers, timeout=15, verify=False)
-
-                if response.status_code == 200:
-                    search_data = response.json()
-
-                    # استخراج مستقیم از لیست محصولات
-                    if 'products' in search_data and search_data['products']:
-                        print(f"📦 پیدا شد {len(search_data['products'])} محصول در پاسخ API اصلی.")
-                        for product in search_data['products'][:5]:
-                            try:
-                                if 'price' in product and isinstance(product['price'], (int, float)):
-                                    price_value = product['price'] // 10
-                                    if price_value > 1000:
-                                        product_info = {
-                                            'price': price_value,
-                                            'title': product.get('name', 'محصول باسلام'),
-                                            'url': f"https://basalam.com/p/{product.get('id', '')}/",
-                                            'shop': 'باسلام',
-                                            'image': product.get('photo',{}).get(
-                                                'MEDIUM'
-                                            )
-                                        }
-                                        results.append(product_info)
-                            except Exception as e:
-                                print(f"❌ خطا در پردازش محصول باسلام: {e}")
-                                continue
+                return self.basalam_primary_search(product_name, cancel, timeout)
+            finally:
+                basalam_primary_latency.add(time.monotonic() - started)
 
+        primary = submit_hedged(timed_primary)
+        if primary is None:
+            logger.debug("⏳ hedge_executor پر است، tierهای باسلام پشت سر هم اجرا می‌شوند")
+            return (self.basalam_primary_search(product_name)
+                    or self.basalam_alternative_search(product_name)
+                    or self.basalam_web_scraping(product_name))
+
+        pending = {primary}
+        alternative_started = False
+        alternative_inline = False
+
+        try:
+            while pending:
+                wait_timeout = None if alternative_started else delay
+                done, pending = wait(pending, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        logger.warning("❌ خطا در tier باسلام: %s", e)
+                        results = []
                     if results:
-                        print(f"✅ نتایج نهایی از API اصلی باسلام: {len(results)} محصول")
                         return results
 
-            except requests.exceptions.RequestException as e:
-                print(f"❌ Error during Primary API request: {e}")
-            except json.JSONDecodeError as e:
-                print(f"❌ Error decoding JSON from Primary API: {e}")
+                if not alternative_started:
+                    # API اصلی کند بود یا بدون نتیجه تمام شد
+                    if not done:
+                        logger.debug("⏱️ API اصلی باسلام در %.2f ثانیه پاسخ نداد، شروع API جایگزین", delay)
+                    alternative = submit_hedged(self.basalam_alternative_search, product_name, cancel, timeout)
+                    if alternative is None:
+                        # بدون thread آزاد، API جایگزین بعد از API اصلی اجرا می‌شود
+                        alternative_inline = True
+                    else:
+                        pending.add(alternative)
+                    alternative_started = True
+        finally:
+            # tier بازنده بدنه پاسخش را دانلود نمی‌کند و حداکثر تا timeout خود ادامه می‌دهد
+            cancel.set()
+            for future in pending:
+                future.cancel()
 
-            # --- 2. Alternative API (Fallback) ---
-            if not results:
-                try:
-                    print("🔄 Primary API failed. Trying Alternative API...")
-                    alt_url = f"https://api.basalam.com/api/v2/product/search?query={encoded_name}"
-                    print(f"🔗 Sending request to Alternative API: {alt_url}")
-                    alt_response = requests.get(alt_url, headers=self.headers, timeout=15, verify=False)
-
-                    if alt_response.status_code == 200:
-                        alt_data = alt_response.json()
-                        if 'products' in alt_data and alt_data['products']:
-                            for product in alt_data['products'][:5]:
-                                if 'price' in product and isinstance(product['price'], (int, float)):
-                                    price_value = product['price']
-                                    if price_value > 1000:
-                                        results.append({
-                                            'price': price_value,
-                                            'title': product.get('title', 'محصول باسلام'),
-                                            'url': f"https://basalam.com/p/{product.get('id', '')}/",
-                                            'shop': 'باسلام',
-                                            'image': product.get('image_url')
-                                        })
-                        if results:
-                            print(f"✅ Final prices from Basalam Alternative API: {results}")
-                            return results
-
-                except requests.exceptions.RequestException as e:
-                    print(f"❌ Error during Alternative API request: {e}")
-                except json.JSONDecodeError as e:
-                    print(f"❌ Error decoding JSON from Alternative API: {e}")
-
-            # --- 3. Web Scraping (Final Fallback) ---
-            if not results:
-                try:
-                    print("🔄 All APIs failed. Trying Web Scraping...")
-                    scrape_url = f"https://basalam.com/search?q={encoded_name}"
-                    scrape_response = requests.get(scrape_url, headers=self.headers, timeout=15, verify=False)
-
-                    if scrape_response.status_code == 200:
-                        soup = BeautifulSoup(scrape_response.text, 'html.parser')
-                        # A more general selector to find price elements
-                        price_elements = soup.find_all('span', string=re.compile(r'تومان|ریال'))
-                
-                        print(f"📦 Found {len(price_elements)} potential price elements via scraping.")
-                        for element in price_elements[:5]:
-                            price_text = element.get_text().strip()
-                            # Extract numbers and remove formatting
-                            numbers = re.findall(r'[\d,]+', price_text.replace('٬', ''))
-                            if numbers:
-                                price_value = int(numbers[0].replace(',', ''))
-                                if price_value > 1000:
-                                    results.append({
-                                        'price': price_value,
-                                        'title': f'محصول باسلام',
-                                        'url': f"https://basalam.com/search?q={encoded_name}",
-                                        'shop': 'باسلام',
-                                        'image': None
-                                    })
-                
-                        if results:
-                            print(f"✅ Final prices from Web Scraping: {results}")
-                            return results 
+        if alternative_inline:
+            results = self.basalam_alternative_search(product_name)
+            if results:
+                return results
+        return self.basalam_web_scraping(product_name)
+
+    @observe('basalam_primary_search')
+    @traced('basalam_primary_search')
+    def basalam_primary_search(self, product_name, cancel=None, timeout=15):
+        """API اصلی (موتور جستجوی search.basalam.com)"""
+        results = []
+        try:
+            primary_url, headers = self.basalam_primary_request(product_name)
+
+            logger.debug("🔗 ارسال درخواست به API اصلی باسلام: %s", primary_url)
+            response = http_client.get(primary_url, endpoint='basalam_primary', headers=headers, timeout=timeout,
+                                  stream=cancel is not None, verify=False)
+            if cancel is not None and cancel.is_set():
+                # نتیجه tier دیگر برگشته؛ بدنه دانلود نمی‌شود
+                response.close()
+                return []
+
+            if response.status_code == 200:
+                results = self.parse_basalam_primary(http_client.decode_json(response))
+
+        except requests.exceptions.RequestException as e:
+            logger.warning("❌ Error during Primary API request: %s", e)
+        except json.JSONDecodeError as e:
+            logger.warning("❌ Error decoding JSON from Primary API: %s", e)
+        return results
+
+    def basalam_primary_request(self, product_name):
+        """آدرس و هدرهای API اصلی باسلام"""
+        encoded_name = urllib.parse.quote(product_name)
+        primary_url = f"{settings.BASALAM_SEARCH_BASE_URL}/ai-engine/api/v2.0/product/search?from=0&q={encoded_name}&dynamicFacets=true&size=12&enableNavigations=true"
+        headers = {
+            "Accept": "application/json",
+            "User-Agent": self.headers.get('User-Agent', 'Mozilla/5.0')
+        }
+        return primary_url, headers
+
+    def parse_basalam_primary(self, search_data):
+        """استخراج محصولات از پاسخ API اصلی باسلام"""
+        results = []
 
+        # استخراج مستقیم از لیست محصولات
+        if 'products' in search_data and search_data['products']:
+            logger.debug("📦 پیدا شد %s محصول در پاسخ API اصلی.", len(search_data['products']))
+            for product in search_data['products'][:5]:
+                try:
+                    if 'price' in product and isinstance(product['price'], (int, float)):
+                        # موتور جستجوی باسلام قیمت را به ریال برمی‌گرداند
+                        price_value = parse_price(product['price'], RIAL)
+                        if price_value and price_value > 1000:
+                            product_info = {
+                                'price': price_value,
+                                'title': product.get('name', 'محصول باسلام'),
+                                'url': f"https://basalam.com/p/{product.get('id', '')}/",
+                                'shop': 'باسلام',
+                                'image': product.get('photo',{}).get(
+                                    'MEDIUM'
+                                )
+                            }
+                            results.append(product_info)
                 except Exception as e:
-                    print(f"❌ Error during web scraping: {e}")
-            
-            # اگر نتیجه‌ای نداشتیم، fallback استفاده کنیم
-            return self.basalam_fallback(product_name)
-            
+                    logger.warning("❌ خطا در پردازش محصول باسلام: %s", e)
+                    continue
+
+        if results:
+            logger.debug("✅ نتایج نهایی از API اصلی باسلام: %s محصول", len(results))
+        return results
+
+    @observe('basalam_alternative_search')
+    @traced('basalam_alternative_search')
+    def basalam_alternative_search(self, product_name, cancel=None, timeout=15):
+        """API جایگزین (api.basalam.com)"""
+        results = []
+        try:
+            alt_url = self.basalam_alternative_url(product_name)
+            logger.debug("🔗 Sending request to Alternative API: %s", alt_url)
+            alt_response = http_client.get(alt_url, endpoint='basalam_alternative', headers=self.headers, timeout=timeout,
+                                  stream=cancel is not None, verify=False)
+            if cancel is not None and cancel.is_set():
+                # نتیجه tier دیگر برگشته؛ بدنه دانلود نمی‌شود
+                alt_response.close()
+                return []
+
+            if alt_response.status_code == 200:
+                results = self.parse_basalam_alternative(http_client.decode_json(alt_response))
+
+        except requests.exceptions.RequestException as e:
+            logger.warning("❌ Error during Alternative API request: %s", e)
+        except json.JSONDecodeError as e:
+            logger.warning("❌ Error decoding JSON from Alternative API: %s", e)
+        return results
+
+    def basalam_alternative_url(self, product_name):
+        encoded_name = urllib.parse.quote(product_name)
+        return f"{settings.BASALAM_API_BASE_URL}/api/v2/product/search?query={encoded_name}"
+
+    def parse_basalam_alternative(self, alt_data):
+        """استخراج محصولات از پاسخ API جایگزین باسلام"""
+        results = []
+        if 'products' in alt_data and alt_data['products']:
+            for product in alt_data['products'][:5]:
+                if 'price' in product and isinstance(product['price'], (int, float)):
+                    price_value = parse_price(product['price'], TOMAN)
+                    if price_value and price_value > 1000:
+                        results.append({
+                            'price': price_value,
+                            'title': product.get('title', 'محصول باسلام'),
+                            'url': f"https://basalam.com/p/{product.get('id', '')}/",
+                            'shop': 'باسلام',
+                            'image': product.get('image_url')
+                        })
+        if results:
+            logger.debug("✅ Final prices from Basalam Alternative API: %s", results)
+        return results
+
+    @observe('basalam_web_scraping')
+    @traced('basalam_web_scraping')
+    def basalam_web_scraping(self, product_name):
+        """وب اسکرپینگ صفحه جستجوی باسلام (آخرین راه)"""
+        results = []
+        try:
+            logger.info("🔄 All APIs failed. Trying Web Scraping...")
+            scrape_url = self.basalam_scrape_url(product_name)
+            scrape_response = http_client.get(scrape_url, endpoint='basalam_scrape', headers=self.headers, timeout=15, verify=False)
+
+            if scrape_response.status_code == 200:
+                results = self.parse_basalam_scrape(product_name, scrape_response.text)
+
         except Exception as e:
-            print(f"❌ خطا کلی در باسلام: {e}")
-            return self.basalam_fallback(product_name)
+            logger.warning("❌ Error during web scraping: %s", e)
+        return results
+
+    def basalam_scrape_url(self, product_name):
+        encoded_name = urllib.parse.quote(product_name)
+        return f"{settings.BASALAM_WEB_BASE_URL}/search?q={encoded_name}"
+
+    def parse_basalam_scrape(self, product_name, html):
+        """قیمت‌های صفحه جستجوی باسلام"""
+        results = []
+        encoded_name = urllib.parse.quote(product_name)
+
+        # فقط span‌هایی که متن قیمت (تومان/ریال) دارند
+        price_texts = extract_price_texts(html, limit=5)
+
+        logger.debug("📦 Found %s potential price elements via scraping.", len(price_texts))
+        for price_value in parse_prices(price_texts, TOMAN):
+            if price_value and price_value > 1000:
+                results.append({
+                    'price': price_value,
+                    'title': f'محصول باسلام',
+                    'url': f"https://basalam.com/search?q={encoded_name}",
+                    'shop': 'باسلام',
+                    'image': None
+                })
+
+        if results:
+            logger.debug("✅ Final prices from Web Scraping: %s", results)
+        return results
 
     def basalam_fallback(self, product_name):
         """نتایج شبیه‌سازی شده برای باسلام"""
-        print("🔄 استفاده از نتایج شبیه‌سازی شده برای باسلام")
+        logger.info("🔄 استفاده از نتایج شبیه‌سازی شده برای باسلام")
+        metrics.FALLBACKS.labels('basalam').inc()
         results = []
         base_price = random.randint(80000, 800000)
         
@@ -484,21 +673,342 @@ class PriceFinder:
                 'title': f"{product_name} - نمونه باسلام {i+1}",
                 'url': f"https://basalam.com/search?q={urllib.parse.quote(product_name)}",
                 'shop': 'باسلام',
-                'image': None
+                'image': None,
+                'fallback': True
             })
         
         return results
 
-def remove_outliers(prices):
-    if len(prices) < 4:
-        return prices  # برای داده‌های کم، حذف نکن
-    sorted_prices = sorted(prices)
-    q1 = statistics.median(sorted_prices[:len(sorted_prices)//2])
-    q3 = statistics.median(sorted_prices[(len(sorted_prices)+1)//2:])
-    iqr = q3 - q1
-    lower = q1 - 1.5 * iqr
-    upper = q3 + 1.5 * iqr
-    return [p for p in prices if lower <= p <= upper]
+# executor مشترک و محدود برای جستجوی همزمان فروشگاه‌ها
+search_executor = ThreadPoolExecutor(max_workers=settings.SEARCH_MAX_WORKERS,
+                                     thread_name_prefix='search')
+
+# executor جداگانه برای tierهای hedge شده باسلام (داخل search_executor منتظر می‌مانند)
+hedge_executor = ThreadPoolExecutor(max_workers=settings.SEARCH_MAX_WORKERS,
+                                    thread_name_prefix='hedge')
+
+# هر tier hedge شده تا پایان اجرا یک جای hedge_executor را نگه می‌دارد؛ کار جدید فقط
+# با جای آزاد ارسال می‌شود تا tierهای بازنده صف executor را پر نکنند
+hedge_slots = threading.BoundedSemaphore(settings.SEARCH_MAX_WORKERS)
+
+
+def submit_hedged(func, *args):
+    """اجرای func در hedge_executor اگر thread آزاد باشد؛ در غیر این صورت None"""
+    if not hedge_slots.acquire(blocking=False):
+        return None
+    try:
+        future = hedge_executor.submit(bind(func), *args)
+    except BaseException:
+        hedge_slots.release()
+        raise
+    future.add_done_callback(lambda _: hedge_slots.release())
+    return future
+
+
+# تأخیرهای اخیر API اصلی باسلام برای تعیین hedge delay
+basalam_primary_latency = LatencyTracker(
+    default=settings.BASALAM_HEDGE_DELAY,
+    percentile=settings.BASALAM_HEDGE_PERCENTILE,
+    minimum=settings.BASALAM_HEDGE_MIN_DELAY,
+    maximum=settings.BASALAM_HEDGE_MAX_DELAY,
+)
+
+# یک نمونه مشترک از PriceFinder برای همه درخواست‌ها
+price_finder = PriceFinder()
+
+# فروشگاه‌ها و متد جستجوی هر کدام
+SOURCES = (
+    ('دیجی‌کالا', 'search_digikala'),
+    ('ترب', 'search_torob'),
+    ('باسلام', 'search_basalam'),
+)
+
+# گرم نگه داشتن cache برای عبارت‌های پرتکرار و watchlist
+refresh_scheduler = create_scheduler(result_cache, price_finder, SOURCES)
+
+# index پیشنهاد تکمیل خودکار /suggest
+typeahead = create_typeahead(price_history)
+
+
+def note_search(product_name):
+    """ثبت یک جستجوی کاربر برای گرم نگه داشتن cache و پیشنهادهای typeahead"""
+    if refresh_scheduler is not None:
+        refresh_scheduler.note(product_name)
+    if typeahead is not None:
+        typeahead.note_search(product_name)
+
+
+def _timed_search(source, search_func, product_name, deadline=None):
+    """
+    اجرای جستجوی یک فروشگاه (از طریق cache) و اندازه‌گیری زمان آن و انتظار rate limit؛
+    درخواست‌های بیرونی بعد از deadline (زمان monotonic) در صف rate limit نمی‌مانند.
+    """
+    started = time.monotonic()
+    with span('source', source=source) as current, wait_scope(deadline) as waits:
+        if result_cache is not None:
+            results, cache_meta = result_cache.get_or_fetch(
+                source, product_name, lambda: search_func(product_name) or [])
+        else:
+            results, cache_meta = search_func(product_name), None
+        if current is not None and cache_meta is not None:
+            current.attrs.update(cache_hit=cache_meta["hit"], stale=cache_meta["stale"])
+    return results or [], cache_meta, time.monotonic() - started, waits.waited
+
+
+def _metric_source(method):
+    """برچسب لاتین فروشگاه در متریک‌ها (search_torob → torob)"""
+    return method[len('search_'):]
+
+
+def source_info(method, results, cache_meta, elapsed, rate_limit_wait=0.0):
+    """info فروشگاهی که پاسخ داده در results_breakdown، همراه با ثبت متریک‌ها"""
+    source = _metric_source(method)
+    info = {"status": "ok", "count": len(results), "elapsed_ms": int(elapsed * 1000)}
+    if rate_limit_wait:
+        info["rate_limit_wait_ms"] = int(rate_limit_wait * 1000)
+    if cache_meta is not None:
+        info["cache"] = cache_meta
+    if cache_meta is None or not cache_meta["hit"]:
+        metrics.PRODUCTS_PARSED.labels(source).inc(
+            sum(1 for item in results if not item.get('fallback')))
+    metrics.SOURCE_REQUESTS.labels(source, "ok").inc()
+    return info
+
+
+def failed_source_info(method, status, elapsed):
+    """info فروشگاهی که خطا داد (error) یا در مهلت پاسخ نداد (timeout)"""
+    metrics.SOURCE_REQUESTS.labels(_metric_source(method), status).inc()
+    return {"status": status, "count": 0, "elapsed_ms": int(elapsed * 1000)}
+
+
+def iter_source_results(finder, product_name, deadline=None):
+    """
+    جستجوی همزمان در همه فروشگاه‌ها با یک مهلت کلی.
+    به ازای هر فروشگاه به محض آماده شدن (shop, results, info) برمی‌گرداند؛
+    info شامل status (ok / timeout / error)، تعداد و زمان است.
+    """
+    if deadline is None:
+        deadline = settings.SEARCH_DEADLINE
+    started = time.monotonic()
+
+    futures = {
+        search_executor.submit(bind(_timed_search), method, getattr(finder, method), product_name,
+                               started + deadline): (shop, method)
+        for shop, method in SOURCES
+    }
+
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            pending.discard(future)
+            shop, method = futures[future]
+            try:
+                results, cache_meta, elapsed, waited = future.result()
+                info = source_info(method, results, cache_meta, elapsed, waited)
+            except Exception as e:
+                logger.warning("❌ خطا در جستجوی %s: %s", shop, e)
+                results = []
+                info = failed_source_info(method, "error", time.monotonic() - started)
+            yield shop, results, info
+    except FuturesTimeout:
+        pass
+
+    # فروشگاه‌هایی که در مهلت پاسخ ندادند
+    for future in pending:
+        future.cancel()
+        shop, method = futures[future]
+        logger.warning("⏱️ %s در مهلت %s ثانیه پاسخ نداد", shop, deadline)
+        yield shop, [], failed_source_info(method, "timeout", deadline)
+
+
+def search_all_sources(finder, product_name, deadline=None):
+    """جمع‌آوری نتایج همه فروشگاه‌ها به ترتیب ثابت SOURCES"""
+    collected = {}
+    for shop, results, info in iter_source_results(finder, product_name, deadline):
+        collected[shop] = (results, info)
+
+    results_by_shop = {shop: collected[shop][0] for shop, _ in SOURCES}
+    breakdown = {shop: collected[shop][1] for shop, _ in SOURCES}
+    return results_by_shop, breakdown
+
+
+def summarize_cache(results_breakdown):
+    """خلاصه وضعیت cache برای متادیتای پاسخ /search"""
+    served = {shop: info["cache"] for shop, info in results_breakdown.items() if "cache" in info}
+    hits = sum(1 for meta in served.values() if meta["hit"])
+    return {
+        "hits": hits,
+        "misses": len(served) - hits,
+        "hit_ratio": round(hits / len(served), 3) if served else 0.0,
+        "ages": {shop: meta["age"] for shop, meta in served.items()},
+    }
+
+
+def format_product(result):
+    """جزئیات نمایشی یک محصول با لینک"""
+    return {
+        'price': result['price'],
+        'title': result.get('title', 'محصول'),
+        'url': result.get('url', '#'),
+        'image': result.get('image'),
+        'formatted_price': f"{result['price']:,} تومان"
+    }
+
+
+def format_shop_stats(stats):
+    """خروجی نمایشی آمار یک فروشگاه (count/min/max/avg)"""
+    return {
+        "count": stats["count"],
+        "min": stats["min"],
+        "max": stats["max"],
+        "avg": stats["avg"],
+        "formatted_min": f"{stats['min']:,} تومان",
+        "formatted_max": f"{stats['max']:,} تومان",
+        "formatted_avg": f"{int(stats['avg']):,} تومان"
+    }
+
+
+def shop_stats(shop_prices):
+    """آمار قیمت‌های یک فروشگاه"""
+    total = sum(shop_prices)
+    return format_shop_stats({
+        "count": len(shop_prices),
+        "min": min(shop_prices),
+        "max": max(shop_prices),
+        "avg": total / len(shop_prices),
+    })
+
+
+def _valid_results(results_by_shop):
+    """ترکیب نتایج فروشگاه‌ها به ترتیب SOURCES و فیلتر قیمت‌های معتبر"""
+    all_results = []
+    for shop, _ in SOURCES:
+        all_results.extend(results_by_shop[shop])
+    return all_results, [r for r in all_results if r.get('price', 0) > 1000]
+
+
+@traced('aggregate')
+def build_price_report(product_name, results_by_shop, results_breakdown,
+                       calculated_price=None, strategy='balanced'):
+    """تجمیع نتایج فروشگاه‌ها و محاسبه آمار و قیمت پیشنهادی"""
+    all_results, valid_results = _valid_results(results_by_shop)
+    logger.debug("📦 مجموع نتایج: %s محصول", len(all_results))
+
+    if not all_results:
+        return {
+            "success": False,
+            "message": "محصولی در هیچ فروشگاهی یافت نشد",
+            "results_breakdown": results_breakdown
+        }
+    if not valid_results:
+        return {
+            "success": False,
+            "message": "قیمت معتبری یافت نشد",
+            "results_breakdown": results_breakdown
+        }
+
+    # حذف آگهی‌های تکراری بین فروشگاه‌ها قبل از حذف داده پرت
+    if settings.DEDUPE_ENABLED:
+        kept, duplicates = dedupe(valid_results, settings.DEDUPE_THRESHOLD,
+                                  settings.DEDUPE_PRICE_TOLERANCE, prefer=_is_original_listing)
+    else:
+        kept, duplicates = valid_results, 0
+
+    # حذف داده‌های پرت، آمار کلی، میانه و آمار هر فروشگاه
+    summary = price_stats.summarize([r['price'] for r in kept],
+                                    [r.get('shop', 'نامشخص') for r in kept])
+    # روند از همه محصولات ترب (حتی آن‌هایی که تکراری حذف شدند)
+    trend = price_trend(valid_results)
+    suggested_price = price_stats.suggest_price(
+        summary["fair_price"], calculated_price, strategy,
+        1 + trend["adjustment"] if trend else 1.0)
+    return _price_report(product_name, results_breakdown, kept, summary,
+                         suggested_price, calculated_price, strategy, trend, duplicates)
+
+
+def _is_original_listing(result):
+    """ترب آگهی فروشگاه‌های دیگر را تجمیع می‌کند؛ از هر خوشه تکراری آگهی اصلی نگه داشته می‌شود"""
+    return result.get('shop') != 'ترب'
+
+
+def price_trend(valid_results):
+    """
+    روند اخیر قیمت محصولات ترب از نمودارهای همگام شده محلی (بدون درخواست به ترب).
+    adjustment ضریبی است که به سهم بازار در قیمت پیشنهادی اعمال می‌شود.
+    """
+    if chart_sync is None or not settings.PRICE_MOMENTUM_WEIGHT:
+        return None
+    prks = [r['prk'] for r in valid_results if r.get('prk')]
+    trend = chart_sync.momentum(prks) if prks else None
+    if trend is None:
+        return None
+    momentum = max(-settings.PRICE_MOMENTUM_MAX, min(settings.PRICE_MOMENTUM_MAX, trend["momentum"]))
+    trend["momentum"] = round(trend["momentum"], 4)
+    trend["adjustment"] = round(momentum * settings.PRICE_MOMENTUM_WEIGHT, 4)
+    return trend
+
+
+def _price_report(product_name, results_breakdown, valid_results, summary,
+                  suggested_price, calculated_price, strategy, trend=None, duplicates=0):
+    min_price = summary["min"]
+    max_price = summary["max"]
+    avg_price = summary["avg"]
+
+    # قیمت پیشنهادی نهایی بر اساس استراتژی و قیمت پایه کاربر
+    if calculated_price and isinstance(calculated_price, (int, float)):
+        strategy_text = price_stats.strategy_weights(strategy)[2]
+        explanation = f"این قیمت با توجه به تحلیل بازار، قیمت پایه شما و «{strategy_text}» ارائه شده است."
+    else:
+        explanation = "این قیمت بر اساس تحلیل بازار پیشنهاد شده است."
+    if trend and trend["adjustment"]:
+        explanation += f" روند {trend['momentum']:+.1%} قیمت اخیر در ترب هم لحاظ شده است."
+
+    # گروه‌بندی بر اساس فروشگاه با جزئیات کامل
+    sources = {}
+    detailed_products = {}
+    for result in valid_results:
+        shop = result.get('shop', 'نامشخص')
+        if shop not in sources:
+            sources[shop] = []
+            detailed_products[shop] = []
+
+        # اضافه کردن قیمت به لیست ساده
+        sources[shop].append(result['price'])
+
+        # اضافه کردن جزئیات کامل محصول با لینک
+        detailed_products[shop].append(format_product(result))
+
+    # آمار تفصیلی هر فروشگاه
+    source_stats = {shop: format_shop_stats(stats) for shop, stats in summary["shops"].items()}
+
+    response_data = {
+        "success": True,
+        "product_name": product_name,
+        "min_price": int(min_price),
+        "max_price": int(max_price),
+        "avg_price": int(avg_price),
+        "price_range": f"{int(min_price):,} - {int(max_price):,} تومان",
+        "formatted_min_price": f"{int(min_price):,} تومان",
+        "formatted_max_price": f"{int(max_price):,} تومان",
+        "formatted_avg_price": f"{int(avg_price):,} تومان",
+        "final_suggested_price": suggested_price,
+        "formatted_final_suggested_price": f"{suggested_price:,} تومان",
+        "explanation": explanation,
+        "price_trend": trend,
+        "sources": sources,  # قیمت‌های ساده برای نمایش آمار
+        "detailed_products": detailed_products,  # جزئیات کامل با لینک
+        "source_stats": source_stats,
+        "total_results": len(valid_results),
+        "duplicates_removed": duplicates,
+        "results_breakdown": results_breakdown,
+        "cache": summarize_cache(results_breakdown)
+    }
+
+    logger.info("📊 قیمت پیشنهادی نهایی: %s تومان | رنج قیمت: %s - %s تومان | فروشگاه‌ها: %s",
+                suggested_price, int(min_price), int(max_price), list(sources))
+
+    return response_data
+
 
 # Flask Routes
 @app.route('/')
@@ -506,7 +1016,16 @@ def index():
     """صفحه اصلی"""
     return render_template('index.html')
 
+def _debug_flag(name):
+    """فعال بودن حالت دیباگ با هدر X-Debug-<Name>: 1 یا پارامتر ?<name>=1"""
+    return request.headers.get(f'X-Debug-{name.title()}') == '1' or request.args.get(name) == '1'
+
+def _is_admin():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(settings.ADMIN_TOKEN) and hmac.compare_digest(token, settings.ADMIN_TOKEN)
+
 @app.route('/search', methods=['POST'])
+@metrics.SEARCH_LATENCY.labels('search').time()
 def search_products():
     """جستجو در همه فروشگاه‌ها با لینک‌های محصولات"""
     try:
@@ -514,181 +1033,353 @@ def search_products():
         if not data or 'product_name' not in data:
             return jsonify({"success": False, "message": "product_name is required"}), 400
         
-        product_name = data['product_name']
+        product_name = normalize_persian(data['product_name'])
         calculated_price = data.get('calculated_price')
-        print(f"🔍 جستجو برای: {product_name}")
-        
-        finder = PriceFinder()
+        logger.info("🔍 جستجو برای: %s", product_name)
+        note_search(product_name)
         
-        # جستجو در همه فروشگاه‌ها
-        print("📱 جستجو در دیجی‌کالا...")
-        digikala_results = finder.search_digikala(product_name)
-        print(f"✅ دیجی‌کالا: {len(digikala_results)} محصول")
-        
-        print("🛒 جستجو در ترب...")
-        torob_results = finder.search_torob(product_name)
-        print(f"✅ ترب: {len(torob_results)} محصول")
-        
-        print("🏪 جستجو در باسلام...")
-        basalam_results = finder.search_basalam(product_name)
-        print(f"✅ باسلام: {len(basalam_results)} محصول")
-        
-        # ترکیب همه نتایج
-        all_results = []
-        all_results.extend(digikala_results)
-        all_results.extend(torob_results)
-        all_results.extend(basalam_results)
-        
-        print(f"📦 مجموع نتایج: {len(all_results)} محصول")
-        
-        if not all_results:
-            return jsonify({
-                "success": False,
-                "message": "محصولی در هیچ فروشگاهی یافت نشد"
-            })
-        
-        # فیلتر کردن محصولات با قیمت معتبر
-        valid_results = [r for r in all_results if r.get('price', 0) > 1000]
-        
-        if not valid_results:
-            return jsonify({
-                "success": False,
-                "message": "قیمت معتبری یافت نشد"
-            })
+        finder = price_finder
         
-        # استخراج قیمت‌ها
-        prices = [r['price'] for r in valid_results]
+        want_profile = _debug_flag('profile')
+        if want_profile and not _is_admin():
+            return jsonify({"success": False, "message": "admin token required for profiling"}), 403
         
-        # حذف داده‌های پرت
-        filtered_prices = remove_outliers(prices)
-        if not filtered_prices:
-            filtered_prices = prices  # اگر همه حذف شدند، همان قبلی را نگه دار
-
-        # محاسبه آمار
-        min_price = min(filtered_prices)
-        max_price = max(filtered_prices)
-        avg_price = sum(filtered_prices) / len(filtered_prices)
-        
-        # محاسبه قیمت منصفانه (میانه)
-        sorted_prices = sorted(filtered_prices)
-        n = len(sorted_prices)
-        if n % 2 == 0:
-            fair_price = (sorted_prices[n//2 - 1] + sorted_prices[n//2]) / 2
-        else:
-            fair_price = sorted_prices[n//2]
-        
-        # قیمت پیشنهادی نهایی بر اساس استراتژی و قیمت پایه کاربر
-        strategy = data.get('strategy', 'balanced')
-        explanation = "این قیمت بر اساس تحلیل بازار پیشنهاد شده است."
-
-        if calculated_price and isinstance(calculated_price, (int, float)):
-            if strategy == 'competitive':
-                market_weight, your_weight = 0.7, 0.3
-                strategy_text = "استراتژی رقابتی"
-            elif strategy == 'value-based':
-                market_weight, your_weight = 0.3, 0.7
-                strategy_text = "استراتژی مبتنی بر ارزش"
-            else:  # balanced
-                market_weight, your_weight = 0.5, 0.5
-                strategy_text = "استراتژی متعادل"
+        with ExitStack() as stack:
+            root = stack.enter_context(trace('search', product_name=product_name)) \
+                if _debug_flag('trace') else None
+            profile = stack.enter_context(profile_request()) if want_profile else None
             
-            suggested_price = int((fair_price * market_weight) + (float(calculated_price) * your_weight))
-            explanation = f"این قیمت با توجه به تحلیل بازار، قیمت پایه شما و «{strategy_text}» ارائه شده است."
-        else:
-            suggested_price = int(fair_price)
-        
-        # گروه‌بندی بر اساس فروشگاه با جزئیات کامل
-        sources = {}
-        detailed_products = {}
-        
-        for result in valid_results:
-            shop = result.get('shop', 'نامشخص')
-            if shop not in sources:
-                sources[shop] = []
-                detailed_products[shop] = []
+            # جستجوی همزمان در همه فروشگاه‌ها با مهلت کلی
+            results_by_shop, results_breakdown = search_all_sources(finder, product_name)
+            for shop, info in results_breakdown.items():
+                logger.info("✅ %s: %s محصول (%s, %sms)", shop, info['count'], info['status'], info['elapsed_ms'])
             
-            # اضافه کردن قیمت به لیست ساده
-            sources[shop].append(result['price'])
-            
-            # اضافه کردن جزئیات کامل محصول با لینک
-            detailed_products[shop].append({
-                'price': result['price'],
-                'title': result.get('title', 'محصول'),
-                'url': result.get('url', '#'),
-                'image': result.get('image'),
-                'formatted_price': f"{result['price']:,} تومان"
-            })
+            response_data = build_price_report(product_name, results_by_shop, results_breakdown,
+                                               calculated_price, data.get('strategy', 'balanced'))
         
-        # آمار تفصیلی هر فروشگاه
-        source_stats = {}
-        for shop, shop_prices in sources.items():
-            if shop_prices:
-                source_stats[shop] = {
-                    "count": len(shop_prices),
-                    "min": min(shop_prices),
-                    "max": max(shop_prices),
-                    "avg": sum(shop_prices) / len(shop_prices),
-                    "formatted_min": f"{min(shop_prices):,} تومان",
-                    "formatted_max": f"{max(shop_prices):,} تومان",
-                    "formatted_avg": f"{int(sum(shop_prices) / len(shop_prices)):,} تومان"
-                }
+        if root is not None:
+            response_data["trace"] = root.to_dict()
+        if profile is not None:
+            response_data["profile"] = profile
         
-        response_data = {
-            "success": True,
-            "product_name": product_name,
-            "min_price": int(min_price),
-            "max_price": int(max_price),
-            "avg_price": int(avg_price),
-            "price_range": f"{int(min_price):,} - {int(max_price):,} تومان",
-            "formatted_min_price": f"{int(min_price):,} تومان",
-            "formatted_max_price": f"{int(max_price):,} تومان",
-            "formatted_avg_price": f"{int(avg_price):,} تومان",
-            "final_suggested_price": suggested_price,
-            "formatted_final_suggested_price": f"{suggested_price:,} تومان",
-            "explanation": explanation,
-            "sources": sources,  # قیمت‌های ساده برای نمایش آمار
-            "detailed_products": detailed_products,  # جزئیات کامل با لینک
-            "source_stats": source_stats,
-            "total_results": len(valid_results),
-            "results_breakdown": {
-                "دیجی‌کالا": len(digikala_results),
-                "ترب": len(torob_results),
-                "باسلام": len(basalam_results)
-            }
-        }
-        
-        print(f"📊 آمار نهایی:")
-        print(f"   💰 قیمت پیشنهادی نهایی: {suggested_price:,} تومان")
-        print(f"   📈 رنج قیمت: {int(min_price):,} - {int(max_price):,} تومان")
-        print(f"   🏪 فروشگاه‌ها: {list(sources.keys())}")
-        
-                # تنظیم encoding برای فارسی
+        # تنظیم encoding برای فارسی
         response = jsonify(response_data)
         response.headers['Content-Type'] = 'application/json; charset=utf-8'
         return response
         
+    except ProfilerBusy:
+        return jsonify({"success": False, "message": "another request is being profiled"}), 409
     except Exception as e:
-        print(f"❌ خطا در جستجو: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ خطا در جستجو: %s", e)
         return jsonify({
             "success": False,
             "message": f"خطا در جستجو: {str(e)}"
         }), 500
 
-@app.route('/api/status', methods=['GET'])
-def api_status():
-    """وضعیت API"""
+def _sse_event(event, payload):
+    """قالب‌بندی یک رویداد Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/search/stream', methods=['GET'])
+def search_products_stream():
+    """
+    نسخه استریم /search: به ازای هر فروشگاه به محض آماده شدن یک رویداد source
+    و در پایان رویداد done با همان خروجی کامل /search ارسال می‌شود.
+    """
+    product_name = normalize_persian(request.args.get('product_name', ''))
+    if not product_name:
+        return jsonify({"success": False, "message": "product_name is required"}), 400
+    note_search(product_name)
+
+    calculated_price = request.args.get('calculated_price', type=float)
+    strategy = request.args.get('strategy', 'balanced')
+
+    def generate():
+        results_by_shop = {}
+        results_breakdown = {}
+        try:
+            for shop, results, info in iter_source_results(price_finder, product_name):
+                results_by_shop[shop] = results
+                results_breakdown[shop] = info
+
+                valid = [r for r in results if r.get('price', 0) > 1000]
+                yield _sse_event('source', {
+                    "shop": shop,
+                    "products": [format_product(r) for r in valid],
+                    "stats": shop_stats([r['price'] for r in valid]) if valid else None,
+                    "info": info,
+                })
+
+            # ترتیب ثابت فروشگاه‌ها مثل /search
+            results_breakdown = {shop: results_breakdown[shop] for shop, _ in SOURCES}
+            report = build_price_report(product_name, results_by_shop, results_breakdown,
+                                        calculated_price, strategy)
+        except Exception as e:
+            logger.exception("❌ خطا در جستجوی استریم: %s", e)
+            report = {"success": False, "message": f"خطا در جستجو: {str(e)}"}
+        yield _sse_event('done', report)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# executor جداگانه برای آیتم‌های دسته‌ای تا جستجوی منابع در search_executor گیر نکند
+batch_executor = ThreadPoolExecutor(max_workers=settings.BATCH_MAX_CONCURRENCY,
+                                    thread_name_prefix='batch')
+
+
+def price_batch_item(item):
+    """قیمت‌گذاری یک آیتم دسته‌ای با همان منطق /search"""
+    if not isinstance(item, dict) or not item.get('product_name'):
+        return {"success": False, "message": "product_name is required"}
+    product_name = normalize_persian(item['product_name'])
+    results_by_shop, results_breakdown = search_all_sources(price_finder, product_name)
+    return build_price_report(product_name, results_by_shop, results_breakdown,
+                              item.get('calculated_price'), item.get('strategy', 'balanced'))
+
+
+def _safe_price_batch_item(index, item):
+    try:
+        report = price_batch_item(item)
+    except Exception as e:
+        logger.exception("❌ خطا در آیتم %s: %s", index, e)
+        report = {"success": False, "message": f"خطا در جستجو: {str(e)}"}
+    return dict(report, index=index)
+
+
+def iter_batch_reports(items, max_concurrency=None):
+    """
+    پردازش آیتم‌ها با حداکثر max_concurrency آیتم همزمان.
+    نتیجه هر آیتم به محض آماده شدن برگردانده می‌شود (نه به ترتیب ورودی)
+    و فقط آیتم‌های در حال پردازش در حافظه نگه داشته می‌شوند.
+    """
+    max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+    items = iter(enumerate(items))
+    in_flight = set()
+
+    while True:
+        while len(in_flight) < max_concurrency:
+            try:
+                index, item = next(items)
+            except StopIteration:
+                break
+            in_flight.add(batch_executor.submit(_safe_price_batch_item, index, item))
+
+        if not in_flight:
+            return
+
+        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def _iter_ndjson_lines(stream):
+    """خواندن آیتم‌ها خط به خط از بدنه NDJSON"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            yield None
+
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """
+    قیمت‌گذاری دسته‌ای. ورودی لیست JSON از {product_name, calculated_price, strategy}
+    (یا {"items": [...]}، یا NDJSON) و خروجی یک خط NDJSON به ازای هر آیتم.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        items = _iter_ndjson_lines(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({"success": False, "message": "a list of items is required"}), 400
+
+    def generate():
+        for report in iter_batch_reports(items):
+            yield json.dumps(report, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _history_time(name, default):
+    """زمان پارامتر name به ثانیه unix؛ عدد یا تاریخ ISO (مثلا 2024-05-01T10:00)"""
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _history_filters():
+    now = time.time()
+    return {
+        "query": request.args.get('q'),
+        "url": request.args.get('url'),
+        "source": request.args.get('source'),
+        "start": _history_time('from', now - settings.HISTORY_DEFAULT_DAYS * 86400),
+        "end": _history_time('to', now),
+    }
+
+
+@app.route('/history', methods=['GET'])
+def price_history_endpoint():
+    """
+    تاریخچه قیمت یک عبارت جستجو (q) یا محصول (url) در بازه from تا to.
+    پیش‌فرض: downsample به حداکثر points بازه برای هر فروشگاه (یا اندازه bucket ثانیه)؛
+    با raw=1 مشاهدات خام تا limit ردیف.
+    """
+    if price_history is None:
+        return jsonify({"success": False, "message": "تاریخچه قیمت غیرفعال است"}), 404
+    try:
+        filters = _history_filters()
+        bucket = int(request.args.get('bucket', 0))
+        points = min(int(request.args.get('points', settings.HISTORY_MAX_POINTS)), settings.HISTORY_MAX_POINTS)
+        limit = min(int(request.args.get('limit', settings.HISTORY_MAX_POINTS)), settings.HISTORY_MAX_POINTS)
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"پارامتر نامعتبر: {e}"}), 400
+    if not filters["query"] and not filters["url"]:
+        return jsonify({"success": False, "message": "q or url is required"}), 400
+
+    response_data = {
+        "success": True,
+        "query": filters["query"],
+        "url": filters["url"],
+        "source": filters["source"],
+        "from": filters["start"],
+        "to": filters["end"],
+    }
+    if request.args.get('raw') == '1':
+        response_data["observations"] = price_history.observations(limit=limit, **filters)
+        return jsonify(response_data)
+
+    if bucket <= 0:
+        bucket = max(1, math.ceil((filters["end"] - filters["start"]) / max(points, 1)))
+    response_data["bucket"] = bucket
+    response_data["series"] = price_history.series(bucket, **filters)
+    return jsonify(response_data)
+
+
+@app.route('/history/torob/<prk>', methods=['GET'])
+def torob_price_chart(prk):
+    """
+    نمودار قیمت یک محصول ترب از ذخیره محلی (همگام‌سازی فقط وقتی از TTL گذشته باشد)
+    همراه با momentum اخیر برای رسم خط روند
+    """
+    if chart_sync is None:
+        return jsonify({"success": False, "message": "نمودار قیمت ترب غیرفعال است"}), 404
+    try:
+        start = _history_time('from', time.time() - settings.HISTORY_DEFAULT_DAYS * 86400)
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"پارامتر نامعتبر: {e}"}), 400
+    points = chart_sync.chart(prk, request.args.get('search_id'), start)
     return jsonify({
+        "success": True,
+        "prk": prk,
+        "points": [{"ts": ts, "price": price} for ts, price in points],
+        "momentum": chart_momentum(points),
+    })
+
+
+@app.route('/history/export', methods=['GET'])
+def price_history_export():
+    """خروجی کامل مشاهدات (فیلترهای /history اختیاری) به صورت CSV یا NDJSON"""
+    if price_history is None:
+        return jsonify({"success": False, "message": "تاریخچه قیمت غیرفعال است"}), 404
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({"success": False, "message": "format must be csv or ndjson"}), 400
+    try:
+        filters = _history_filters()
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"پارامتر نامعتبر: {e}"}), 400
+    if not request.args.get('from'):
+        filters["start"] = None
+
+    def generate():
+        rows = price_history.iter_export(**filters)
+        if export_format == 'ndjson':
+            for row in rows:
+                yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n'
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=price_history.{export_format}'
+    return response
+
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    """پیشنهاد تکمیل خودکار برای پیشوند q (از index محلی؛ ترب فقط برای miss)"""
+    if typeahead is None:
+        return jsonify({"success": False, "message": "پیشنهاد خودکار غیرفعال است"}), 404
+    response = jsonify(typeahead.suggest(request.args.get('q', ''), price_finder.torob.suggestion))
+    response.headers['Cache-Control'] = f"private, max-age={settings.SUGGEST_BROWSER_CACHE}"
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """متریک‌های Prometheus (مجموع همه workerها)"""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+def status_payload():
+    """وضعیت API (مشترک بین Flask و حالت ASGI)"""
+    return {
         "status": "online",
         "message": "Price Finder API is running",
         "version": "2.0",
         "endpoints": {
             "home": "/",
             "search": "/search",
+            "stream": "/search/stream",
+            "batch": "/search/batch",
+            "history": "/history",
+            "history_export": "/history/export",
+            "torob_price_chart": "/history/torob/<prk>",
+            "suggest": "/suggest",
+            "metrics": "/metrics",
+            "health": "/health",
             "status": "/api/status"
-        }
-    })
+        },
+        "http_pool": dict(http_client.pool_stats(), **{price_finder.torob.host: price_finder.torob.pool_stats()}),
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "single_flight": flights.stats(),
+        "price_history": price_history.stats() if price_history is not None else None,
+        "torob_charts": chart_sync.stats() if chart_sync is not None else None,
+        "prewarm": refresh_scheduler.stats() if refresh_scheduler is not None else None,
+        "typeahead": typeahead.stats() if typeahead is not None else None,
+        "circuit_breakers": breaker_states(),
+        "rate_limits": limiter_states()
+    }
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "ok"})
+
+@app.route('/api/status', methods=['GET'])
+def api_status():
+    """وضعیت API"""
+    return jsonify(status_payload())
 
 @app.after_request
 def after_request(response):
@@ -701,7 +1392,7 @@ def after_request(response):
 # اجرای اپلیکیشن
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    debug_mode = os.environ.get('DEBUG', 'True').lower() == 'true'
+    debug_mode = os.environ.get('DEBUG', 'False').lower() == 'true'
     
     print("🚀 شروع سرور Price Finder...")
     print(f"🌐 آدرس: http://localhost:{port}")
@@ -0,0 +1,42 @@
+# تنظیمات gunicorn
+#   gunicorn -c gunicorn.conf.py asgi:app            (پیش‌فرض: workerهای async uvicorn)
+#   GUNICORN_WORKER_CLASS=gthread gunicorn -c gunicorn.conf.py finder_price:app
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# هر worker uvicorn صدها جستجوی در انتظار upstream را نگه می‌دارد؛
+# تعداد worker برای استفاده از هسته‌ها (parse HTML و JSON) است نه همزمانی
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+# فقط برای worker_class=gthread (اپ WSGI)
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# جستجو تا SEARCH_DEADLINE طول می‌کشد؛ timeout باید از آن بزرگ‌تر باشد
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# پوشه مشترک متریک‌های Prometheus بین workerها
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/price_finder_metrics')
+
+
+def on_starting(server):
+    """
+    فایل‌های متریک اجرای قبلی پاک می‌شوند تا شمارنده‌ها از صفر شروع شوند؛ فایل
+    مشترک rate limit هم پاک می‌شود تا bucketها با تنظیمات جدید و پر شروع شوند.
+    """
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    rate_limit_file = os.environ.get('RATE_LIMIT_FILE', '/tmp/price_finder_rate_limits')
+    if rate_limit_file and os.path.exists(rate_limit_file):
+        os.remove(rate_limit_file)
+
+
+def child_exit(server, worker):
+    """حذف gaugeهای زنده worker خارج شده از مجموع"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,35 @@
+# ابزار hedge کردن درخواست‌ها بر اساس تأخیرهای مشاهده شده
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    نگه‌داری تأخیرهای اخیر یک endpoint و محاسبه hedge delay
+    (صدک مشخصی از تأخیرها، محدود به بازه minimum تا maximum).
+    """
+
+    def __init__(self, default, percentile=0.9, minimum=0.0, maximum=None, size=100):
+        self.default = default
+        self.percentile = percentile
+        self.minimum = minimum
+        self.maximum = maximum
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def hedge_delay(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            delay = self.default
+        else:
+            index = min(int(len(samples) * self.percentile), len(samples) - 1)
+            delay = samples[index]
+        delay = max(delay, self.minimum)
+        if self.maximum is not None:
+            delay = min(delay, self.maximum)
+        return delay
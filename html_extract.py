@@ -0,0 +1,137 @@
+# استخراج هدفمند محصولات از HTML صفحات جستجو با parser افزایشی lxml
+import re
+
+from lxml import etree
+
+from tracing import traced
+
+# تعداد محصول مورد نیاز از هر صفحه
+DEFAULT_LIMIT = 5
+
+# تکه‌های ورودی parser؛ بعد از پیدا شدن محصولات کافی بقیه صفحه parse نمی‌شود
+CHUNK_SIZE = 16 * 1024
+
+PRODUCT_HREF_RE = re.compile(r'/product/')
+TOMAN_RE = re.compile(r'تومان')
+TOMAN_OR_RIAL_RE = re.compile(r'تومان|ریال')
+
+
+def _single_string(element):
+    """معادل .string در BeautifulSoup: متن عنصری که فقط یک رشته دارد"""
+    while True:
+        if len(element) == 0:
+            return element.text
+        if len(element) == 1 and not element.text and not element[0].tail:
+            element = element[0]
+            continue
+        return None
+
+
+def _text(element):
+    return ''.join(element.itertext())
+
+
+def _release(element):
+    """آزاد کردن زیردرخت‌های پردازش شده تا حافظه با طول صفحه بزرگ نشود"""
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def _iter_events(html, parser):
+    """خوراندن تکه‌تکه HTML به parser و برگرداندن رویدادها"""
+    for start in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[start:start + CHUNK_SIZE])
+        for event in parser.read_events():
+            yield event
+    parser.close()
+    for event in parser.read_events():
+        yield event
+
+
+@traced('parse_html')
+def extract_digikala_products(html, limit=DEFAULT_LIMIT):
+    """
+    لینک‌های محصول دیجی‌کالا همراه با عنوان و متن قیمت.
+    مثل روش قبلی فقط `limit` لینک اول `/product/` بررسی می‌شود؛ قیمت از span
+    با data-testid=price-final داخل لینک یا اولین span بعدی که «تومان» دارد
+    خوانده می‌شود. خروجی: لیست dict با کلیدهای href، title و price_text.
+    """
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    products = []
+    pending = []  # محصولاتی که هنوز span قیمت بعدی‌شان دیده نشده
+    anchors_seen = 0
+    anchor_depth = 0
+    active_anchor = None
+
+    for event, element in _iter_events(html, parser):
+        tag = element.tag
+
+        if event == 'start':
+            if tag == 'a':
+                anchor_depth += 1
+                if active_anchor is None and anchors_seen < limit and \
+                        PRODUCT_HREF_RE.search(element.get('href', '')):
+                    active_anchor = element
+                    anchors_seen += 1
+            continue
+
+        # event == 'end'
+        if tag == 'span' and pending:
+            string = _single_string(element)
+            if string and TOMAN_RE.search(string):
+                for product in pending:
+                    product['price_text'] = string.strip()
+                pending = []
+
+        if element is active_anchor:
+            active_anchor = None
+            product = {'href': element.get('href', ''), 'title': '', 'price_text': None}
+
+            title_element = element.find('.//h3')
+            if title_element is None:
+                title_element = element.find('.//p')
+            if title_element is None:
+                title_element = element
+            product['title'] = _text(title_element).strip()
+
+            price_element = element.find(".//span[@data-testid='price-final']")
+            if price_element is None:
+                for span in element.iter('span'):
+                    string = _single_string(span)
+                    if string and TOMAN_RE.search(string):
+                        price_element = span
+                        break
+            if price_element is not None:
+                product['price_text'] = _text(price_element).strip()
+            else:
+                pending.append(product)
+            products.append(product)
+
+        if tag == 'a':
+            anchor_depth -= 1
+
+        if anchors_seen >= limit and not pending and active_anchor is None:
+            break
+
+        # تا span قیمت محصولات در انتظار پیدا نشده، زیردرخت‌ها نگه داشته می‌شوند
+        if anchor_depth == 0 and active_anchor is None and not pending:
+            _release(element)
+
+    return products
+
+
+@traced('parse_html')
+def extract_price_texts(html, limit=DEFAULT_LIMIT, pattern=TOMAN_OR_RIAL_RE):
+    """متن `limit` span اولی که رشته آن‌ها با pattern (تومان/ریال) مطابقت دارد"""
+    parser = etree.HTMLPullParser(events=('end',), tag='span')
+    texts = []
+    for _, element in _iter_events(html, parser):
+        string = _single_string(element)
+        if string and pattern.search(string):
+            texts.append(string.strip())
+            if len(texts) >= limit:
+                break
+    return texts
@@ -0,0 +1,130 @@
+# لایه اتصال مشترک HTTP: یک session با keep-alive برای هر host در کل پروسه
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import settings
+from circuit_breaker import CircuitOpenError, get_breaker
+from rate_limit import RateLimitedError, acquire
+from tracing import annotate, span
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _build_session():
+    """ساخت session با pool اتصال و سیاست retry"""
+    retry = Retry(
+        total=settings.HTTP_RETRIES,
+        read=0,  # درخواستی که پاسخش دیر آمده دوباره فرستاده نشود
+        backoff_factor=settings.HTTP_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(url):
+    """session اختصاصی host مربوط به url"""
+    host = urllib.parse.urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _build_session()
+                _sessions[host] = session
+    return session
+
+
+def is_failure_status(status_code):
+    """پاسخ‌هایی که برای circuit breaker خطا حساب می‌شوند"""
+    return status_code == 429 or status_code >= 500
+
+
+def get(url, endpoint=None, **kwargs):
+    """
+    جایگزین requests.get با استفاده از اتصال‌های pool شده.
+    اگر endpoint داده شود درخواست از circuit breaker همان endpoint عبور می‌کند
+    و در حالت باز بلافاصله CircuitOpenError می‌دهد. اگر برای host محدودیت نرخ تنظیم
+    شده باشد قبل از ارسال تا نوبت درخواست صبر می‌شود (RateLimitedError اگر در مهلت نرسد).
+    """
+    host = urllib.parse.urlsplit(url).netloc
+    with span('http', endpoint=endpoint, host=host):
+        response = _send(url, host, endpoint, **kwargs)
+        # elapsed: از ارسال تا دریافت هدرها (انتظار برای upstream)؛ بقیه مدت span دانلود بدنه است
+        annotate(status=response.status_code,
+                 ttfb_ms=round(response.elapsed.total_seconds() * 1000, 2))
+        return response
+
+
+def _send(url, host, endpoint, **kwargs):
+    if endpoint is None:
+        acquire(host, kwargs.get('timeout'))
+        return get_session(url).get(url, **kwargs)
+
+    breaker = get_breaker(endpoint)
+    if not breaker.allow():
+        raise CircuitOpenError(endpoint)
+    try:
+        acquire(host, kwargs.get('timeout'))
+    except RateLimitedError:
+        breaker.release()
+        raise
+
+    started = time.monotonic()
+    try:
+        response = get_session(url).get(url, **kwargs)
+    except BaseException:
+        breaker.record(False, time.monotonic() - started)
+        raise
+    breaker.record(not is_failure_status(response.status_code), time.monotonic() - started)
+    return response
+
+
+def decode_json(response):
+    """response.json() در یک span جدا از زمان شبکه"""
+    with span('json_decode', bytes=len(response.content)):
+        return response.json()
+
+
+def pool_stats():
+    """
+    آمار استفاده مجدد از اتصال‌ها برای هر host.
+    hits تعداد درخواست‌هایی است که روی اتصال باز قبلی ارسال شده‌اند و
+    misses تعداد اتصال‌های جدید (handshake کامل TCP/TLS).
+    """
+    stats = {}
+    with _sessions_lock:
+        sessions = list(_sessions.items())
+
+    for host, session in sessions:
+        requests_count = 0
+        connections = 0
+        for adapter in set(session.adapters.values()):
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+        stats[host] = {
+            "requests": requests_count,
+            "hits": max(requests_count - connections, 0),
+            "misses": connections,
+        }
+    return stats
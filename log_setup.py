@@ -0,0 +1,119 @@
+# لاگ ساختاریافته و سطح‌بندی شده با نوشتن غیرهمزمان (QueueHandler)
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+
+import settings
+
+ROOT_LOGGER = 'price_finder'
+
+_listener = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    رکورد بدون فرمت شدن وارد صف می‌شود؛ فرمت‌کردن پیام (و serialize کردن
+    payloadها) در thread نویسنده انجام می‌شود نه در thread درخواست.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """هر رکورد یک خط JSON با فیلدهای ثابت و فیلدهای extra"""
+
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _parse_rates(spec):
+    """'torob=0.1,digikala=0' → {'torob': 0.1, 'digikala': 0.0}"""
+    rates = {}
+    for part in spec.split(','):
+        if '=' not in part:
+            continue
+        source, _, rate = part.partition('=')
+        try:
+            rates[source.strip()] = float(rate)
+        except ValueError:
+            continue
+    return rates
+
+
+_payload_rates = _parse_rates(settings.LOG_PAYLOAD_SAMPLE_RATES)
+
+
+def setup_logging():
+    """پیکربندی یک‌باره logger اصلی؛ خروجی stdout از طریق صف و thread جدا"""
+    global _listener
+    if _listener is not None:
+        return
+
+    if settings.LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    root.addHandler(_QueueHandler(log_queue))
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    """logger زیرمجموعه price_finder"""
+    setup_logging()
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+class _LazyJson:
+    """serialize کردن payload فقط هنگام نوشتن لاگ"""
+
+    __slots__ = ('payload',)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return json.dumps(self.payload, ensure_ascii=False)
+
+
+def log_payload(logger, source, label, payload):
+    """
+    لاگ نمونه‌برداری شده از payload کامل پاسخ‌ها در سطح DEBUG.
+    نرخ نمونه‌برداری هر منبع از LOG_PAYLOAD_SAMPLE_RATES خوانده می‌شود
+    (پیش‌فرض LOG_PAYLOAD_SAMPLE_RATE که در production صفر است).
+    """
+    rate = _payload_rates.get(source, settings.LOG_PAYLOAD_SAMPLE_RATE)
+    if rate <= 0 or not logger.isEnabledFor(logging.DEBUG):
+        return
+    if rate < 1 and random.random() >= rate:
+        return
+    logger.debug("%s: %s", label, _LazyJson(payload), extra={"source": source})
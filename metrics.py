@@ -0,0 +1,100 @@
+# متریک‌های Prometheus برای endpoint /metrics
+#
+# با چند worker در gunicorn متغیر محیطی PROMETHEUS_MULTIPROC_DIR باید به یک
+# پوشه قابل نوشتن اشاره کند؛ در این حالت هر worker مقادیر را در فایل‌های mmap
+# همان پوشه می‌نویسد و /metrics مجموع همه workerها را برمی‌گرداند
+# (پاکسازی پوشه و mark_process_dead در gunicorn.conf.py انجام می‌شود).
+import functools
+import inspect
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+# مرزهای histogram زمان (ثانیه)؛ از پاسخ‌های cache تا مهلت کلی جستجو
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30)
+
+UPSTREAM_LATENCY = Histogram(
+    'price_finder_upstream_seconds',
+    'زمان هر فراخوانی بیرونی (API، اسکرپ یا متد ترب)',
+    ['call'], buckets=LATENCY_BUCKETS)
+UPSTREAM_CALLS = Counter(
+    'price_finder_upstream_calls_total',
+    'تعداد فراخوانی‌های بیرونی بر اساس نتیجه (ok / empty / error)',
+    ['call', 'outcome'])
+SOURCE_REQUESTS = Counter(
+    'price_finder_source_requests_total',
+    'نتیجه جستجوی هر فروشگاه در fan-out (ok / timeout / error)',
+    ['source', 'status'])
+FALLBACKS = Counter(
+    'price_finder_fallback_total',
+    'تعداد دفعات استفاده از نتایج شبیه‌سازی شده',
+    ['source'])
+PRODUCTS_PARSED = Counter(
+    'price_finder_products_parsed_total',
+    'محصولات واقعی (غیر fallback) دریافت شده از هر فروشگاه، بدون احتساب cache',
+    ['source'])
+SEARCH_LATENCY = Histogram(
+    'price_finder_search_seconds',
+    'زمان کامل پاسخ endpointهای جستجو',
+    ['endpoint'], buckets=LATENCY_BUCKETS)
+RATE_LIMIT_WAIT = Histogram(
+    'price_finder_rate_limit_wait_seconds',
+    'انتظار هر درخواست بیرونی برای نوبت rate limit همان host (صفر یعنی بدون انتظار)',
+    ['host'], buckets=(0, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+RATE_LIMITED = Counter(
+    'price_finder_rate_limited_total',
+    'درخواست‌های بیرونی که نوبتشان در مهلت نرسید و ارسال نشدند',
+    ['host'])
+
+
+def _outcome(result):
+    return 'ok' if result else 'empty'
+
+
+def _record(call, started, outcome):
+    UPSTREAM_LATENCY.labels(call).observe(time.perf_counter() - started)
+    UPSTREAM_CALLS.labels(call, outcome).inc()
+
+
+def observe(call):
+    """
+    دکوراتور اندازه‌گیری زمان و نتیجه یک فراخوانی بیرونی (همگام یا async).
+    نتیجه خالی/None با outcome=empty و exception با outcome=error ثبت می‌شود.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    _record(call, started, 'error')
+                    raise
+                _record(call, started, _outcome(result))
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                _record(call, started, 'error')
+                raise
+            _record(call, started, _outcome(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def render():
+    """(body, content_type) خروجی متنی Prometheus؛ در حالت multiprocess مجموع workerها"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,397 @@
+# گرم نگه داشتن cache برای عبارت‌های پرتکرار: محبوبیت عبارت‌ها از ترافیک /search
+# (با کاهش نمایی) و watchlist صریح خوانده می‌شود و نتایج هر فروشگاه کمی قبل از
+# انقضای TTL در پس‌زمینه دوباره گرفته می‌شوند تا /search از cache پاسخ داده شود.
+#
+# با چند worker در gunicorn فقط یک worker (رهبر، با flock روی PREWARM_LOCK_FILE)
+# به‌روزرسانی می‌کند؛ محبوبیت عبارت‌ها در جدول SQLite کنار cache مشترک
+# (RESULT_CACHE_DB) از همه workerها جمع می‌شود و بودجه از bucket مشترک rate_limit
+# برداشته می‌شود.
+import heapq
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import rate_limit
+import settings
+from log_setup import get_logger
+from query_utils import normalize_query
+
+try:
+    import fcntl
+except ImportError:  # بدون fcntl (ویندوز) هر پروسه خودش رهبر است
+    fcntl = None
+
+logger = get_logger('prewarm')
+
+
+class TokenBucket:
+    """بودجه درخواست: rate توکن در ثانیه با ظرفیت burst"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Popularity:
+    """
+    امتیاز عبارت‌ها با کاهش نمایی (نیمه‌عمر half_life ثانیه)؛ فقط چند برابر top_n
+    عبارت نگه داشته می‌شوند.
+    """
+
+    def __init__(self, half_life, max_entries):
+        self.half_life = half_life
+        self.max_entries = max_entries
+        # عبارت نرمال‌شده → [امتیاز، زمان آخرین به‌روزرسانی، آخرین متن جستجو شده]
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, updated, now):
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+    def note(self, query, now=None):
+        key = normalize_query(query)
+        if not key:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            current = self._scores.get(key)
+            score = self._decayed(current[0], current[1], now) if current else 0.0
+            self._scores[key] = [score + 1, now, query]
+            if len(self._scores) > self.max_entries * 2:
+                self._prune(now)
+
+    def _prune(self, now):
+        keep = heapq.nlargest(self.max_entries, self._scores.items(),
+                              key=lambda item: self._decayed(item[1][0], item[1][1], now))
+        self._scores = dict(keep)
+
+    def top(self, n, min_score, now=None):
+        """[(امتیاز، عبارت)] n عبارت برتر با امتیاز حداقل min_score"""
+        now = time.time() if now is None else now
+        with self._lock:
+            scored = [(self._decayed(score, updated, now), query)
+                      for score, updated, query in self._scores.values()]
+        # تلورانس کوچک تا دو جستجوی پشت سر هم با کاهش ناچیز امتیاز، امتیاز 2 حساب شوند
+        return [item for item in heapq.nlargest(n, scored) if item[0] >= min_score - 1e-3]
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class SharedPopularity(Popularity):
+    """
+    Popularity مشترک بین workerها: note فقط در حافظه همین worker جمع می‌شود و flush
+    (هر tick زمان‌بند) آن را به جدول prewarm_popularity فایل SQLite اضافه می‌کند؛
+    top از جدول خوانده می‌شود تا رهبر امتیاز ترافیک همه workerها را ببیند.
+    """
+
+    def __init__(self, path, half_life, max_entries):
+        super().__init__(half_life, max_entries)
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS prewarm_popularity ("
+            " key TEXT PRIMARY KEY,"
+            " score REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " query TEXT NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def flush(self, now=None):
+        """افزودن امتیازهای جمع شده این worker به جدول مشترک"""
+        now = time.time() if now is None else now
+        with self._lock:
+            pending, self._scores = self._scores, {}
+        if not pending:
+            return 0
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, (score, updated, query) in pending.items():
+                row = conn.execute("SELECT score, updated FROM prewarm_popularity WHERE key = ?",
+                                   (key,)).fetchone()
+                total = self._decayed(score, updated, now)
+                if row is not None:
+                    total += self._decayed(row[0], row[1], now)
+                conn.execute("INSERT OR REPLACE INTO prewarm_popularity (key, score, updated, query)"
+                             " VALUES (?, ?, ?, ?)", (key, total, now, query))
+            rows = conn.execute("SELECT key, score, updated FROM prewarm_popularity").fetchall()
+            if len(rows) > self.max_entries * 2:
+                keep = heapq.nlargest(self.max_entries, rows,
+                                      key=lambda row: self._decayed(row[1], row[2], now))
+                kept = {row[0] for row in keep}
+                conn.executemany("DELETE FROM prewarm_popularity WHERE key = ?",
+                                 [(row[0],) for row in rows if row[0] not in kept])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(pending)
+
+    def top(self, n, min_score, now=None):
+        now = time.time() if now is None else now
+        rows = self._connect().execute(
+            "SELECT score, updated, query FROM prewarm_popularity").fetchall()
+        scored = [(self._decayed(score, updated, now), query) for score, updated, query in rows]
+        return [item for item in heapq.nlargest(n, scored) if item[0] >= min_score - 1e-3]
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM prewarm_popularity").fetchone()[0]
+
+
+class LeaderLock:
+    """
+    انتخاب یک worker برای به‌روزرسانی با flock غیرمسدودکننده روی یک فایل قفل. رهبر قفل
+    را تا پایان پروسه نگه می‌دارد؛ با خروج آن سیستم‌عامل قفل را آزاد می‌کند و worker
+    دیگری در tick بعدی رهبر می‌شود. بدون مسیر یا fcntl هر پروسه رهبر است.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._pid = None
+
+    @property
+    def is_leader(self):
+        if fcntl is None or not self.path:
+            return True
+        return self._fd is not None and self._pid == os.getpid()
+
+    def acquire(self):
+        """تلاش برای رهبر شدن؛ True اگر این پروسه رهبر است"""
+        if self.is_leader:
+            return True
+        if self._pid != os.getpid():
+            # fd به ارث رسیده از پروسه والد قفل خودش را دارد
+            self._fd = None
+            self._pid = os.getpid()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        logger.info("👑 زمان‌بند گرم کردن cache در این worker (pid %s) اجرا می‌شود", self._pid)
+        return True
+
+
+def load_watchlist(spec='', path=''):
+    """عبارت‌های watchlist از متغیر محیطی (جدا شده با ویرگول) و فایل (هر خط یک عبارت)"""
+    queries = [q.strip() for q in spec.split(',') if q.strip()]
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                queries.extend(line.strip() for line in f
+                               if line.strip() and not line.startswith('#'))
+        except OSError as e:
+            logger.warning("⚠️ خواندن watchlist ممکن نشد: %s", e)
+    return list(dict.fromkeys(queries))
+
+
+class RefreshScheduler:
+    """
+    هر tick برای عبارت‌های داغ (watchlist + top_n محبوب) و هر فروشگاه زمان
+    به‌روزرسانی بعدی را بررسی می‌کند: refresh_at × TTL بعد از ذخیره ورودی، با jitter
+    تصادفی ±jitter × TTL تا به‌روزرسانی‌ها در طول پنجره TTL پخش شوند. ورودی‌های
+    سررسید شده به ترتیب امتیاز و تا سقف بودجه (هر شیء با try_acquire، پیش‌فرض
+    TokenBucket) اجرا می‌شوند. با leader فقط پروسه رهبر به‌روزرسانی می‌کند.
+    """
+
+    def __init__(self, cache, finder, sources, watchlist=(), top_n=300, min_score=2.0,
+                 half_life=86400, budget_per_minute=60, burst=5, refresh_at=0.8,
+                 jitter=0.1, concurrency=2, tick=2.0, popularity=None, budget=None,
+                 leader=None):
+        self.cache = cache
+        self.finder = finder
+        self.methods = [method for _, method in sources]
+        self.watchlist = list(watchlist)
+        self.top_n = top_n
+        self.min_score = min_score
+        self.refresh_at = refresh_at
+        self.jitter = jitter
+        self.tick = tick
+        if popularity is None:
+            popularity = Popularity(half_life, max_entries=top_n * 4)
+        if budget is None:
+            budget = TokenBucket(budget_per_minute / 60, burst)
+        self.popularity = popularity
+        self.budget = budget
+        self.leader = leader
+        self.refreshed = 0
+        self.errors = 0
+        self.deferred = 0
+        self._next_due = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='prewarm')
+        self._stop = threading.Event()
+        self._thread = None
+
+    def note(self, query):
+        """ثبت یک جستجوی کاربر"""
+        self.popularity.note(query)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='prewarm-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def hot_queries(self):
+        """[(اولویت، عبارت)]؛ watchlist بالاتر از همه"""
+        hot = [(float('inf'), query) for query in self.watchlist]
+        seen = {normalize_query(query) for query in self.watchlist}
+        for score, query in self.popularity.top(self.top_n, self.min_score):
+            if normalize_query(query) not in seen:
+                hot.append((score, query))
+        return hot
+
+    def _next_refresh(self, ttl):
+        """فاصله تا به‌روزرسانی بعدی: refresh_at × TTL با jitter تصادفی"""
+        return ttl * (self.refresh_at + random.uniform(-self.jitter, self.jitter))
+
+    def _is_due(self, key, method, query, now):
+        due = self._next_due.get(key)
+        if due is not None and due > now:
+            return False
+        # وضعیت cache فقط برای کلیدهای بدون زمان‌بندی یا سررسید شده خوانده می‌شود؛
+        # اگر جستجوی کاربر در این فاصله ورودی را تازه کرده باشد زمان‌بندی جابه‌جا می‌شود
+        freshness = self.cache.freshness(method, query)
+        if freshness is None:
+            return True
+        age, ttl = freshness
+        if due is None or age < ttl * (self.refresh_at - self.jitter):
+            due = now - age + self._next_refresh(ttl)
+            with self._lock:
+                self._next_due[key] = due
+        return due <= now
+
+    def due(self, now=None):
+        """(فروشگاه، عبارت)های سررسید شده به ترتیب اولویت"""
+        now = time.time() if now is None else now
+        due = []
+        hot_keys = set()
+        for priority, query in self.hot_queries():
+            for method in self.methods:
+                key = (method, normalize_query(query))
+                hot_keys.add(key)
+                if key in self._running:
+                    continue
+                if self._is_due(key, method, query, now):
+                    due.append((priority, method, query))
+        # عبارت‌هایی که دیگر داغ نیستند فراموش می‌شوند
+        with self._lock:
+            for key in set(self._next_due) - hot_keys:
+                del self._next_due[key]
+        due.sort(key=lambda item: -item[0])
+        return [(method, query) for _, method, query in due]
+
+    def run_once(self, now=None):
+        """یک tick: اجرای ورودی‌های سررسید تا جایی که بودجه اجازه دهد"""
+        started = 0
+        for method, query in self.due(now):
+            if not self.budget.try_acquire():
+                self.deferred += 1
+                break
+            key = (method, normalize_query(query))
+            with self._lock:
+                self._running.add(key)
+            self._executor.submit(self._refresh, key, method, query)
+            started += 1
+        return started
+
+    def _refresh(self, key, method, query):
+        search = getattr(self.finder, method)
+        try:
+            self.cache.refresh(method, query, lambda: search(query) or [])
+            self.refreshed += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning("⚠️ خطا در گرم کردن %s برای %s: %s", method, query, e)
+        finally:
+            freshness = self.cache.freshness(method, query)
+            ttl = freshness[1] if freshness else self.cache.ttl
+            with self._lock:
+                # سررسید بعدی در همان پنجره TTL با jitter تازه
+                self._next_due[key] = time.time() + self._next_refresh(ttl)
+                self._running.discard(key)
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            try:
+                flush = getattr(self.popularity, 'flush', None)
+                if flush is not None:
+                    flush()
+                if self.leader is None or self.leader.acquire():
+                    self.run_once()
+            except Exception as e:
+                logger.warning("⚠️ خطا در زمان‌بند گرم کردن cache: %s", e)
+
+    def stats(self):
+        return {
+            "leader": self.leader is None or self.leader.is_leader,
+            "watchlist": len(self.watchlist),
+            "tracked_queries": len(self.popularity),
+            "hot_queries": len(self.hot_queries()),
+            "scheduled": len(self._next_due),
+            "running": len(self._running),
+            "refreshed": self.refreshed,
+            "deferred": self.deferred,
+            "errors": self.errors,
+        }
+
+
+def create_scheduler(cache, finder, sources):
+    """
+    زمان‌بند پیش‌فرض پروسه طبق settings؛ None اگر غیرفعال یا cache خاموش باشد.
+    بدون لایه SQLite (RESULT_CACHE_DB) نتیجه گرم شده فقط به worker رهبر می‌رسد، پس
+    فعال بودن PREWARM_ENABLED بدون آن خطاست.
+    """
+    if not settings.PREWARM_ENABLED or cache is None:
+        return None
+    if cache.disk is None:
+        raise RuntimeError("PREWARM_ENABLED requires RESULT_CACHE_DB: refreshed results "
+                           "must be shared by all workers")
+    return RefreshScheduler(
+        cache, finder, sources,
+        watchlist=load_watchlist(settings.PREWARM_WATCHLIST, settings.PREWARM_WATCHLIST_FILE),
+        top_n=settings.PREWARM_TOP_N,
+        min_score=settings.PREWARM_MIN_SCORE,
+        refresh_at=settings.PREWARM_REFRESH_AT,
+        jitter=settings.PREWARM_JITTER,
+        concurrency=settings.PREWARM_CONCURRENCY,
+        tick=settings.PREWARM_TICK,
+        popularity=SharedPopularity(cache.disk.path, settings.PREWARM_HALF_LIFE,
+                                    max_entries=settings.PREWARM_TOP_N * 4),
+        budget=rate_limit.get_bucket('prewarm', settings.PREWARM_BUDGET / 60, settings.PREWARM_BURST),
+        leader=LeaderLock(settings.PREWARM_LOCK_FILE),
+    ).start()
@@ -0,0 +1,277 @@
+# تاریخچه قیمت‌های مشاهده شده: هر قیمت واقعی (غیر fallback) که از فروشگاه‌ها گرفته
+# می‌شود در SQLite (WAL) ذخیره می‌شود. ثبت از مسیر درخواست فقط یک put در صف است و
+# نوشتن دسته‌ای در thread جداگانه انجام می‌شود.
+import atexit
+import functools
+import inspect
+import queue
+import sqlite3
+import threading
+import time
+
+import settings
+from log_setup import get_logger
+from query_utils import normalize_query
+
+logger = get_logger('price_history')
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS observations ("
+    " ts REAL NOT NULL,"
+    " query TEXT NOT NULL,"
+    " source TEXT NOT NULL,"
+    " shop TEXT,"
+    " url TEXT,"
+    " title TEXT,"
+    " price INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS observations_query_ts ON observations (query, ts)",
+    "CREATE INDEX IF NOT EXISTS observations_url_ts ON observations (url, ts)",
+    "CREATE INDEX IF NOT EXISTS observations_ts ON observations (ts)",
+)
+
+_INSERT = ("INSERT INTO observations (ts, query, source, shop, url, title, price)"
+           " VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+EXPORT_COLUMNS = ('ts', 'query', 'source', 'shop', 'url', 'title', 'price')
+
+# پایان صف برای thread نویسنده
+_STOP = object()
+
+
+def observation_rows(source, query, results, ts=None):
+    """ردیف‌های قابل ذخیره از نتایج یک فروشگاه (بدون fallback و قیمت نامعتبر)"""
+    ts = time.time() if ts is None else ts
+    query = normalize_query(query)
+    rows = []
+    for item in results or ():
+        price = item.get('price') or 0
+        if item.get('fallback') or price <= 1000:
+            continue
+        url = item.get('url')
+        rows.append((ts, query, source, item.get('shop'),
+                     url if url and url != '#' else None, item.get('title'), int(price)))
+    return rows
+
+
+class PriceHistory:
+    """
+    ذخیره و پرس‌وجوی مشاهدات قیمت.
+    record غیرمسدودکننده است؛ اگر صف پر باشد مشاهده دور ریخته و شمرده می‌شود.
+    """
+
+    def __init__(self, path, queue_size=10000, batch_size=500, flush_interval=1.0,
+                 retention_days=0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention_days * 86400
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        conn = self._connect()
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        self._writer = threading.Thread(target=self._run, name='price-history', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- ثبت ---
+
+    def record(self, source, query, results):
+        rows = observation_rows(source, query, results)
+        if not rows:
+            return
+        try:
+            self._queue.put_nowait(rows)
+            self.queued += len(rows)
+        except queue.Full:
+            self.dropped += len(rows)
+
+    def _run(self):
+        conn = self._connect()
+        last_purge = 0.0
+        while True:
+            try:
+                batch = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            stop = batch is _STOP
+            rows = [] if stop else list(batch)
+            # هر چه در صف است (تا batch_size) در یک تراکنش نوشته می‌شود
+            while not stop and len(rows) < self.batch_size:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is _STOP:
+                    stop = True
+                else:
+                    rows.extend(more)
+            if rows:
+                self._write(conn, rows)
+            if self.retention and time.time() - last_purge > 3600:
+                last_purge = time.time()
+                self._purge(conn, last_purge - self.retention)
+            if stop:
+                return
+
+    def _write(self, conn, rows):
+        try:
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(_INSERT, rows)
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            self.dropped += len(rows)
+            logger.warning("⚠️ خطا در ذخیره تاریخچه قیمت: %s", e)
+
+    def _purge(self, conn, older_than):
+        try:
+            conn.execute("DELETE FROM observations WHERE ts < ?", (older_than,))
+        except sqlite3.Error as e:
+            logger.warning("⚠️ خطا در پاک‌سازی تاریخچه قیمت: %s", e)
+
+    def close(self, timeout=5):
+        """نوشتن باقی‌مانده صف قبل از خروج"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+
+    # --- پرس‌وجو ---
+
+    @staticmethod
+    def _filters(query=None, url=None, source=None, start=None, end=None):
+        clauses, params = [], []
+        if query:
+            clauses.append("query = ?")
+            params.append(normalize_query(query))
+        if url:
+            clauses.append("url = ?")
+            params.append(url)
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def observations(self, limit=1000, **filters):
+        """مشاهدات خام به ترتیب زمان"""
+        where, params = self._filters(**filters)
+        rows = self._connect().execute(
+            f"SELECT {', '.join(EXPORT_COLUMNS)} FROM observations{where} ORDER BY ts LIMIT ?",
+            params + [limit])
+        return [dict(zip(EXPORT_COLUMNS, row)) for row in rows]
+
+    def series(self, bucket, **filters):
+        """
+        downsample در خود SQLite: برای هر فروشگاه و هر بازه bucket ثانیه‌ای
+        min/max/avg/count قیمت‌ها. {source: [{ts, min, max, avg, count}, ...]}
+        """
+        where, params = self._filters(**filters)
+        rows = self._connect().execute(
+            "SELECT source, CAST(ts / ? AS INTEGER) AS slot,"
+            " MIN(price), MAX(price), AVG(price), COUNT(*)"
+            f" FROM observations{where} GROUP BY source, slot ORDER BY source, slot",
+            [bucket] + params)
+        series = {}
+        for source, slot, low, high, avg, count in rows:
+            series.setdefault(source, []).append({
+                "ts": slot * bucket, "min": low, "max": high, "avg": int(avg), "count": count,
+            })
+        return series
+
+    def top_queries(self, limit):
+        """
+        [(عبارت، تعداد جستجو)] پرتکرارترین عبارت‌ها؛ هر دقیقه‌ای که عبارتی در آن ثبت شده
+        یک جستجو حساب می‌شود (ثبت فروشگاه‌های یک جستجو زمان‌های نزدیک به هم دارند)
+        """
+        rows = self._connect().execute(
+            "SELECT query, COUNT(DISTINCT CAST(ts / 60 AS INTEGER)) AS searches FROM observations"
+            " GROUP BY query ORDER BY searches DESC LIMIT ?", (limit,))
+        return rows.fetchall()
+
+    def iter_export(self, batch_size=5000, **filters):
+        """همه ردیف‌های مطابق فیلترها به صورت tuple با ترتیب EXPORT_COLUMNS (برای stream)"""
+        where, params = self._filters(**filters)
+        # اتصال جدا تا cursor باز با پرس‌وجوهای دیگر همین thread تداخل نداشته باشد
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            cursor = conn.execute(
+                f"SELECT {', '.join(EXPORT_COLUMNS)} FROM observations{where} ORDER BY ts", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "queued": self.queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+        }
+
+
+def records(source):
+    """
+    decorator برای متدهای جستجوی فروشگاه (همگام یا async) با آرگومان اول عبارت جستجو:
+    نتایج واقعی در تاریخچه ثبت می‌شوند. زیر coalesce/single-flight قرار می‌گیرد تا هر
+    درخواست واقعی به فروشگاه فقط یک بار ثبت شود.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(finder, product_name, *args, **kwargs):
+                results = await func(finder, product_name, *args, **kwargs)
+                if price_history is not None:
+                    price_history.record(source, product_name, results)
+                return results
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, product_name, *args, **kwargs):
+            results = func(self, product_name, *args, **kwargs)
+            if price_history is not None:
+                price_history.record(source, product_name, results)
+            return results
+        return wrapper
+    return decorator
+
+
+def _create_default_history():
+    if not settings.PRICE_HISTORY_DB:
+        return None
+    try:
+        return PriceHistory(
+            settings.PRICE_HISTORY_DB,
+            queue_size=settings.PRICE_HISTORY_QUEUE_SIZE,
+            batch_size=settings.PRICE_HISTORY_BATCH_SIZE,
+            retention_days=settings.PRICE_HISTORY_RETENTION_DAYS,
+        )
+    except sqlite3.Error as e:
+        logger.warning("⚠️ تاریخچه قیمت غیرفعال شد: %s", e)
+        return None
+
+
+# تاریخچه پیش‌فرض پروسه (در صورت غیرفعال بودن None است)
+price_history = _create_default_history()
@@ -0,0 +1,173 @@
+# موتور یکپارچه تبدیل متن/عدد قیمت به تومان
+import re
+
+TOMAN = 'toman'
+RIAL = 'rial'
+
+# ارقام فارسی و عربی به لاتین، جداکننده‌های هزارگان به «,» و ممیز به «.»
+_TRANSLATION = str.maketrans({
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ۰-۹
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ٠-٩
+    '\u066c': ',',  # ٬ جداکننده هزارگان عربی
+    '\u060c': ',',  # ، ویرگول فارسی
+    '\u066b': '.',  # ٫ ممیز
+    '\u200c': ' ',  # ZWNJ
+    '\u200e': None,  # LRM
+    '\u200f': None,  # RLM
+    '\u00a0': ' ',  # NBSP
+})
+
+# عدد به ترتیب: هزارگان با نقطه (1.250.000)، هزارگان با ویرگول یا فاصله، عدد ساده/اعشاری
+_NUMBER = r'\d{1,3}(?:\.\d{3}){2,}(?!\d)|\d{1,3}(?:[, ]\d{3})+(?!\d)|\d+(?:\.\d+)?'
+_UNITS = (
+    r'(?P<toman>تومان)|(?P<rial>ریال|ريال|﷼)'
+    r'|\b(?:(?P<toman_latin>[Tt]omans?|TOMANS?|IRT)|(?P<rial_latin>[Rr]ials?|RIALS?|IRR))\b'
+)
+_NUMBER_RE = re.compile(_NUMBER, re.ASCII)
+_UNIT_RE = re.compile(_UNITS)
+# اعداد و واحدها در یک پیمایش
+_TOKEN_RE = re.compile(f'(?P<number>{_NUMBER})|{_UNITS}')
+# همان توکن‌ها روی متن‌های به هم چسبیده parse_prices؛ \x00 مرز متن‌هاست
+_BATCH_RE = re.compile(f'(?P<sep>\x00)|(?P<number>{_NUMBER})|{_UNITS}')
+_UNIT_BY_GROUP = {'toman': TOMAN, 'toman_latin': TOMAN, 'rial': RIAL, 'rial_latin': RIAL}
+
+
+def normalize_digits(text):
+    """تبدیل ارقام فارسی/عربی و جداکننده‌ها به معادل لاتین"""
+    return text.translate(_TRANSLATION)
+
+
+def detect_unit(text, default=None):
+    """واحد صریح ذکر شده در متن (تومان یا ریال)"""
+    match = _UNIT_RE.search(text)
+    if match is None:
+        return default
+    return _UNIT_BY_GROUP[match.lastgroup]
+
+
+def _to_number(token):
+    """مقدار صحیح توکن عددی؛ بخش اعشاری (مثل 12.5) کنار گذاشته می‌شود"""
+    if token.isdigit():
+        return int(token)
+    if token.count('.') > 1:
+        token = token.replace('.', '')
+    token = token.replace(',', '').replace(' ', '')
+    return int(float(token)) if '.' in token else int(token)
+
+
+def parse_number(text):
+    """
+    اولین عدد موجود در متن به صورت int (بدون تبدیل واحد)؛ بخش اعشاری حذف
+    می‌شود و متن بدون عدد None برمی‌گرداند.
+    """
+    if not text:
+        return None
+    match = _NUMBER_RE.search(normalize_digits(str(text)))
+    if match is None:
+        return None
+    return _to_number(match.group())
+
+
+def to_toman(amount, unit=TOMAN):
+    """تبدیل مقدار عددی به تومان صحیح (ریال تقسیم بر ۱۰)"""
+    if amount is None or amount <= 0:
+        return None
+    if unit == RIAL:
+        return int(amount) // 10
+    return int(amount)
+
+
+def _parse_normalized(text, default_unit):
+    numbers = _NUMBER_RE.findall(text)
+    if not numbers:
+        return None
+    if len(numbers) == 1:
+        # حالت رایج: یک عدد و حداکثر یک واحد
+        return to_toman(_to_number(numbers[0]), detect_unit(text, default_unit))
+
+    first = None
+    last = None
+    for token in _TOKEN_RE.finditer(text):
+        if token.lastgroup == 'number':
+            last = token.group()
+            if first is None:
+                first = last
+        elif last is not None:
+            # عددی که درست قبل از واحد آمده قیمت است (نه «۲۰٪ تخفیف» یا «۳ عدد»)
+            return to_toman(_to_number(last), _UNIT_BY_GROUP[token.lastgroup])
+    if first is None:
+        return None
+    return to_toman(_to_number(first), default_unit)
+
+
+def parse_price(value, default_unit=TOMAN):
+    """
+    تبدیل قیمت به تومان. value می‌تواند عدد یا متن باشد؛ اگر متن واحد
+    صریح (تومان/ریال) داشته باشد همان استفاده می‌شود وگرنه default_unit.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return to_toman(value, default_unit)
+    return _parse_normalized(normalize_digits(str(value)), default_unit)
+
+
+def _finish(count, first, first_unit, paired, default_unit):
+    """قیمت یک متن از توکن‌های جمع شده در parse_prices؛ همان قواعد _parse_normalized"""
+    if count == 0:
+        return None
+    if count == 1:
+        return to_toman(_to_number(first), first_unit or default_unit)
+    if paired is not None:
+        return paired
+    return to_toman(_to_number(first), default_unit)
+
+
+def _parse_joined(texts, default_unit):
+    """
+    همه متن‌ها با \x00 به هم چسبانده می‌شوند، یک بار نرمال‌سازی و یک بار با
+    _BATCH_RE پیمایش می‌شوند. اگر خود متن‌ها \x00 داشته باشند None برمی‌گردد.
+    """
+    text = normalize_digits('\x00'.join(texts))
+    results = []
+    count = 0
+    first = last = first_unit = paired = None
+    for token in _BATCH_RE.finditer(text):
+        group = token.lastgroup
+        if group == 'number':
+            last = token.group()
+            if first is None:
+                first = last
+            count += 1
+        elif group == 'sep':
+            results.append(_finish(count, first, first_unit, paired, default_unit))
+            count = 0
+            first = last = first_unit = paired = None
+        else:
+            unit = _UNIT_BY_GROUP[group]
+            if first_unit is None:
+                first_unit = unit
+            if paired is None and last is not None:
+                # عددی که درست قبل از اولین واحد آمده قیمت است
+                paired = to_toman(_to_number(last), unit)
+    results.append(_finish(count, first, first_unit, paired, default_unit))
+    return results if len(results) == len(texts) else None
+
+
+def parse_prices(values, default_unit=TOMAN):
+    """
+    نسخه دسته‌ای parse_price برای تعداد زیادی متن؛ خروجی هم‌ترتیب با ورودی است.
+    متن‌ها یک بار نرمال‌سازی و در یک پیمایش regex توکن‌بندی می‌شوند (حدود ۱۰٪
+    سریع‌تر از فراخوانی parse_price روی تک‌تک متن‌ها، benchmarks/bench_price_parser.py).
+    """
+    values = list(values)
+    texts = [v for v in values if isinstance(v, str)]
+    parsed = _parse_joined(texts, default_unit) if texts else []
+    if parsed is None:
+        parsed = [parse_price(text, default_unit) for text in texts]
+
+    if len(texts) == len(values):
+        return parsed
+    parsed = iter(parsed)
+    return [next(parsed) if isinstance(value, str) else parse_price(value, default_unit)
+            for value in values]
@@ -0,0 +1,116 @@
+# آمار قیمت یک محصول: حذف داده پرت با IQR، قیمت منصفانه (میانه)، آمار هر فروشگاه و
+# قیمت پیشنهادی بر اساس استراتژی قیمت‌گذاری
+from bisect import bisect_left, bisect_right
+
+# استراتژی → (وزن بازار، وزن قیمت پایه کاربر، عنوان)
+STRATEGIES = {
+    'competitive': (0.7, 0.3, "استراتژی رقابتی"),
+    'value-based': (0.3, 0.7, "استراتژی مبتنی بر ارزش"),
+    'balanced': (0.5, 0.5, "استراتژی متعادل"),
+}
+DEFAULT_STRATEGY = 'balanced'
+
+# کمتر از این تعداد قیمت، داده پرت حذف نمی‌شود
+MIN_OUTLIER_SAMPLES = 4
+
+
+def strategy_weights(strategy):
+    return STRATEGIES.get(strategy, STRATEGIES[DEFAULT_STRATEGY])
+
+
+def _median(ordered, start, end):
+    """میانه بخش [start, end) از لیست مرتب (مثل statistics.median)"""
+    mid = (start + end) // 2
+    if (end - start) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
+
+
+def _iqr_range(ordered):
+    """
+    بازه [lo, hi) قیمت‌های داخل مرزهای IQR در لیست مرتب؛ چارک‌ها میانه نیمه پایین
+    [0, n//2) و نیمه بالا [(n+1)//2, n) هستند. برای داده کم کل لیست.
+    """
+    n = len(ordered)
+    if n < MIN_OUTLIER_SAMPLES:
+        return 0, n
+    q1 = _median(ordered, 0, n // 2)
+    q3 = _median(ordered, (n + 1) // 2, n)
+    iqr = q3 - q1
+    return bisect_left(ordered, q1 - 1.5 * iqr), bisect_right(ordered, q3 + 1.5 * iqr)
+
+
+def remove_outliers(prices):
+    """قیمت‌های داخل بازه IQR با حفظ ترتیب"""
+    if len(prices) < MIN_OUTLIER_SAMPLES:
+        return prices  # برای داده‌های کم، حذف نکن
+    ordered = sorted(prices)
+    lo, hi = _iqr_range(ordered)
+    if lo >= hi:
+        return []
+    lower, upper = ordered[lo], ordered[hi - 1]
+    return [p for p in prices if lower <= p <= upper]
+
+
+def summarize(prices, shops=None):
+    """
+    آمار قیمت‌های یک محصول؛ None اگر قیمتی نباشد، در غیر این صورت dict با:
+      count, filtered_count, min, max, total, avg, fair_price
+      shops: {فروشگاه: {count, min, max, total, avg}} به ترتیب اولین ظهور (روی همه قیمت‌ها)
+    قیمت‌ها یک بار مرتب می‌شوند و چارک‌ها، بازه بدون داده پرت، min/max و میانه از همان
+    لیست مرتب برداشته می‌شوند.
+    """
+    if not prices:
+        return None
+    ordered = sorted(prices)
+    lo, hi = _iqr_range(ordered)
+    if lo >= hi:
+        # اگر همه حذف شدند، همه قیمت‌ها نگه داشته می‌شوند
+        lo, hi = 0, len(ordered)
+    n = hi - lo
+    total = sum(ordered[lo:hi]) if n < len(ordered) else sum(ordered)
+
+    return {
+        "count": len(prices),
+        "filtered_count": n,
+        "min": ordered[lo],
+        "max": ordered[hi - 1],
+        "total": total,
+        "avg": total / n,
+        # قیمت منصفانه (میانه)
+        "fair_price": _median(ordered, lo, hi),
+        "shops": _shop_stats(prices, shops) if shops is not None else None,
+    }
+
+
+def _shop_stats(prices, shops):
+    """count/min/max/total هر فروشگاه در یک پیمایش روی جفت‌های (فروشگاه، قیمت)"""
+    groups = {}
+    for shop, price in zip(shops, prices):
+        group = groups.get(shop)
+        if group is None:
+            groups[shop] = [1, price, price, price]
+            continue
+        group[0] += 1
+        if price < group[1]:
+            group[1] = price
+        elif price > group[2]:
+            group[2] = price
+        group[3] += price
+    return {
+        shop: {"count": count, "min": low, "max": high, "total": total, "avg": total / count}
+        for shop, (count, low, high, total) in groups.items()
+    }
+
+
+def suggest_price(fair_price, calculated_price, strategy, trend=1.0):
+    """
+    قیمت پیشنهادی: با قیمت پایه معتبر، میانگین وزنی بازار و قیمت پایه بر اساس
+    استراتژی؛ در غیر این صورت خود قیمت منصفانه.
+    trend ضریب روند قیمت بازار است (مثلا 1.02) و به سهم بازار اعمال می‌شود.
+    """
+    market = fair_price * trend if trend != 1.0 else fair_price
+    if calculated_price and isinstance(calculated_price, (int, float)):
+        market_weight, your_weight, _ = strategy_weights(strategy)
+        return int((market * market_weight) + (float(calculated_price) * your_weight))
+    return int(market)
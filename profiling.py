@@ -0,0 +1,135 @@
+# پروفایل نمونه‌برداری و snapshot حافظه برای یک درخواست (فقط ادمین)
+import collections
+import os
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import settings
+
+# در هر لحظه فقط یک درخواست پروفایل می‌شود؛ نمونه‌برداری همه threadها را می‌بیند
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """پروفایل درخواست دیگری در حال اجراست"""
+
+
+# threadهایی که بالای stack آن‌ها یکی از این فایل‌ها/توابع است بیکار هستند
+# (منتظر صف، lock، کار جدید executor، صف لاگ یا select بیکار event loop)
+_IDLE_FILES = ('threading.py', 'queue.py')
+_IDLE_FUNCTIONS = {('thread.py', '_worker'), ('handlers.py', 'dequeue'), ('selectors.py', 'select')}
+
+
+def _is_idle(code):
+    filename = os.path.basename(code.co_filename)
+    return filename in _IDLE_FILES or (filename, code.co_name) in _IDLE_FUNCTIONS
+
+
+def _location(code, lineno):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{lineno})"
+
+
+class SamplingProfiler:
+    """
+    هر interval ثانیه stack همه threadها (به جز خودش) با sys._current_frames
+    خوانده می‌شود. self = تابع بالای stack، total = هر تابع حاضر در stack.
+    کار در executorها و event loop ترب هم شمرده می‌شود؛ threadهای بیکار
+    (منتظر صف یا lock) فقط در idle شمرده می‌شوند.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval or settings.PROFILE_INTERVAL
+        self.samples = 0
+        self.idle = 0
+        self.self_counts = collections.Counter()
+        self.total_counts = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            if _is_idle(frame.f_code):
+                self.idle += 1
+                continue
+            self.self_counts[_location(frame.f_code, frame.f_lineno)] += 1
+            seen = set()
+            while frame is not None:
+                name = _location(frame.f_code, frame.f_code.co_firstlineno)
+                if name not in seen:
+                    seen.add(name)
+                    self.total_counts[name] += 1
+                frame = frame.f_back
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self, limit):
+        # درصدها نسبت به کل نمونه‌های threadهای مشغول
+        samples = max(sum(self.self_counts.values()), 1)
+        return {
+            "samples": self.samples,
+            "idle_thread_samples": self.idle,
+            "interval_ms": round(self.interval * 1000, 2),
+            "self": [{"location": name, "samples": count, "pct": round(100 * count / samples, 1)}
+                     for name, count in self.self_counts.most_common(limit)],
+            "total": [{"location": name, "samples": count, "pct": round(100 * count / samples, 1)}
+                      for name, count in self.total_counts.most_common(limit)],
+        }
+
+
+def _allocations(snapshot, baseline, limit):
+    stats = snapshot.compare_to(baseline, 'lineno')
+    return [{
+        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+        "size_kb": round(stat.size_diff / 1024, 1),
+        "count": stat.count_diff,
+    } for stat in stats[:limit]]
+
+
+@contextmanager
+def profile_request(limit=None):
+    """
+    اجرای بدنه زیر profiler و tracemalloc. خروجی در dict برگشتی بعد از
+    خروج از with پر می‌شود: {"cpu": ..., "allocations": [...]}.
+    """
+    if limit is None:
+        limit = settings.PROFILE_TOP
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy()
+
+    result = {}
+    started_tracing = not tracemalloc.is_tracing()
+    try:
+        if started_tracing:
+            tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            yield result
+        finally:
+            profiler.stop()
+            snapshot = tracemalloc.take_snapshot()
+            filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            result["cpu"] = profiler.report(limit)
+            result["allocations"] = _allocations(
+                snapshot.filter_traces(filters), baseline.filter_traces(filters), limit)
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _profile_lock.release()
@@ -0,0 +1,46 @@
+# ابزارهای نرمال‌سازی عبارت جستجو
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# حروف عربی به معادل فارسی، ارقام فارسی/عربی به لاتین، ZWNJ به فاصله و حذف
+# اعراب، کشیده و نویسه‌های جهت‌نما تا املاهای مختلف یک عبارت یکی شوند
+_PERSIAN_TRANSLATION = str.maketrans({
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ۰-۹
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ٠-٩
+    '\u064a': '\u06cc',  # ي → ی
+    '\u0649': '\u06cc',  # ى → ی
+    '\u0643': '\u06a9',  # ك → ک
+    '\u0629': '\u0647',  # ة → ه
+    '\u06c0': '\u0647',  # ۀ → ه
+    '\u200c': ' ',  # ZWNJ
+    '\u00a0': ' ',  # NBSP
+    '\u200d': None,  # ZWJ
+    '\u200e': None,  # LRM
+    '\u200f': None,  # RLM
+    '\ufeff': None,  # BOM
+    '\u0640': None,  # ـ کشیده
+    **{chr(c): None for c in range(0x064B, 0x0653)},  # اعراب (فتحه، کسره، تنوین، تشدید، ...)
+    '\u0670': None,  # الف کوچک بالای حرف
+})
+
+
+def normalize_persian(text):
+    """
+    شکل یکسان املای فارسی برای عبارت ورودی کاربر (بدون تغییر حروف بزرگ/کوچک لاتین).
+    NFKC شکل‌های نمایشی عربی (مثل ﻙ) را به حرف پایه برمی‌گرداند.
+    """
+    if not text:
+        return ''
+    text = str(text)
+    if not text.isascii():
+        text = unicodedata.normalize('NFKC', text).translate(_PERSIAN_TRANSLATION)
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def normalize_query(query):
+    """نرمال‌سازی عبارت جستجو برای ساخت کلید (cache و ...)"""
+    if not query:
+        return ''
+    return normalize_persian(query).lower()
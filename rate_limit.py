@@ -0,0 +1,362 @@
+# محدودیت نرخ درخواست به هر host بیرونی (token bucket) مشترک بین همه workerهای
+# gunicorn: وضعیت هر bucket (توکن‌ها و زمان آخرین به‌روزرسانی) در یک فایل کوچک mmap
+# است و هر خواندن و نوشتن آن زیر قفل fcntl انجام می‌شود. درخواستی که توکن آماده ندارد
+# نوبت رزرو می‌کند و تا رسیدن نوبتش صبر می‌کند. اگر نوبتش بعد از مهلت فراخوان باشد
+# (timeout درخواست، مهلت جستجو یا RATE_LIMIT_MAX_WAIT)، RateLimitedError می‌گیرد.
+import asyncio
+import contextvars
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+import metrics
+import settings
+from log_setup import get_logger
+from tracing import annotate, carry
+
+try:
+    import fcntl
+except ImportError:  # بدون fcntl (ویندوز) هر پروسه bucket جداگانه دارد
+    fcntl = None
+
+logger = get_logger('rate_limit')
+
+# هر slot فایل: نام host، توکن‌ها، زمان آخرین به‌روزرسانی (epoch)
+_SLOT = struct.Struct('<48sdd')
+_SLOT_COUNT = 64
+
+
+class RateLimitedError(requests.exceptions.RequestException):
+    """نوبت درخواست در bucket host بعد از مهلت فراخوان است؛ درخواست ارسال نمی‌شود"""
+
+    def __init__(self, host, max_wait):
+        super().__init__(f"rate limit '{host}': no slot within {max_wait:.2f}s")
+        self.host = host
+        self.max_wait = max_wait
+
+
+class WaitScope:
+    """مهلت (زمان monotonic) و مجموع انتظار درخواست‌های بیرونی یک جستجو"""
+
+    __slots__ = ('deadline', 'waited', 'waits')
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.waited = 0.0
+        self.waits = 0
+
+
+_scope = contextvars.ContextVar('rate_limit_scope', default=None)
+# مهلت جستجو به threadهای hedge و loop ترب هم می‌رسد
+carry(_scope)
+
+
+@contextmanager
+def wait_scope(deadline=None):
+    """درخواست‌های داخل این بلوک حداکثر تا deadline صبر می‌کنند و انتظارشان جمع می‌شود"""
+    current = WaitScope(deadline)
+    token = _scope.set(current)
+    try:
+        yield current
+    finally:
+        _scope.reset(token)
+
+
+class _LocalSlots:
+    """وضعیت bucketها فقط در حافظه همین پروسه (وقتی فایل مشترک در دسترس نیست)"""
+
+    shared = False
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, name, func):
+        """state جدید و نتیجه از func(state فعلی یا None)؛ state ذخیره و نتیجه برگردانده می‌شود"""
+        with self._lock:
+            state, result = func(self._states.get(name))
+            self._states[name] = state
+            return result
+
+
+class _SharedSlots:
+    """slotهای bucket در فایل mmap؛ threading.Lock بین threadها و flock بین پروسه‌ها"""
+
+    shared = True
+
+    def __init__(self, path):
+        size = _SLOT.size * _SLOT_COUNT
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, size)
+        except BaseException:
+            os.close(fd)
+            raise
+        self.pid = os.getpid()
+        self._fd = fd
+        self._offsets = {}
+        self._lock = threading.Lock()
+
+    def _offset(self, key):
+        """محل slot این host؛ اولین slot خالی برای host جدید گرفته می‌شود (زیر قفل)"""
+        offset = self._offsets.get(key)
+        if offset is not None:
+            return offset
+        for index in range(_SLOT_COUNT):
+            offset = index * _SLOT.size
+            name = self._map[offset:offset + 48]
+            if name == key:
+                break
+            if not name.strip(b'\0'):
+                _SLOT.pack_into(self._map, offset, key, math.nan, 0.0)
+                break
+        else:
+            raise RuntimeError(f"no free rate limit slot in {settings.RATE_LIMIT_FILE}")
+        self._offsets[key] = offset
+        return offset
+
+    def update(self, name, func):
+        key = name.encode('utf-8')[:48].ljust(48, b'\0')
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset = self._offset(key)
+                _, tokens, updated = _SLOT.unpack_from(self._map, offset)
+                state, result = func(None if math.isnan(tokens) else (tokens, updated))
+                _SLOT.pack_into(self._map, offset, key, *state)
+                return result
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class HostLimiter:
+    """
+    token bucket یک host: rate درخواست در ثانیه با ظرفیت burst برای کل سرویس.
+    توکن‌ها می‌توانند منفی شوند؛ هر توکن منفی یک نوبت رزرو شده در صف است.
+    """
+
+    def __init__(self, host, rate, burst, slots, max_wait):
+        self.host = host
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_wait = max_wait
+        self._slots = slots
+        self.pid = slots.pid
+        # آمار همین worker
+        self.requests = 0
+        self.waits = 0
+        self.waited = 0.0
+        self.longest_wait = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, state, now):
+        if state is None:
+            return self.burst
+        tokens, updated = state
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    def _reserve(self, max_wait):
+        """رزرو یک نوبت؛ مدت انتظار تا نوبت یا None اگر بیشتر از max_wait باشد"""
+        def take(state):
+            now = time.time()
+            tokens = self._refill(state, now)
+            wait = max(0.0, (1 - tokens) / self.rate)
+            if wait > max_wait:
+                return (tokens, now), None
+            return (tokens - 1, now), wait
+        return self._slots.update(self.host, take)
+
+    def _refund(self):
+        """برگرداندن نوبت درخواستی که در صف لغو شد"""
+        def give(state):
+            now = time.time()
+            return (min(self.burst, self._refill(state, now) + 1), now), None
+        self._slots.update(self.host, give)
+
+    def _max_wait(self, timeout):
+        limit = self.max_wait
+        if isinstance(timeout, tuple):
+            timeout = sum(part for part in timeout if part)
+        if timeout:
+            limit = min(limit, timeout)
+        current = _scope.get()
+        if current is not None and current.deadline is not None:
+            limit = min(limit, current.deadline - time.monotonic())
+        return max(0.0, limit)
+
+    def _take_turn(self, timeout):
+        max_wait = self._max_wait(timeout)
+        wait = self._reserve(max_wait)
+        if wait is None:
+            with self._lock:
+                self.rejected += 1
+            metrics.RATE_LIMITED.labels(self.host).inc()
+            logger.debug("🚦 نوبت %s در مهلت %.2f ثانیه نرسید", self.host, max_wait)
+            raise RateLimitedError(self.host, max_wait)
+        return wait
+
+    def _record(self, wait):
+        metrics.RATE_LIMIT_WAIT.labels(self.host).observe(wait)
+        with self._lock:
+            self.requests += 1
+            if wait > 0:
+                self.waits += 1
+                self.waited += wait
+                self.longest_wait = max(self.longest_wait, wait)
+        if wait > 0:
+            current = _scope.get()
+            if current is not None:
+                current.waited += wait
+                current.waits += 1
+            annotate(rate_limit_wait_ms=round(wait * 1000, 2))
+
+    def try_acquire(self):
+        """برداشتن یک توکن بدون انتظار و بدون رزرو نوبت؛ False اگر توکن آماده نباشد"""
+        taken = self._reserve(0.0) is not None
+        with self._lock:
+            if taken:
+                self.requests += 1
+            else:
+                self.rejected += 1
+        return taken
+
+    def acquire(self, timeout=None):
+        """صبر تا نوبت درخواست بعدی؛ مدت انتظار (ثانیه) برگردانده می‌شود"""
+        wait = self._take_turn(timeout)
+        if wait > 0:
+            time.sleep(wait)
+        self._record(wait)
+        return wait
+
+    async def acquire_async(self, timeout=None):
+        """نسخه asyncio از acquire"""
+        wait = self._take_turn(timeout)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._refund()
+                raise
+        self._record(wait)
+        return wait
+
+    def snapshot(self):
+        def peek(state):
+            now = time.time()
+            return (state or (self.burst, now)), self._refill(state, now)
+        tokens = self._slots.update(self.host, peek)
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(tokens, 2),
+                "shared": self._slots.shared,
+                "requests": self.requests,
+                "waits": self.waits,
+                "avg_wait_ms": round(self.waited / self.waits * 1000, 2) if self.waits else 0.0,
+                "max_wait_ms": round(self.longest_wait * 1000, 2),
+                "rejected": self.rejected,
+            }
+
+
+def parse_limits(spec):
+    """'api.torob.com=20:40,api.digikala.com=10' → {host: (rate, burst)}؛ burst پیش‌فرض همان rate"""
+    limits = {}
+    for part in spec.split(','):
+        if '=' not in part:
+            continue
+        host, _, value = part.partition('=')
+        rate, _, burst = value.partition(':')
+        try:
+            rate = float(rate)
+            burst = float(burst) if burst.strip() else rate
+        except ValueError:
+            continue
+        if rate > 0:
+            limits[host.strip()] = (rate, burst)
+    return limits
+
+
+_limits = parse_limits(settings.RATE_LIMITS)
+_limiters = {}
+_limiters_lock = threading.Lock()
+_slots = None
+
+
+def _get_slots():
+    """فایل مشترک slotها؛ بعد از fork در هر worker دوباره باز می‌شود تا قفل‌ها جدا باشند"""
+    global _slots
+    if _slots is None or _slots.pid != os.getpid():
+        slots = None
+        if fcntl is not None and settings.RATE_LIMIT_FILE:
+            try:
+                slots = _SharedSlots(settings.RATE_LIMIT_FILE)
+            except OSError as e:
+                logger.warning("⚠️ فایل مشترک rate limit باز نشد؛ محدودیت فقط برای همین worker است: %s", e)
+        _slots = slots or _LocalSlots()
+    return _slots
+
+
+def get_limiter(host):
+    """limiter اختصاصی host؛ None اگر محدودیتی برای آن تنظیم نشده باشد"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    limiter = _limiters.get(host)
+    if limiter is None or limiter.pid != os.getpid():
+        limit = _limits.get(host)
+        if limit is None:
+            return None
+        with _limiters_lock:
+            limiter = _limiters.get(host)
+            if limiter is None or limiter.pid != os.getpid():
+                limiter = HostLimiter(host, limit[0], limit[1], _get_slots(),
+                                      settings.RATE_LIMIT_MAX_WAIT)
+                _limiters[host] = limiter
+    return limiter
+
+
+def get_bucket(name, rate, burst):
+    """
+    token bucket مشترک بین workerها با نام دلخواه (مثلا بودجه prewarm) روی همان فایل
+    slotها؛ مستقل از RATE_LIMIT_ENABLED و RATE_LIMITS.
+    """
+    limiter = _limiters.get(name)
+    if limiter is None or limiter.pid != os.getpid():
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None or limiter.pid != os.getpid():
+                limiter = HostLimiter(name, rate, burst, _get_slots(), 0.0)
+                _limiters[name] = limiter
+    return limiter
+
+
+def acquire(host, timeout=None):
+    """صبر تا نوبت درخواست به host (اگر محدودیت داشته باشد)؛ مدت انتظار برگردانده می‌شود"""
+    limiter = get_limiter(host)
+    return limiter.acquire(timeout) if limiter is not None else 0.0
+
+
+async def acquire_async(host, timeout=None):
+    limiter = get_limiter(host)
+    return await limiter.acquire_async(timeout) if limiter is not None else 0.0
+
+
+def limiter_states():
+    """وضعیت limiterهای استفاده شده برای /api/status"""
+    with _limiters_lock:
+        limiters = list(_limiters.items())
+    return {host: limiter.snapshot() for host, limiter in limiters}
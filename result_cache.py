@@ -0,0 +1,313 @@
+# cache نتایج جستجوی فروشگاه‌ها: LRU با TTL در حافظه + لایه اختیاری SQLite
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from log_setup import get_logger
+from query_utils import normalize_query
+
+logger = get_logger('result_cache')
+
+# فاصله پاک کردن ورودی‌های منقضی فایل SQLite (ثانیه)؛ روی store و حداکثر یک بار در این بازه
+PURGE_INTERVAL = 600
+
+
+def is_negative(results):
+    """نتیجه خالی یا داده شبیه‌سازی شده (fallback) با TTL کوتاه‌تر نگه‌داری می‌شود"""
+    if not results:
+        return True
+    return any(item.get('fallback') for item in results)
+
+
+class _Entry:
+    __slots__ = ('value', 'stored_at', 'negative')
+
+    def __init__(self, value, stored_at, negative):
+        self.value = value
+        self.stored_at = stored_at
+        self.negative = negative
+
+
+class SQLiteTier:
+    """لایه دوم cache روی SQLite که بین همه workerهای gunicorn مشترک است"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS result_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " negative INTEGER NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, stored_at, negative FROM result_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return _Entry(json.loads(row[0]), row[1], bool(row[2]))
+
+    def set(self, key, entry):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO result_cache (key, value, stored_at, negative) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(entry.value, ensure_ascii=False), entry.stored_at, int(entry.negative)),
+        )
+
+    def purge(self, older_than):
+        self._connect().execute("DELETE FROM result_cache WHERE stored_at < ?", (older_than,))
+
+
+class ResultCache:
+    """
+    cache نتایج با کلید (source, عبارت نرمال‌شده).
+    ورودی‌های تازه مستقیم برگردانده می‌شوند، ورودی‌های کهنه (در بازه stale)
+    هم برگردانده می‌شوند ولی در پس‌زمینه به‌روز می‌شوند.
+    """
+
+    def __init__(self, max_entries, ttl, negative_ttl, stale_ttl, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+        self.disk = SQLiteTier(db_path) if db_path else None
+        self._purged_at = time.time()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(source, query):
+        return f"{source}:{normalize_query(query)}"
+
+    def _ttl_for(self, entry):
+        return self.negative_ttl if entry.negative else self.ttl
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if self.disk is None:
+            return entry
+        # ورودی منقضی حافظه ممکن است در SQLite توسط worker دیگری (مثلا زمان‌بند prewarm) تازه شده باشد
+        if entry is not None and time.time() - entry.stored_at < self._ttl_for(entry):
+            return entry
+
+        try:
+            stored = self.disk.get(key)
+        except sqlite3.Error as e:
+            logger.warning("❌ خطا در خواندن cache دیسک: %s", e)
+            return entry
+        if stored is not None and (entry is None or stored.stored_at > entry.stored_at):
+            self._remember(key, stored)
+            return stored
+        return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def store(self, key, value, negative=None):
+        if negative is None:
+            negative = is_negative(value)
+        entry = _Entry(value, time.time(), negative)
+        self._remember(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, entry)
+            except sqlite3.Error as e:
+                logger.warning("❌ خطا در نوشتن cache دیسک: %s", e)
+            self._maybe_purge(entry.stored_at)
+        return entry
+
+    def _maybe_purge(self, now):
+        """حذف ورودی‌های دیسک که حتی برای stale هم قدیمی‌اند تا فایل بی‌نهایت بزرگ نشود"""
+        with self._lock:
+            if now - self._purged_at < PURGE_INTERVAL:
+                return
+            self._purged_at = now
+        try:
+            self.disk.purge(now - (self.ttl + self.stale_ttl))
+        except sqlite3.Error as e:
+            logger.warning("❌ خطا در پاک‌سازی cache دیسک: %s", e)
+
+    def _fetch_and_store(self, key, fetch):
+        try:
+            value = fetch()
+        except Exception:
+            # خطای upstream هم برای مدت کوتاه cache می‌شود تا پشت سر هم تکرار نشود
+            self.store(key, [], negative=True)
+            raise
+        self.store(key, value)
+        return value
+
+    def freshness(self, source, query):
+        """(سن، TTL) ورودی فعلی بدون اثر روی آمار hit/miss؛ None اگر ورودی نیست"""
+        entry = self._lookup(self.make_key(source, query))
+        if entry is None:
+            return None
+        return time.time() - entry.stored_at, self._ttl_for(entry)
+
+    def refresh(self, source, query, fetch):
+        """
+        fetch و ذخیره همگام ورودی (برای گرم نگه داشتن cache قبل از انقضا).
+        اگر همین کلید در حال به‌روزرسانی باشد False برمی‌گرداند.
+        """
+        key = self.make_key(source, query)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+        try:
+            self._fetch_and_store(key, fetch)
+            return True
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch_and_store(key, fetch)
+            except Exception as e:
+                logger.warning("❌ خطا در به‌روزرسانی پس‌زمینه %s: %s", key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_executor.submit(refresh)
+
+    def _cached(self, key):
+        """(value, meta) ورودی تازه یا کهنه قابل استفاده، در غیر این صورت None"""
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+
+        age = time.time() - entry.stored_at
+        ttl = self._ttl_for(entry)
+        if age < ttl:
+            with self._lock:
+                self.hits += 1
+            return entry.value, {"hit": True, "stale": False, "age": round(age, 1)}
+        if not entry.negative and age < ttl + self.stale_ttl:
+            with self._lock:
+                self.stale_hits += 1
+            return entry.value, {"hit": True, "stale": True, "age": round(age, 1)}
+        return None
+
+    def get_or_fetch(self, source, query, fetch):
+        """
+        مقدار cache شده یا نتیجه fetch را برمی‌گرداند.
+        خروجی: (value, meta) که meta شامل hit، stale و سن ورودی (ثانیه) است.
+        """
+        key = self.make_key(source, query)
+        cached = self._cached(key)
+        if cached is not None:
+            if cached[1]["stale"]:
+                self._refresh_in_background(key, fetch)
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        value = self._fetch_and_store(key, fetch)
+        return value, {"hit": False, "stale": False, "age": 0}
+
+    async def get_or_fetch_async(self, source, query, fetch):
+        """نسخه asyncio از get_or_fetch؛ fetch تابعی است که coroutine برمی‌گرداند"""
+        key = self.make_key(source, query)
+        cached = self._cached(key)
+        if cached is not None:
+            if cached[1]["stale"]:
+                self._refresh_async(key, fetch)
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        try:
+            value = await fetch()
+        except Exception:
+            self.store(key, [], negative=True)
+            raise
+        self.store(key, value)
+        return value, {"hit": False, "stale": False, "age": 0}
+
+    def _refresh_async(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                self.store(key, await fetch())
+            except Exception as e:
+                self.store(key, [], negative=True)
+                logger.warning("❌ خطا در به‌روزرسانی پس‌زمینه %s: %s", key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+                self._refresh_tasks.discard(task)
+
+        # نگه داشتن ارجاع تا task قبل از پایان garbage collect نشود
+        task = asyncio.ensure_future(refresh())
+        self._refresh_tasks.add(task)
+
+    def stats(self):
+        with self._lock:
+            hits, stale_hits, misses = self.hits, self.stale_hits, self.misses
+            entries = len(self._entries)
+        total = hits + stale_hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "stale_hits": stale_hits,
+            "misses": misses,
+            "hit_ratio": round((hits + stale_hits) / total, 3) if total else 0.0,
+            "disk": self.disk.path if self.disk is not None else None,
+        }
+
+
+def _create_default_cache():
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    return ResultCache(
+        max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+        ttl=settings.RESULT_CACHE_TTL,
+        negative_ttl=settings.RESULT_CACHE_NEGATIVE_TTL,
+        stale_ttl=settings.RESULT_CACHE_STALE_TTL,
+        db_path=settings.RESULT_CACHE_DB or None,
+    )
+
+
+# cache پیش‌فرض پروسه (در صورت غیرفعال بودن None است)
+result_cache = _create_default_cache()
@@ -0,0 +1,214 @@
+# تنظیمات سرویس؛ همه مقادیر با متغیرهای محیطی قابل تغییر هستند
+import os
+
+
+def env_int(name, default):
+    """خواندن عدد صحیح از متغیر محیطی"""
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name, default):
+    """خواندن عدد اعشاری از متغیر محیطی"""
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name, default):
+    """خواندن مقدار بولی از متغیر محیطی"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# --- جستجوی همزمان ---
+# مهلت کلی هر درخواست /search (ثانیه)
+SEARCH_DEADLINE = env_float('SEARCH_DEADLINE', 20.0)
+# تعداد thread مشترک برای جستجوی فروشگاه‌ها
+SEARCH_MAX_WORKERS = env_int('SEARCH_MAX_WORKERS', 16)
+
+# --- اتصال‌های HTTP ---
+# حداکثر اتصال باز نگه‌داشته شده برای هر host
+HTTP_POOL_MAXSIZE = env_int('HTTP_POOL_MAXSIZE', 20)
+# تعداد تلاش مجدد برای خطای اتصال و پاسخ‌های 502/503/504
+HTTP_RETRIES = env_int('HTTP_RETRIES', 1)
+# ضریب backoff بین تلاش‌ها (ثانیه)
+HTTP_BACKOFF = env_float('HTTP_BACKOFF', 0.3)
+
+# --- محدودیت نرخ upstreamها ---
+RATE_LIMIT_ENABLED = env_bool('RATE_LIMIT_ENABLED', True)
+# "host=rate:burst" جدا شده با ویرگول؛ rate درخواست در ثانیه برای کل سرویس (همه workerها)
+RATE_LIMITS = os.environ.get(
+    'RATE_LIMITS',
+    'api.digikala.com=10:20,api.torob.com=20:40,search.basalam.com=10:20,api.basalam.com=10:20')
+# حداکثر انتظار برای نوبت (ثانیه)؛ timeout درخواست و مهلت جستجو هم آن را محدود می‌کنند
+RATE_LIMIT_MAX_WAIT = env_float('RATE_LIMIT_MAX_WAIT', 5.0)
+# فایل mmap وضعیت مشترک bucketها بین workerها؛ خالی یعنی bucket جدا برای هر worker
+RATE_LIMIT_FILE = os.environ.get('RATE_LIMIT_FILE', '/tmp/price_finder_rate_limits')
+
+# --- cache نتایج ---
+RESULT_CACHE_ENABLED = env_bool('RESULT_CACHE_ENABLED', True)
+# حداکثر تعداد ورودی در حافظه (LRU)
+RESULT_CACHE_MAX_ENTRIES = env_int('RESULT_CACHE_MAX_ENTRIES', 2048)
+# عمر نتایج معتبر (ثانیه)
+RESULT_CACHE_TTL = env_float('RESULT_CACHE_TTL', 600)
+# عمر نتایج خالی، fallback یا خطا (ثانیه)
+RESULT_CACHE_NEGATIVE_TTL = env_float('RESULT_CACHE_NEGATIVE_TTL', 60)
+# بازه‌ای بعد از TTL که نتیجه کهنه برگردانده و در پس‌زمینه به‌روز می‌شود
+RESULT_CACHE_STALE_TTL = env_float('RESULT_CACHE_STALE_TTL', 1800)
+# مسیر فایل SQLite مشترک بین workerها؛ خالی یعنی فقط cache حافظه
+RESULT_CACHE_DB = os.environ.get('RESULT_CACHE_DB', '')
+
+# --- گرم نگه داشتن cache ---
+# زمان‌بند پس‌زمینه برای عبارت‌های پرتکرار (نیازمند RESULT_CACHE_ENABLED و RESULT_CACHE_DB؛
+# بدون RESULT_CACHE_DB برنامه با خطا متوقف می‌شود)
+PREWARM_ENABLED = env_bool('PREWARM_ENABLED', False)
+# عبارت‌های همیشه گرم (جدا شده با ویرگول) و فایل watchlist (هر خط یک عبارت)
+PREWARM_WATCHLIST = os.environ.get('PREWARM_WATCHLIST', '')
+PREWARM_WATCHLIST_FILE = os.environ.get('PREWARM_WATCHLIST_FILE', '')
+# تعداد عبارت‌های محبوب گرم نگه داشته شده و حداقل امتیاز (تعداد جستجوی اخیر)
+PREWARM_TOP_N = env_int('PREWARM_TOP_N', 300)
+PREWARM_MIN_SCORE = env_float('PREWARM_MIN_SCORE', 2)
+# نیمه‌عمر امتیاز محبوبیت (ثانیه)
+PREWARM_HALF_LIFE = env_float('PREWARM_HALF_LIFE', 86400)
+# بودجه درخواست upstream زمان‌بند برای کل سرویس (به‌روزرسانی فروشگاه در دقیقه) و حداکثر
+# انفجار؛ در bucket مشترک فایل RATE_LIMIT_FILE نگه داشته می‌شود
+PREWARM_BUDGET = env_float('PREWARM_BUDGET', 60)
+PREWARM_BURST = env_int('PREWARM_BURST', 5)
+# به‌روزرسانی در کسر refresh_at از TTL با jitter ±PREWARM_JITTER از TTL
+PREWARM_REFRESH_AT = env_float('PREWARM_REFRESH_AT', 0.8)
+PREWARM_JITTER = env_float('PREWARM_JITTER', 0.1)
+# به‌روزرسانی همزمان و فاصله بررسی زمان‌بند (ثانیه)
+PREWARM_CONCURRENCY = env_int('PREWARM_CONCURRENCY', 2)
+PREWARM_TICK = env_float('PREWARM_TICK', 2)
+# فایل قفل انتخاب worker رهبر (فقط رهبر به‌روزرسانی می‌کند)
+PREWARM_LOCK_FILE = os.environ.get('PREWARM_LOCK_FILE', '/tmp/price_finder_prewarm.lock')
+
+# --- پیشنهاد خودکار (/suggest) ---
+SUGGEST_ENABLED = env_bool('SUGGEST_ENABLED', True)
+# حداقل طول پیشوند و حداکثر تعداد پیشنهاد هر پاسخ
+SUGGEST_MIN_CHARS = env_int('SUGGEST_MIN_CHARS', 2)
+SUGGEST_LIMIT = env_int('SUGGEST_LIMIT', 8)
+# ظرفیت index پیشوندی در حافظه هر worker
+SUGGEST_MAX_ENTRIES = env_int('SUGGEST_MAX_ENTRIES', 50000)
+# مدتی که پاسخ ترب برای یک پیشوند (حتی خالی) معتبر است و دوباره پرسیده نمی‌شود (ثانیه)
+SUGGEST_MISS_TTL = env_float('SUGGEST_MISS_TTL', 3600)
+# سقف درخواست suggestion به ترب برای کل سرویس (در دقیقه، bucket مشترک RATE_LIMIT_FILE) و انفجار مجاز
+SUGGEST_UPSTREAM_BUDGET = env_float('SUGGEST_UPSTREAM_BUDGET', 30)
+SUGGEST_UPSTREAM_BURST = env_int('SUGGEST_UPSTREAM_BURST', 5)
+# تعداد عبارت‌های پرتکرار تاریخچه قیمت که هنگام شروع در index بارگذاری می‌شوند
+SUGGEST_SEED_QUERIES = env_int('SUGGEST_SEED_QUERIES', 5000)
+# تعداد جستجوی یک عبارت تا هم‌وزن پیشنهادهای ترب شود (عبارت‌های کمتر جستجو شده پایین‌تر می‌مانند)
+SUGGEST_HISTORY_MIN_SEEN = env_int('SUGGEST_HISTORY_MIN_SEEN', 3)
+# Cache-Control پاسخ /suggest در مرورگر (ثانیه)
+SUGGEST_BROWSER_CACHE = env_int('SUGGEST_BROWSER_CACHE', 60)
+
+# --- تاریخچه قیمت ---
+# مسیر فایل SQLite مشاهدات قیمت؛ خالی یعنی غیرفعال
+PRICE_HISTORY_DB = os.environ.get('PRICE_HISTORY_DB', '')
+# ظرفیت صف ثبت (تعداد دسته)؛ وقتی پر باشد مشاهدات دور ریخته می‌شوند
+PRICE_HISTORY_QUEUE_SIZE = env_int('PRICE_HISTORY_QUEUE_SIZE', 10000)
+# حداکثر ردیف در هر تراکنش نوشتن
+PRICE_HISTORY_BATCH_SIZE = env_int('PRICE_HISTORY_BATCH_SIZE', 500)
+# نگهداری مشاهدات (روز)؛ 0 یعنی بدون حذف
+PRICE_HISTORY_RETENTION_DAYS = env_int('PRICE_HISTORY_RETENTION_DAYS', 0)
+# بازه پیش‌فرض /history (روز) و حداکثر نقطه‌های خروجی
+HISTORY_DEFAULT_DAYS = env_int('HISTORY_DEFAULT_DAYS', 30)
+HISTORY_MAX_POINTS = env_int('HISTORY_MAX_POINTS', 1000)
+
+# --- نمودار قیمت ترب ---
+# فایل SQLite نمودارهای همگام شده؛ پیش‌فرض همان فایل تاریخچه قیمت، خالی یعنی غیرفعال
+TOROB_CHART_DB = os.environ.get('TOROB_CHART_DB', PRICE_HISTORY_DB)
+# مدت معتبر بودن نمودار محلی قبل از همگام‌سازی دوباره (ثانیه)
+TOROB_CHART_TTL = env_float('TOROB_CHART_TTL', 21600)
+# تعداد thread همگام‌سازی در پس‌زمینه
+TOROB_CHART_WORKERS = env_int('TOROB_CHART_WORKERS', 2)
+# وزن روند اخیر قیمت در قیمت پیشنهادی؛ 0 یعنی بی‌اثر
+PRICE_MOMENTUM_WEIGHT = env_float('PRICE_MOMENTUM_WEIGHT', 0.5)
+# حداکثر قدر مطلق momentum لحاظ شده (0.1 یعنی 10٪)
+PRICE_MOMENTUM_MAX = env_float('PRICE_MOMENTUM_MAX', 0.1)
+# بازه «اخیر» و کل بازه مقایسه momentum (روز)
+PRICE_MOMENTUM_RECENT_DAYS = env_int('PRICE_MOMENTUM_RECENT_DAYS', 7)
+PRICE_MOMENTUM_BASELINE_DAYS = env_int('PRICE_MOMENTUM_BASELINE_DAYS', 30)
+
+# --- حذف آگهی‌های تکراری ---
+DEDUPE_ENABLED = env_bool('DEDUPE_ENABLED', True)
+# حداقل شباهت Jaccard (n-gramهای عنوان) دو آگهی تکراری
+DEDUPE_THRESHOLD = env_float('DEDUPE_THRESHOLD', 0.8)
+# حداکثر اختلاف نسبی قیمت دو آگهی تکراری
+DEDUPE_PRICE_TOLERANCE = env_float('DEDUPE_PRICE_TOLERANCE', 0.01)
+
+# --- قیمت‌گذاری دسته‌ای ---
+# حداکثر تعداد آیتم در حال پردازش همزمان در /search/batch
+BATCH_MAX_CONCURRENCY = env_int('BATCH_MAX_CONCURRENCY', 4)
+
+# --- کلاینت ترب ---
+# حداکثر درخواست همزمان به API ترب (برای details_many و ...)
+TOROB_CONCURRENCY = env_int('TOROB_CONCURRENCY', 8)
+# تعداد محصول با قیمت معتبر که از نتایج جستجوی ترب لازم است
+TOROB_SEARCH_RESULTS = env_int('TOROB_SEARCH_RESULTS', 5)
+# حداکثر صفحه‌های جستجو برای رسیدن به همین تعداد
+TOROB_SEARCH_MAX_PAGES = env_int('TOROB_SEARCH_MAX_PAGES', 3)
+# وقتی این تعداد محصول از صفحه فعلی باقی مانده، صفحه بعد در پس‌زمینه گرفته می‌شود
+TOROB_SEARCH_PREFETCH_REMAINING = env_int('TOROB_SEARCH_PREFETCH_REMAINING', 5)
+
+# --- circuit breaker ---
+# طول پنجره زمانی برای محاسبه نرخ خطا (ثانیه)
+BREAKER_WINDOW = env_float('BREAKER_WINDOW', 60)
+# حداقل تعداد درخواست در پنجره قبل از تصمیم‌گیری
+BREAKER_MIN_CALLS = env_int('BREAKER_MIN_CALLS', 5)
+# نرخ خطا (شامل درخواست‌های کند) که breaker را باز می‌کند
+BREAKER_ERROR_RATE = env_float('BREAKER_ERROR_RATE', 0.5)
+# درخواست کندتر از این مقدار خطا حساب می‌شود (ثانیه)
+BREAKER_SLOW_CALL = env_float('BREAKER_SLOW_CALL', 10)
+# مدت باز ماندن breaker قبل از ارسال درخواست آزمایشی (ثانیه)
+BREAKER_OPEN_SECONDS = env_float('BREAKER_OPEN_SECONDS', 30)
+
+# --- hedge کردن tierهای باسلام ---
+# اجرای موازی API اصلی و جایگزین باسلام به جای اجرای پشت سر هم
+BASALAM_HEDGE = env_bool('BASALAM_HEDGE', True)
+# hedge delay اولیه قبل از جمع شدن آمار تأخیر (ثانیه)
+BASALAM_HEDGE_DELAY = env_float('BASALAM_HEDGE_DELAY', 1.5)
+# صدکی از تأخیرهای اخیر API اصلی که hedge delay می‌شود
+BASALAM_HEDGE_PERCENTILE = env_float('BASALAM_HEDGE_PERCENTILE', 0.9)
+BASALAM_HEDGE_MIN_DELAY = env_float('BASALAM_HEDGE_MIN_DELAY', 0.2)
+BASALAM_HEDGE_MAX_DELAY = env_float('BASALAM_HEDGE_MAX_DELAY', 5)
+# timeout هر tier hedge شده = این ضریب × hedge delay (حداکثر ۱۵ ثانیه) تا tier بازنده زود آزاد شود
+BASALAM_HEDGE_TIMEOUT_FACTOR = env_float('BASALAM_HEDGE_TIMEOUT_FACTOR', 4)
+
+# --- لاگ ---
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# text یا json (یک رکورد JSON در هر خط)
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+# نرخ نمونه‌برداری از payload کامل پاسخ‌ها (فقط در سطح DEBUG)؛ در production صفر
+LOG_PAYLOAD_SAMPLE_RATE = env_float('LOG_PAYLOAD_SAMPLE_RATE', 0.0)
+# نرخ اختصاصی هر منبع، مثلا "torob=0.1,digikala=0.05"
+LOG_PAYLOAD_SAMPLE_RATES = os.environ.get('LOG_PAYLOAD_SAMPLE_RATES', '')
+
+# --- پروفایل و trace ---
+# توکن حالت پروفایل (هدر X-Admin-Token)؛ خالی یعنی غیرفعال
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+# فاصله نمونه‌برداری profiler (ثانیه)
+PROFILE_INTERVAL = env_float('PROFILE_INTERVAL', 0.005)
+# تعداد ردیف‌های hotspot و تخصیص حافظه در خروجی
+PROFILE_TOP = env_int('PROFILE_TOP', 20)
+
+# --- آدرس upstreamها ---
+# برای تست بار با سرور جایگزین محلی (benchmarks/standin_server.py) تغییر داده می‌شوند
+DIGIKALA_API_BASE_URL = os.environ.get('DIGIKALA_API_BASE_URL', 'https://api.digikala.com').rstrip('/')
+DIGIKALA_WEB_BASE_URL = os.environ.get('DIGIKALA_WEB_BASE_URL', 'https://www.digikala.com').rstrip('/')
+TOROB_API_BASE_URL = os.environ.get('TOROB_API_BASE_URL', 'https://api.torob.com').rstrip('/')
+BASALAM_SEARCH_BASE_URL = os.environ.get('BASALAM_SEARCH_BASE_URL', 'https://search.basalam.com').rstrip('/')
+BASALAM_API_BASE_URL = os.environ.get('BASALAM_API_BASE_URL', 'https://api.basalam.com').rstrip('/')
+BASALAM_WEB_BASE_URL = os.environ.get('BASALAM_WEB_BASE_URL', 'https://basalam.com').rstrip('/')
+
+# --- حالت ASGI ---
+# حداکثر کل اتصال‌های همزمان aiohttp در هر worker
+ASYNC_HTTP_LIMIT = env_int('ASYNC_HTTP_LIMIT', 200)
+# threadهای اجرای مسیرهای WSGI (stream، metrics، پروفایل) در حالت ASGI
+ASGI_WSGI_THREADS = env_int('ASGI_WSGI_THREADS', 16)
@@ -0,0 +1,90 @@
+# ادغام درخواست‌های یکسان همزمان (single-flight)
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future
+
+from query_utils import normalize_query
+
+
+class SingleFlight:
+    """
+    برای هر کلید فقط یک فراخوانی واقعی در جریان است؛
+    فراخوانی‌های همزمان دیگر با همان کلید منتظر و نتیجه مشترک را دریافت می‌کنند.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def do_async(self, key, fn):
+        """
+        نسخه asyncio (داخل یک event loop)؛ fn تابعی است که coroutine برمی‌گرداند.
+        لغو شدن یک منتظر (مثلا به خاطر مهلت) فراخوانی مشترک را لغو نمی‌کند.
+        """
+        call = self._async_calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            return await asyncio.shield(call)
+
+        self.executed += 1
+        call = asyncio.ensure_future(fn())
+        self._async_calls[key] = call
+        call.add_done_callback(lambda _: self._async_calls.pop(key, None))
+        return await asyncio.shield(call)
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls) + len(self._async_calls)
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+        }
+
+
+# گروه مشترک پروسه برای همه جستجوها
+flights = SingleFlight()
+
+
+def coalesce(source, key_func=normalize_query):
+    """
+    decorator برای متدهایی که اولین آرگومانشان عبارت جستجو (یا شناسه) است.
+    کلید ادغام (source, key_func(آرگومان)) است.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, arg, *args, **kwargs):
+            return flights.do((source, key_func(arg)),
+                              lambda: func(self, arg, *args, **kwargs))
+        return wrapper
+    return decorator
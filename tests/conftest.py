@@ -0,0 +1,35 @@
+# ماژول‌های پروژه از ریشه مخزن import می‌شوند (مثل اسکریپت‌های benchmarks)
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """زمان ساختگی برای time.time و time.monotonic؛ sleep زمان را جلو می‌برد و مدت‌ها ثبت می‌شوند"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, 'time', fake)
+    monkeypatch.setattr(time, 'monotonic', fake)
+    monkeypatch.setattr(time, 'sleep', fake.sleep)
+    return fake
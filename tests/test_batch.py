@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import asgi
+import finder_price
+
+ITEMS = [
+    {"product_name": "گوشی", "calculated_price": 1000},
+    {"product_name": "خطا"},
+    {"strategy": "balanced"},
+]
+
+
+def fake_report(product_name, item):
+    if product_name == 'خطا':
+        raise RuntimeError('upstream down')
+    return {"success": True, "product_name": product_name, "calculated_price": item.get('calculated_price')}
+
+
+def by_index(lines):
+    reports = [json.loads(line) for line in lines if line.strip()]
+    return {report["index"]: report for report in reports}
+
+
+def check_reports(reports):
+    assert sorted(reports) == [0, 1, 2]
+    assert reports[0]["success"] and reports[0]["calculated_price"] == 1000
+    assert reports[1] == {"success": False, "message": "خطا در جستجو: upstream down", "index": 1}
+    assert reports[2] == {"success": False, "message": "product_name is required", "index": 2}
+
+
+@pytest.fixture
+def flask_client(monkeypatch):
+    def price_batch_item(item):
+        if not isinstance(item, dict) or not item.get('product_name'):
+            return {"success": False, "message": "product_name is required"}
+        return fake_report(item['product_name'], item)
+
+    monkeypatch.setattr(finder_price, 'price_batch_item', price_batch_item)
+    return finder_price.app.test_client()
+
+
+def test_flask_batch_accepts_json_list_and_items_object(flask_client):
+    for body in (ITEMS, {"items": ITEMS}):
+        response = flask_client.post('/search/batch', json=body)
+        assert response.mimetype == 'application/x-ndjson'
+        check_reports(by_index(response.get_data(as_text=True).splitlines()))
+
+
+def test_flask_batch_reads_ndjson_and_rejects_non_lists(flask_client):
+    body = '\n'.join(json.dumps(item, ensure_ascii=False) for item in ITEMS) + '\n\nnot json\n'
+    response = flask_client.post('/search/batch', data=body.encode(), content_type='application/x-ndjson')
+    reports = by_index(response.get_data(as_text=True).splitlines())
+    assert reports.pop(3)["message"] == "product_name is required"
+    check_reports(reports)
+
+    response = flask_client.post('/search/batch', json={"product_name": "گوشی"})
+    assert response.status_code == 400
+
+
+def test_iter_batch_reports_limits_concurrency(monkeypatch):
+    active = []
+    peak = []
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def price_batch_item(item):
+        with lock:
+            active.append(item)
+            peak.append(len(active))
+        release.wait(5)
+        with lock:
+            active.remove(item)
+        return {"success": True}
+
+    monkeypatch.setattr(finder_price, 'price_batch_item', price_batch_item)
+    reports = finder_price.iter_batch_reports(range(6), max_concurrency=2)
+    threading.Timer(0.05, release.set).start()
+    assert sorted(report["index"] for report in reports) == list(range(6))
+    assert max(peak) == 2
+
+
+def run_asgi_batch(chunks, content_type):
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/search/batch',
+             'headers': [(b'content-type', content_type.encode())]}
+    asyncio.run(asgi.search_batch(scope, receive, send))
+    body = b''.join(message.get('body', b'') for message in sent[1:]).decode('utf-8')
+    return sent[0]['status'], body
+
+
+@pytest.fixture
+def asgi_reports(monkeypatch):
+    async def search_report(product_name, item):
+        await asyncio.sleep(0)
+        return fake_report(product_name, item)
+
+    monkeypatch.setattr(asgi, '_search_report', search_report)
+
+
+def test_asgi_batch_streams_ndjson_split_across_chunks(asgi_reports):
+    body = ('\n'.join(json.dumps(item, ensure_ascii=False) for item in ITEMS) + '\n').encode()
+    status, text = run_asgi_batch([body[:7], body[7:40], body[40:]], 'application/x-ndjson')
+    assert status == 200
+    check_reports(by_index(text.splitlines()))
+
+
+def test_asgi_batch_accepts_json_and_rejects_non_lists(asgi_reports):
+    status, text = run_asgi_batch([json.dumps({"items": ITEMS}).encode()], 'application/json')
+    assert status == 200
+    check_reports(by_index(text.splitlines()))
+
+    status, text = run_asgi_batch([b'{"product_name": "x"}'], 'application/json')
+    assert status == 400 and json.loads(text)["success"] is False
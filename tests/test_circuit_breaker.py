@@ -0,0 +1,88 @@
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def make_breaker():
+    return CircuitBreaker('test', window=60, min_calls=4, error_rate=0.5,
+                          slow_call=2.0, open_seconds=30)
+
+
+def trip(breaker):
+    for ok in (True, False, False, True):
+        assert breaker.allow()
+        breaker.record(ok, 0.1)
+
+
+def test_stays_closed_below_min_calls_or_error_rate(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    breaker = make_breaker()
+    for ok in (True, True, True, False):
+        breaker.record(ok, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_opens_at_error_rate_and_rejects(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = make_breaker()
+    for latency in (0.1, 3.0, 2.5, 0.1):
+        breaker.record(True, latency)
+    assert breaker.state == OPEN
+
+
+def test_old_calls_leave_the_window(clock):
+    breaker = make_breaker()
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    clock.advance(61)
+    breaker.record(False, 0.1)
+    breaker.record(True, 0.1)
+    breaker.record(True, 0.1)
+    breaker.record(True, 0.1)
+    # بدون حذف دو خطای قدیمی نرخ خطا 3/6 بود و breaker باز می‌شد
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe_then_closes(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(29)
+    assert not breaker.allow()
+    clock.advance(1)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # فقط یک درخواست آزمایشی
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert breaker.snapshot()["calls"] == 0
+
+
+def test_failed_probe_reopens(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(30)
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    clock.advance(30)
+    assert breaker.allow()
+
+
+def test_release_frees_the_probe(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(30)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
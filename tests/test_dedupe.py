@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+
+import dedupe
+from dedupe import dedupe_many
+
+TITLE = 'گوشی موبایل سامسونگ Galaxy A54 ظرفیت 256 گیگابایت'
+
+
+def listing(title, price, shop, url=None, **extra):
+    return dict(title=title, price=price, shop=shop, url=url or f'https://{shop}/{title}', **extra)
+
+
+def not_torob(item):
+    return item['shop'] != 'torob'
+
+
+def test_same_listing_from_two_shops_is_removed_keeping_preferred():
+    results = [
+        listing(TITLE, 15_000_000, 'torob'),
+        listing(TITLE, 15_050_000, 'digikala'),
+        listing('هدفون بی سیم شیائومی', 900_000, 'basalam'),
+    ]
+    kept, removed = dedupe.dedupe(results, threshold=0.8, price_tolerance=0.01, prefer=not_torob)
+    assert removed == 1
+    assert [item['shop'] for item in kept] == ['digikala', 'basalam']
+
+
+def test_arabic_letters_and_spacing_do_not_hide_duplicates():
+    variant = TITLE.replace('ی', 'ي').replace('ک', 'ك') + '  '
+    kept, removed = dedupe.dedupe([listing(TITLE, 1_000_000, 'a'), listing(variant, 1_000_000, 'b')])
+    assert removed == 1
+
+
+def test_far_prices_and_different_titles_are_kept():
+    results = [
+        listing(TITLE, 15_000_000, 'a'),
+        listing(TITLE, 18_000_000, 'b'),
+        listing('گوشی موبایل شیائومی Redmi Note 12', 15_000_000, 'c'),
+    ]
+    kept, removed = dedupe.dedupe(results)
+    assert removed == 0
+    assert kept == results
+
+
+def test_same_url_with_close_price_is_duplicate():
+    url = 'https://www.digikala.com/product/dkp-1/'
+    results = [listing(TITLE, 2_000_000, 'digikala', url), listing('عنوان دیگر', 2_010_000, 'torob', url)]
+    assert dedupe.dedupe(results)[1] == 1
+
+
+def test_fallback_results_are_never_removed():
+    results = [listing(TITLE, 1_000_000, 'a', fallback=True),
+               listing(TITLE, 1_000_000, 'b', fallback=True)]
+    assert dedupe.dedupe(results) == (results, 0)
+
+
+def test_products_are_deduped_independently():
+    first = [listing(TITLE, 1_000_000, 'a')]
+    second = [listing(TITLE, 1_000_000, 'b')]
+    assert dedupe_many([first, second]) == [(first, 0), (second, 0)]
+    assert dedupe_many([]) == []
+    assert dedupe_many([[], first]) == [([], 0), (first, 0)]
+
+
+def test_chunked_batches_match_single_pass(monkeypatch):
+    products = []
+    for i in range(30):
+        title = f'{TITLE} مدل {i}'
+        products.append([listing(title, 1_000_000 + i, 'torob'), listing(title, 1_000_000 + i, 'digikala'),
+                         listing(f'قاب گوشی {i}', 50_000, 'basalam')])
+    expected = dedupe_many(products, prefer=not_torob)
+    monkeypatch.setattr(dedupe, 'CHUNK_SIZE', 7)
+    assert dedupe_many(products, prefer=not_torob) == expected
+    assert all(removed == 1 for _, removed in expected)
+
+
+def test_signatures_do_not_depend_on_python_hash_seed():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import dedupe; print(dedupe._signatures([dedupe.title_ngrams(%r)]).tolist())" % TITLE)
+    outputs = {
+        subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True,
+                       env=dict(os.environ, PYTHONHASHSEED=seed)).stdout
+        for seed in ('1', '2')
+    }
+    assert len(outputs) == 1
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+import finder_price
+from hedging import LatencyTracker
+
+PRIMARY = [{"title": "از API اصلی", "price": 1_000_000}]
+ALTERNATIVE = [{"title": "از API جایگزین", "price": 1_100_000}]
+SCRAPED = [{"title": "از اسکرپ", "price": 1_200_000}]
+
+
+def test_latency_tracker_uses_percentile_within_bounds():
+    tracker = LatencyTracker(default=0.5, percentile=0.9, minimum=0.1, maximum=2.0)
+    assert tracker.hedge_delay() == 0.5
+    for latency in (0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1):
+        tracker.add(latency)
+    assert tracker.hedge_delay() == 1.1
+    for _ in range(10):
+        tracker.add(5.0)
+    assert tracker.hedge_delay() == 2.0
+    assert LatencyTracker(default=0.01, minimum=0.1).hedge_delay() == 0.1
+
+
+def test_latency_tracker_keeps_only_recent_samples():
+    tracker = LatencyTracker(default=0, percentile=0.5, size=3)
+    for latency in (9, 9, 9, 1, 1, 1):
+        tracker.add(latency)
+    assert tracker.hedge_delay() == 1
+
+
+class Tiers(finder_price.PriceFinder):
+    """tierهای باسلام با نتیجه ثابت؛ primary تا آزاد شدن release (یا cancel) منتظر می‌ماند"""
+
+    def __init__(self, primary=PRIMARY, alternative=ALTERNATIVE, scraped=SCRAPED, block_primary=False):
+        self.results = {"primary": primary, "alternative": alternative, "scrape": scraped}
+        self.block_primary = block_primary
+        self.release = threading.Event()
+        self.calls = []
+        self.primary_cancelled = threading.Event()
+
+    def basalam_primary_search(self, product_name, cancel=None, timeout=15):
+        self.calls.append("primary")
+        if self.block_primary:
+            self.release.wait(5)
+            if cancel is not None and cancel.is_set():
+                self.primary_cancelled.set()
+                return []
+        return self.results["primary"]
+
+    def basalam_alternative_search(self, product_name, cancel=None, timeout=15):
+        self.calls.append("alternative")
+        return self.results["alternative"]
+
+    def basalam_web_scraping(self, product_name):
+        self.calls.append("scrape")
+        return self.results["scrape"]
+
+
+@pytest.fixture
+def latency(monkeypatch):
+    tracker = LatencyTracker(default=0.05, minimum=0.05, maximum=0.05)
+    monkeypatch.setattr(finder_price, 'basalam_primary_latency', tracker)
+    return tracker
+
+
+def test_fast_primary_wins_without_starting_alternative(latency):
+    tiers = Tiers()
+    assert tiers.basalam_hedged_search('گوشی') == PRIMARY
+    assert tiers.calls == ["primary"]
+    assert len(latency._samples) == 1
+
+
+def test_slow_primary_is_hedged_and_loser_is_cancelled(latency):
+    tiers = Tiers(block_primary=True)
+    try:
+        assert tiers.basalam_hedged_search('گوشی') == ALTERNATIVE
+    finally:
+        tiers.release.set()
+    assert tiers.calls == ["primary", "alternative"]
+    assert tiers.primary_cancelled.wait(5)
+
+
+def test_scrape_runs_only_when_both_apis_are_empty(latency):
+    tiers = Tiers(primary=[], alternative=[])
+    assert tiers.basalam_hedged_search('گوشی') == SCRAPED
+    assert sorted(tiers.calls) == ["alternative", "primary", "scrape"]
+
+
+def test_tiers_run_in_sequence_without_free_hedge_slots(latency, monkeypatch):
+    monkeypatch.setattr(finder_price, 'hedge_slots', threading.BoundedSemaphore(1))
+    finder_price.hedge_slots.acquire()
+    tiers = Tiers(primary=[])
+    assert tiers.basalam_hedged_search('گوشی') == ALTERNATIVE
+    assert tiers.calls == ["primary", "alternative"]
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import prewarm
+from prewarm import LeaderLock, RefreshScheduler, SharedPopularity
+from result_cache import ResultCache
+
+needs_fcntl = pytest.mark.skipif(prewarm.fcntl is None, reason='needs fcntl')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# پروسه جدا که رهبر می‌شود و تا بسته شدن stdin قفل را نگه می‌دارد
+HOLDER = """
+import logging
+import sys
+from prewarm import LeaderLock
+logging.disable(logging.CRITICAL)
+print(LeaderLock(sys.argv[1]).acquire(), flush=True)
+sys.stdin.read()
+"""
+
+
+class Finder:
+    def __init__(self):
+        self.queries = []
+
+    def search_torob(self, query):
+        self.queries.append(query)
+        return [{"name": query, "price": 1000}]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@needs_fcntl
+def test_only_one_lock_holder_until_it_releases(tmp_path):
+    path = str(tmp_path / 'prewarm.lock')
+    first, second = LeaderLock(path), LeaderLock(path)
+    assert first.acquire() and first.is_leader
+    assert not second.acquire() and not second.is_leader
+    # دوباره صدا زدن acquire برای رهبر فعلی قفل جدیدی نمی‌گیرد
+    assert first.acquire()
+
+    os.close(first._fd)
+    assert second.acquire() and second.is_leader
+
+
+@needs_fcntl
+def test_leadership_moves_when_the_leader_process_exits(tmp_path):
+    path = str(tmp_path / 'prewarm.lock')
+    holder = subprocess.Popen([sys.executable, '-c', HOLDER, path], cwd=ROOT, text=True,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        assert holder.stdout.readline().strip() == 'True'
+        lock = LeaderLock(path)
+        assert not lock.acquire()
+    finally:
+        holder.stdin.close()
+        holder.wait(5)
+    assert lock.acquire()
+
+
+def test_without_lock_file_every_process_leads():
+    lock = LeaderLock('')
+    assert lock.is_leader and lock.acquire()
+
+
+@needs_fcntl
+def test_only_the_leader_scheduler_refreshes(tmp_path):
+    path = str(tmp_path / 'prewarm.lock')
+    finders = [Finder(), Finder()]
+    schedulers = [
+        RefreshScheduler(ResultCache(16, 600, 60, 1800), finder, [('ترب', 'search_torob')],
+                         watchlist=['گوشی'], tick=0.01, leader=LeaderLock(path)).start()
+        for finder in finders
+    ]
+    try:
+        assert wait_until(lambda: any(finder.queries for finder in finders))
+        time.sleep(0.1)
+    finally:
+        for scheduler in schedulers:
+            scheduler.stop()
+    leaders = [scheduler.stats()["leader"] for scheduler in schedulers]
+    assert sorted(leaders) == [False, True]
+    assert [bool(finder.queries) for finder in finders] == leaders
+
+
+def test_shared_popularity_adds_scores_from_all_workers(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first = SharedPopularity(path, half_life=86400, max_entries=10)
+    second = SharedPopularity(path, half_life=86400, max_entries=10)
+    now = 1000.0
+    first.note('گوشی', now)
+    second.note('گوشي', now)
+    second.note('لپ تاپ', now)
+    # تا flush نشده فقط در حافظه همان worker است
+    assert first.top(5, 1, now) == []
+
+    assert first.flush(now) == 1 and second.flush(now) == 2
+    assert first.top(5, 2, now) == [(2.0, 'گوشي')]
+    assert len(first) == 2
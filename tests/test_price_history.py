@@ -0,0 +1,95 @@
+import pytest
+
+import price_history
+from price_history import PriceHistory, observation_rows, records
+
+
+def item(price, shop='دیجی‌کالا', url='https://example.com/p/1', **extra):
+    return dict(price=price, shop=shop, url=url, title='گوشی سامسونگ A54', **extra)
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = PriceHistory(str(tmp_path / 'history.db'), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def fill(history, rows):
+    """نوشتن مستقیم ردیف‌ها با زمان مشخص (بدون صف)"""
+    history._write(history._connect(), rows)
+
+
+def test_observation_rows_skip_fallback_and_invalid_prices():
+    rows = observation_rows('digikala', ' گوشي  سامسونگ ', [
+        item(15_000_000),
+        item(900),
+        item(12_000_000, fallback=True),
+        item(14_000_000, url='#'),
+        {"price": None},
+    ], ts=100.0)
+    assert rows == [
+        (100.0, 'گوشی سامسونگ', 'digikala', 'دیجی‌کالا', 'https://example.com/p/1', 'گوشی سامسونگ A54', 15_000_000),
+        (100.0, 'گوشی سامسونگ', 'digikala', 'دیجی‌کالا', None, 'گوشی سامسونگ A54', 14_000_000),
+    ]
+
+
+def test_recorded_rows_are_written_by_the_background_writer(history):
+    history.record('torob', 'گوشی سامسونگ', [item(15_000_000), item(16_000_000)])
+    history.record('torob', 'گوشی سامسونگ', [])
+    history.close()
+    assert history.stats()["written"] == 2 and history.stats()["pending"] == 0
+    assert [row["price"] for row in history.observations(query='گوشی سامسونگ')] == [15_000_000, 16_000_000]
+
+
+def test_queries_filter_by_query_url_source_and_time(history):
+    fill(history, observation_rows('torob', 'گوشی', [item(10_000)], ts=100)
+         + observation_rows('torob', 'گوشی', [item(12_000, url='https://example.com/p/2')], ts=200)
+         + observation_rows('digikala', 'گوشی', [item(11_000)], ts=300)
+         + observation_rows('torob', 'تبلت', [item(20_000, url='https://example.com/p/3')], ts=300))
+
+    assert [row["price"] for row in history.observations(query='گوشي')] == [10_000, 12_000, 11_000]
+    assert [row["price"] for row in history.observations(url='https://example.com/p/1')] == [10_000, 11_000]
+    assert [row["price"] for row in history.observations(query='گوشی', source='torob', start=150)] == [12_000]
+    assert [row["price"] for row in history.observations(query='گوشی', end=300, limit=1)] == [10_000]
+
+
+def test_series_downsamples_per_source_and_bucket(history):
+    fill(history, observation_rows('torob', 'گوشی', [item(10_000), item(14_000)], ts=100)
+         + observation_rows('torob', 'گوشی', [item(12_000)], ts=170)
+         + observation_rows('torob', 'گوشی', [item(20_000)], ts=230)
+         + observation_rows('digikala', 'گوشی', [item(11_000)], ts=110))
+    assert history.series(120, query='گوشی') == {
+        'digikala': [{"ts": 0, "min": 11_000, "max": 11_000, "avg": 11_000, "count": 1}],
+        'torob': [
+            {"ts": 0, "min": 10_000, "max": 14_000, "avg": 12_000, "count": 2},
+            {"ts": 120, "min": 12_000, "max": 20_000, "avg": 16_000, "count": 2},
+        ],
+    }
+
+
+def test_top_queries_count_distinct_minutes(history):
+    fill(history, observation_rows('torob', 'گوشی', [item(10_000)], ts=0)
+         + observation_rows('digikala', 'گوشی', [item(10_000)], ts=5)
+         + observation_rows('torob', 'گوشی', [item(10_000)], ts=120)
+         + observation_rows('torob', 'تبلت', [item(10_000)], ts=0))
+    assert history.top_queries(5) == [('گوشی', 2), ('تبلت', 1)]
+
+
+def test_iter_export_streams_all_matching_rows(history):
+    fill(history, [row for ts in range(7) for row in observation_rows('torob', 'گوشی', [item(10_000 + ts)], ts=ts)])
+    rows = list(history.iter_export(batch_size=3, query='گوشی', start=2))
+    assert [row[-1] for row in rows] == [10_002, 10_003, 10_004, 10_005, 10_006]
+
+
+def test_records_decorator_records_sync_results(history, monkeypatch):
+    monkeypatch.setattr(price_history, 'price_history', history)
+
+    class Finder:
+        @records('basalam')
+        def search_basalam(self, product_name):
+            return [item(15_000_000, shop='باسلام')]
+
+    assert Finder().search_basalam('گوشی')[0]["price"] == 15_000_000
+    history.close()
+    assert [row["source"] for row in history.observations(query='گوشی')] == ['basalam']
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from price_parser import RIAL, TOMAN, detect_unit, parse_number, parse_price, parse_prices
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'benchmarks', 'fixtures', 'price_strings.json')
+
+
+@pytest.mark.parametrize('text, unit', [
+    ('۱۲۰٬۰۰۰ تومان', TOMAN),
+    ('1,200,000 ریال', RIAL),
+    ('1,200,000 ريال', RIAL),
+    ('۵۰۰۰ ﷼', RIAL),
+    ('25,000 Toman', TOMAN),
+    ('250,000 IRR', RIAL),
+    ('250000', None),
+])
+def test_detect_unit(text, unit):
+    assert detect_unit(text) == unit
+
+
+def test_rial_converted_to_toman():
+    assert parse_price('۱٬۲۰۰٬۰۰۰ ریال') == 120000
+    assert parse_price('1.250.000 ریال') == 125000
+
+
+def test_default_unit_used_without_explicit_unit():
+    assert parse_price('۱۲۰۰۰۰') == 120000
+    assert parse_price('۱۲۰۰۰۰', RIAL) == 12000
+    # واحد صریح متن بر default_unit مقدم است
+    assert parse_price('۱۲۰۰۰۰ تومان', RIAL) == 120000
+
+
+def test_number_before_unit_is_the_price():
+    assert parse_price('۲۰٪ تخفیف ۱۲۰,۰۰۰ تومان ۳ عدد') == 120000
+    assert parse_price('۳ عدد، قیمت ۲۴۰٬۰۰۰ ریال') == 24000
+
+
+def test_numeric_values_and_invalid_input():
+    assert parse_price(1200000, RIAL) == 120000
+    assert parse_price(99.9) == 99
+    assert parse_price(None) is None
+    assert parse_price(True) is None
+    assert parse_price('ناموجود') is None
+    assert parse_price(0) is None
+
+
+def test_corpus():
+    with open(CORPUS, encoding='utf-8') as f:
+        corpus = json.load(f)
+    for case in corpus:
+        assert parse_price(case['text'], case['default_unit']) == case['expected'], case['text']
+
+
+@pytest.mark.parametrize('default_unit', [TOMAN, RIAL])
+def test_parse_prices_matches_parse_price(default_unit):
+    with open(CORPUS, encoding='utf-8') as f:
+        texts = [case['text'] for case in json.load(f)]
+    texts += ['', 'بدون قیمت', 'تومان ۵۰۰۰', '1 2 3', 'a\x00b 1200', None, 1200000, 5.5]
+    assert parse_prices(texts, default_unit) == [parse_price(t, default_unit) for t in texts]
+
+
+def test_parse_number_returns_int():
+    assert parse_number('۱۲٬۵۰۰ تومان') == 12500
+    assert parse_number('12.5') == 12
+    assert isinstance(parse_number('12.5'), int)
+    assert parse_number('1.250.000') == 1250000
+    assert parse_number('') is None
+    assert parse_number('بدون عدد') is None
@@ -0,0 +1,71 @@
+import random
+import statistics
+
+import pytest
+
+import price_stats
+
+
+def reference_stats(prices):
+    """محاسبه مستقیم با statistics (همان تعریف build_price_report اولیه)"""
+    filtered = prices
+    if len(prices) >= 4:
+        ordered = sorted(prices)
+        q1 = statistics.median(ordered[:len(ordered)//2])
+        q3 = statistics.median(ordered[(len(ordered)+1)//2:])
+        iqr = q3 - q1
+        filtered = [p for p in prices if q1 - 1.5 * iqr <= p <= q3 + 1.5 * iqr] or prices
+    return min(filtered), max(filtered), sum(filtered) / len(filtered), statistics.median(filtered)
+
+
+def test_parity_with_statistics_median():
+    rnd = random.Random(7)
+    for _ in range(2000):
+        base = rnd.randint(100_000, 50_000_000)
+        prices = [int(base * rnd.uniform(0.8, 1.25)) for _ in range(rnd.randint(1, 30))]
+        if len(prices) > 4 and rnd.random() < 0.5:
+            prices[rnd.randrange(len(prices))] = base * 20
+        summary = price_stats.summarize(prices)
+        assert (summary["min"], summary["max"], summary["avg"], summary["fair_price"]) == \
+            pytest.approx(reference_stats(prices))
+
+
+def test_outlier_removed():
+    summary = price_stats.summarize([100, 102, 98, 101, 99, 5000])
+    assert summary["filtered_count"] == 5
+    assert summary["max"] == 102
+    assert summary["fair_price"] == 100
+
+
+def test_small_lists_keep_everything():
+    assert price_stats.remove_outliers([100, 5000, 7]) == [100, 5000, 7]
+    summary = price_stats.summarize([100, 5000, 7])
+    assert (summary["min"], summary["max"], summary["fair_price"]) == (7, 5000, 100)
+
+
+def test_empty():
+    assert price_stats.summarize([]) is None
+
+
+def test_shop_stats_use_all_prices_in_first_seen_order():
+    summary = price_stats.summarize([100, 102, 98, 101, 99, 5000],
+                                    ['ترب', 'باسلام', 'ترب', 'باسلام', 'ترب', 'باسلام'])
+    assert list(summary["shops"]) == ['ترب', 'باسلام']
+    assert summary["shops"]['باسلام'] == {"count": 3, "min": 101, "max": 5000,
+                                          "total": 5203, "avg": 5203 / 3}
+
+
+@pytest.mark.parametrize('strategy, expected', [
+    ('competitive', int(1000 * 0.7 + 2000 * 0.3)),
+    ('value-based', int(1000 * 0.3 + 2000 * 0.7)),
+    ('balanced', 1500),
+    ('unknown', 1500),
+])
+def test_suggest_price_strategies(strategy, expected):
+    assert price_stats.suggest_price(1000, 2000, strategy) == expected
+
+
+def test_suggest_price_without_base_price_and_with_trend():
+    assert price_stats.suggest_price(1000.5, None, 'competitive') == 1000
+    assert price_stats.suggest_price(1000, None, 'balanced', trend=1.1) == 1100
+    assert price_stats.suggest_price(1000, 2000, 'balanced', trend=1.1) == 1550
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+import rate_limit
+from rate_limit import HostLimiter, RateLimitedError, _LocalSlots, _SharedSlots, parse_limits, wait_scope
+
+
+def make_limiter(slots=None, rate=10.0, burst=2.0, max_wait=5.0):
+    return HostLimiter('api.example.com', rate, burst, slots or _LocalSlots(), max_wait)
+
+
+def test_burst_then_waits_at_rate(clock):
+    limiter = make_limiter()
+    assert [limiter.acquire() for _ in range(4)] == pytest.approx([0, 0, 0.1, 0.1])
+    assert clock.sleeps == pytest.approx([0.1, 0.1])
+    assert limiter.snapshot()["waits"] == 2
+
+
+def test_reservations_queue_behind_each_other(clock):
+    limiter = make_limiter(rate=10, burst=1)
+    assert limiter.acquire() == 0
+    # دو نوبت رزرو شده بدون گذشت زمان: 0.1 و 0.2 ثانیه
+    assert limiter._take_turn(None) == pytest.approx(0.1)
+    assert limiter._take_turn(None) == pytest.approx(0.2)
+
+
+def test_rejects_when_turn_is_after_max_wait(clock):
+    limiter = make_limiter(rate=1, burst=1, max_wait=0.5)
+    limiter.acquire()
+    with pytest.raises(RateLimitedError):
+        limiter.acquire()
+    assert limiter.snapshot()["rejected"] == 1
+    # درخواست رد شده توکنی مصرف نمی‌کند
+    clock.advance(1)
+    assert limiter.acquire() == 0
+
+
+def test_timeout_and_wait_scope_deadline_limit_the_wait(clock):
+    limiter = make_limiter(rate=1, burst=1)
+    limiter.acquire()
+    with pytest.raises(RateLimitedError):
+        limiter.acquire(timeout=0.5)
+    with wait_scope(deadline=clock.now + 0.5):
+        with pytest.raises(RateLimitedError):
+            limiter.acquire()
+    with wait_scope(deadline=clock.now + 2) as scope:
+        assert limiter.acquire() == pytest.approx(1.0)
+    assert (scope.waits, scope.waited) == (1, pytest.approx(1.0))
+
+
+def test_try_acquire_does_not_queue(clock):
+    limiter = make_limiter(rate=1, burst=2)
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    clock.advance(1)
+    assert limiter.try_acquire()
+
+
+def test_cancelled_async_wait_refunds_its_turn():
+    limiter = make_limiter(rate=2, burst=1)
+
+    async def main():
+        limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # نوبت برگردانده شده؛ درخواست بعدی پشت نوبت لغو شده صبر نمی‌کند
+        return limiter._take_turn(None)
+
+    # بدون برگرداندن نوبت انتظار حدود 0.95 ثانیه بود
+    assert asyncio.run(main()) < 0.5
+
+
+@pytest.mark.skipif(rate_limit.fcntl is None, reason='needs fcntl')
+def test_shared_slots_share_tokens_between_limiters(clock, tmp_path):
+    path = str(tmp_path / 'slots')
+    first = make_limiter(_SharedSlots(path), rate=1, burst=2)
+    second = make_limiter(_SharedSlots(path), rate=1, burst=2)
+    assert first.try_acquire()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+    assert not second.try_acquire()
+    other_host = HostLimiter('api.other.com', 1, 1, _SharedSlots(path), 5)
+    assert other_host.try_acquire()
+
+
+def test_parse_limits():
+    assert parse_limits('api.torob.com=20:40, api.digikala.com=10,bad,x=abc,y=0') == {
+        'api.torob.com': (20.0, 40.0),
+        'api.digikala.com': (10.0, 10.0),
+    }
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+ITEMS = [{"name": "گوشی", "price": 1000}]
+
+
+def make_cache(db_path=None):
+    return ResultCache(max_entries=16, ttl=60, negative_ttl=10, stale_ttl=120, db_path=db_path)
+
+
+class Fetcher:
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def test_fresh_entry_is_served_without_fetch(clock):
+    cache = make_cache()
+    fetch = Fetcher(ITEMS)
+    assert cache.get_or_fetch('torob', 'گوشی', fetch) == (ITEMS, {"hit": False, "stale": False, "age": 0})
+    clock.advance(30)
+    # کلید با عبارت نرمال‌شده ساخته می‌شود
+    value, meta = cache.get_or_fetch('torob', '  گوشي ', fetch)
+    assert value == ITEMS
+    assert meta == {"hit": True, "stale": False, "age": 30.0}
+    assert fetch.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_stale_entry_is_served_and_refreshed_in_background(clock):
+    cache = make_cache()
+    fresh = [{"name": "گوشی", "price": 900}]
+    fetch = Fetcher(ITEMS, fresh)
+    cache.get_or_fetch('torob', 'گوشی', fetch)
+    clock.advance(90)
+
+    value, meta = cache.get_or_fetch('torob', 'گوشی', fetch)
+    assert value == ITEMS
+    assert meta["stale"] and meta["hit"]
+    cache._refresh_executor.shutdown(wait=True)
+    assert fetch.calls == 2
+
+    value, meta = cache.get_or_fetch('torob', 'گوشی', fetch)
+    assert value == fresh and not meta["stale"]
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_entry_past_stale_window_is_fetched_again(clock):
+    cache = make_cache()
+    fetch = Fetcher(ITEMS, ITEMS)
+    cache.get_or_fetch('torob', 'گوشی', fetch)
+    clock.advance(60 + 120)
+    assert cache.get_or_fetch('torob', 'گوشی', fetch)[1]["hit"] is False
+    assert fetch.calls == 2
+
+
+def test_negative_entries_use_short_ttl_without_stale(clock):
+    cache = make_cache()
+    fallback = [{"name": "گوشی", "fallback": True}]
+    fetch = Fetcher([], fallback)
+    cache.get_or_fetch('torob', 'گوشی', fetch)
+    clock.advance(5)
+    assert cache.get_or_fetch('torob', 'گوشی', fetch) == ([], {"hit": True, "stale": False, "age": 5.0})
+    # بعد از negative_ttl نتیجه خالی کهنه برگردانده نمی‌شود
+    clock.advance(6)
+    assert cache.get_or_fetch('torob', 'گوشی', fetch) == (fallback, {"hit": False, "stale": False, "age": 0})
+    assert cache.freshness('torob', 'گوشی') == (0, 10)
+
+
+def test_fetch_errors_are_cached_as_negative(clock):
+    cache = make_cache()
+    fetch = Fetcher(RuntimeError('upstream down'), ITEMS)
+    with pytest.raises(RuntimeError):
+        cache.get_or_fetch('torob', 'گوشی', fetch)
+    assert cache.get_or_fetch('torob', 'گوشی', fetch)[0] == []
+    clock.advance(10)
+    assert cache.get_or_fetch('torob', 'گوشی', fetch)[0] == ITEMS
+    assert fetch.calls == 2
+
+
+def test_async_fetch_uses_the_same_entries(clock):
+    cache = make_cache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return ITEMS
+
+    async def run():
+        first = await cache.get_or_fetch_async('torob', 'گوشی', fetch)
+        second = await cache.get_or_fetch_async('torob', 'گوشی', fetch)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first[1]["hit"] is False and second[1]["hit"] is True
+    assert cache.get_or_fetch('torob', 'گوشی', Fetcher())[0] == ITEMS
+    assert len(calls) == 1
+
+
+def test_disk_tier_is_shared_and_newer_entries_win(clock, tmp_path):
+    path = str(tmp_path / 'cache.db')
+    first, second = make_cache(path), make_cache(path)
+    first.get_or_fetch('torob', 'گوشی', Fetcher(ITEMS))
+    assert second.get_or_fetch('torob', 'گوشی', Fetcher())[0] == ITEMS
+
+    # ورودی منقضی حافظه با نسخه تازه‌تری که worker دیگر نوشته جایگزین می‌شود
+    clock.advance(61)
+    fresh = [{"name": "گوشی", "price": 900}]
+    first.store(first.make_key('torob', 'گوشی'), fresh)
+    assert second.get_or_fetch('torob', 'گوشی', Fetcher())[0] == fresh
+
+
+def test_store_purges_expired_disk_entries_periodically(clock, tmp_path):
+    cache = make_cache(str(tmp_path / 'cache.db'))
+    cache.store('torob:قدیمی', ITEMS)
+    clock.advance(60 + 120 + 1)
+    cache.store('torob:میانی', ITEMS)
+    # هنوز PURGE_INTERVAL از ساخت cache نگذشته
+    assert cache.disk.get('torob:قدیمی') is not None
+
+    clock.advance(result_cache.PURGE_INTERVAL - 181)
+    cache.store('torob:تازه', ITEMS)
+    assert cache.disk.get('torob:قدیمی') is None
+    assert cache.disk.get('torob:تازه') is not None
+
+
+def test_counters_are_exact_under_concurrent_lookups(clock):
+    cache = make_cache()
+    cache.get_or_fetch('torob', 'گوشی', Fetcher(ITEMS))
+
+    def lookup():
+        for _ in range(500):
+            cache.get_or_fetch('torob', 'گوشی', Fetcher())
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["hits"] == 8 * 500
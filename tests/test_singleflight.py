@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ['result']
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(group.do('key', fn)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(group.do('key', fn))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    while group.coalesced < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [['result']] * 5
+    assert group.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_exception_reaches_waiters_and_key_is_released():
+    group = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError('upstream')
+
+    errors = []
+
+    def call():
+        try:
+            group.do('key', failing)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    while group.coalesced < 1:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 2
+    # کلید بعد از پایان آزاد است و فراخوانی بعدی دوباره اجرا می‌شود
+    assert group.do('key', lambda: 'again') == 'again'
+    assert group.executed == 2
+
+
+def test_sequential_calls_are_not_coalesced():
+    group = SingleFlight()
+    assert group.do('a', lambda: 1) == 1
+    assert group.do('a', lambda: 2) == 2
+    assert group.coalesced == 0
+
+
+def test_async_calls_share_one_execution_and_survive_cancelled_waiter():
+    group = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'shared'
+
+    async def main():
+        impatient = asyncio.ensure_future(group.do_async('key', fetch))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(group.do_async('key', fetch)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return results
+
+    assert asyncio.run(main()) == ['shared'] * 3
+    assert len(calls) == 1
+    assert group.stats()["in_flight"] == 0
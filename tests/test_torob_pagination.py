@@ -0,0 +1,91 @@
+import asyncio
+
+import settings
+from torob_integration.api import Torob
+from torob_integration.async_api import AsyncTorob
+
+
+def page(*prks, more=True):
+    return {"results": [{"prk": prk, "name": f"محصول {prk}"} for prk in prks],
+            "next": "next" if more else None}
+
+
+class FakeTorob(AsyncTorob):
+    """صفحه‌های ثابت به جای API؛ صفحه‌های بعد از اول با تأخیر delay، درخواست و لغو شده‌ها ثبت می‌شوند"""
+
+    def __init__(self, pages, delay=0.0):
+        super().__init__(concurrency=1)
+        self.pages = pages
+        self.delay = delay
+        self.requested = []
+        self.cancelled = []
+
+    async def search(self, q, page=0):
+        self.requested.append(page)
+        try:
+            await asyncio.sleep(self.delay if page else 0)
+        except asyncio.CancelledError:
+            self.cancelled.append(page)
+            raise
+        return self.pages[page] if page < len(self.pages) else {}
+
+
+PAGES = [page('a', 'b', 'c', 'd'), page('d', 'e', 'f', 'g'), page('h', more=False)]
+
+
+def collect(client, limit=None, **kwargs):
+    async def run():
+        products = []
+        pages = client.search_pages('گوشی', **kwargs)
+        try:
+            async for product in pages:
+                products.append(product["prk"])
+                # مصرف‌کننده واقعی بین محصولات کار async دیگری هم انجام می‌دهد
+                await asyncio.sleep(0)
+                if limit is not None and len(products) >= limit:
+                    break
+        finally:
+            await pages.aclose()
+        # فرصت برای اجرای لغو صفحه prefetch شده
+        await asyncio.sleep(0.01)
+        return products
+
+    return asyncio.run(run())
+
+
+def test_pages_are_walked_until_no_next_without_duplicates():
+    client = FakeTorob(PAGES)
+    assert collect(client, prefetch_remaining=2) == list('abcdefgh')
+    assert client.requested == [0, 1, 2]
+
+
+def test_next_page_is_not_requested_when_consumer_stops_early():
+    client = FakeTorob(PAGES)
+    assert collect(client, limit=2, prefetch_remaining=2) == ['a', 'b']
+    assert client.requested == [0]
+
+
+def test_prefetched_page_is_cancelled_when_consumer_stops():
+    client = FakeTorob(PAGES, delay=1.0)
+    assert collect(client, limit=3, prefetch_remaining=2) == ['a', 'b', 'c']
+    assert client.requested == [0, 1]
+    assert client.cancelled == [1]
+
+
+def test_max_pages_limits_requests():
+    client = FakeTorob(PAGES)
+    assert collect(client, max_pages=1, prefetch_remaining=2) == list('abcd')
+    assert client.requested == [0]
+
+
+def test_sync_search_iter_pages_lazily(monkeypatch):
+    monkeypatch.setattr(settings, 'TOROB_SEARCH_PREFETCH_REMAINING', 1)
+    torob = Torob()
+    torob._client = FakeTorob(PAGES)
+    products = torob.search_iter('گوشی')
+    assert [next(products)["prk"] for _ in range(2)] == ['a', 'b']
+    products.close()
+    assert torob._client.requested == [0]
+
+    torob._client = FakeTorob(PAGES)
+    assert [product["prk"] for product in torob.search_iter('گوشی')] == list('abcdefgh')
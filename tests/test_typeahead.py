@@ -0,0 +1,150 @@
+import asyncio
+
+from typeahead import PrefixIndex, Typeahead, parse_suggestions
+
+
+class Budget:
+    """بودجه ساختگی با تعداد مشخص درخواست"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def try_acquire(self):
+        if self.tokens <= 0:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Upstream:
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.prefixes = []
+
+    def __call__(self, prefix):
+        self.prefixes.append(prefix)
+        return {"results": [{"text": text} for text in self.texts]}
+
+
+def make_typeahead(budget=None, **kwargs):
+    return Typeahead(PrefixIndex(100), limit=3, budget=budget or Budget(100), **kwargs)
+
+
+def test_typos_stay_below_upstream_until_seen_several_times():
+    typeahead = make_typeahead(history_min_seen=3)
+    typeahead.suggest('گوش', Upstream('گوشی سامسونگ'))
+    typeahead.note_search('گوشی سامسنگ')
+    assert typeahead.index.lookup('گوشی', 3) == ['گوشی سامسونگ', 'گوشی سامسنگ']
+
+    # با history_min_seen جستجو هم‌وزن پیشنهاد ترب و بعد از آن بالاتر
+    for _ in range(4):
+        typeahead.note_search('گوشی شیائومی')
+    assert typeahead.index.lookup('گوشی', 3)[0] == 'گوشی شیائومی'
+
+
+def test_seed_weights_history_by_search_count():
+    typeahead = make_typeahead(history_min_seen=3)
+    typeahead.index.add('لپ تاپ ایسوس', 0.5)
+    typeahead.seed([('لپ تاپ لنوو', 10), ('لپ تپ', 1)])
+    assert typeahead.index.lookup('لپ', 3) == ['لپ تاپ لنوو', 'لپ تاپ ایسوس', 'لپ تپ']
+
+
+def test_prefix_index_returns_prefix_range_by_score():
+    index = PrefixIndex(100)
+    for text, score in (('گوشی سامسونگ', 2), ('گوشواره', 1), ('گوشی اپل', 3), ('گوجه', 5), ('گوشي نوکیا', 0.5)):
+        index.add(text, score)
+    assert index.lookup('گوش', 10) == ['گوشی اپل', 'گوشی سامسونگ', 'گوشواره', 'گوشي نوکیا']
+    assert index.lookup('گوشی', 2) == ['گوشی اپل', 'گوشی سامسونگ']
+    assert index.lookup('تبلت', 5) == []
+
+    # بدون increment بیشینه امتیاز می‌ماند، با increment جمع می‌شود
+    index.add('گوشواره', 0.1)
+    index.add('گوشواره', 3, increment=True)
+    assert index.lookup('گوش', 1) == ['گوشواره']
+
+
+def test_prefix_index_prunes_lowest_scores():
+    index = PrefixIndex(10)
+    for i in range(11):
+        index.add(f'عبارت {i:02d}', i)
+    assert len(index) == 9
+    assert index.lookup('عبارت', 20)[-1] == 'عبارت 02'
+
+
+def test_parse_suggestions_accepts_common_shapes():
+    assert parse_suggestions(['a', ' b ', '']) == ['a', 'b']
+    assert parse_suggestions({"results": [{"text": "a"}, {"title": "b"}, {"q": 3}]}) == ['a', 'b']
+    assert parse_suggestions(None) == []
+
+
+def test_full_index_answers_without_upstream():
+    typeahead = make_typeahead()
+    for text in ('گوشی اپل', 'گوشی سامسونگ', 'گوشی نوکیا'):
+        typeahead.index.add(text)
+    upstream = Upstream('گوشی شیائومی')
+    assert typeahead.suggest('گوشی', upstream)["source"] == "index"
+    # پیشوند کوتاه‌تر از min_chars هم بدون upstream
+    assert typeahead.suggest('گ', upstream)["suggestions"] == []
+    assert upstream.prefixes == []
+
+
+def test_miss_cache_remembers_prefix_and_empty_shorter_prefixes(clock):
+    typeahead = make_typeahead(miss_ttl=60)
+    upstream = Upstream('گوشی اپل')
+    response = typeahead.suggest('گوشی', upstream)
+    assert (response["suggestions"], response["source"]) == (['گوشی اپل'], "upstream")
+    assert typeahead.suggest('گوشی', upstream)["source"] == "index"
+    # پیشوند بلندتر از پیشوندی که نتیجه داشت دوباره پرسیده می‌شود
+    typeahead.suggest('گوشی ا', upstream)
+
+    empty = Upstream()
+    typeahead.suggest('زخر', empty)
+    typeahead.suggest('زخرف', empty)
+    assert empty.prefixes == ['زخر']
+    assert upstream.prefixes == ['گوشی', 'گوشی ا']
+
+    clock.advance(61)
+    typeahead.suggest('زخرف', empty)
+    assert empty.prefixes == ['زخر', 'زخرف']
+
+
+def test_budget_limits_upstream_requests():
+    typeahead = make_typeahead(budget=Budget(2))
+    upstream = Upstream('گوشی اپل')
+    sources = [typeahead.suggest(prefix, upstream)["source"] for prefix in ('لپ', 'تبلت', 'ساعت')]
+    assert sources == ["upstream", "upstream", "index"]
+    assert upstream.prefixes == ['لپ', 'تبلت']
+    stats = typeahead.stats()
+    assert (stats["upstream"], stats["throttled"], stats["misses"]) == (2, 1, 3)
+    # پیشوندی که به خاطر بودجه پرسیده نشد بعدا دوباره miss است
+    typeahead.budget.tokens = 1
+    assert typeahead.suggest('ساعت', upstream)["source"] == "upstream"
+
+
+def test_upstream_errors_are_remembered_as_empty(clock):
+    typeahead = make_typeahead()
+
+    def failing(prefix):
+        raise RuntimeError('torob down')
+
+    assert typeahead.suggest('گوشی', failing)["suggestions"] == []
+    assert typeahead.suggest('گوشی', Upstream('گوشی اپل'))["source"] == "index"
+
+
+def test_suggest_async_shares_index_and_miss_cache():
+    typeahead = make_typeahead()
+    prefixes = []
+
+    async def fetch(prefix):
+        prefixes.append(prefix)
+        return ['گوشی اپل']
+
+    async def run():
+        first = await typeahead.suggest_async('گوشی', fetch)
+        second = await typeahead.suggest_async('گوشی', fetch)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first["source"], second["source"]) == ("upstream", "index")
+    assert second["suggestions"] == ['گوشی اپل']
+    assert prefixes == ['گوشی']
@@ -0,0 +1,440 @@
+import asyncio
+import json
+import threading
+import time
+import urllib.parse
+
+import aiohttp
+
+import settings
+from circuit_breaker import CircuitOpenError, get_breaker
+from http_client import is_failure_status
+from log_setup import get_logger
+from metrics import observe
+from rate_limit import acquire_async
+from tracing import annotate, bind_coroutine, span
+
+logger = get_logger('torob')
+
+TOROB_BASE_URL = f"{settings.TOROB_API_BASE_URL}/v4"
+TOROB_SUGGESTION_URL = f"{settings.TOROB_API_BASE_URL}/suggestion2/"
+TOROB_HOST = urllib.parse.urlsplit(settings.TOROB_API_BASE_URL).netloc
+
+TOROB_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'application/json',
+    'Accept-Language': 'fa-IR,fa;q=0.9,en;q=0.8',
+    'Referer': 'https://torob.com/',
+}
+
+
+def _decode_json(body):
+    with span('json_decode', bytes=len(body)):
+        return json.loads(body)
+
+
+def _extract_param(url, name):
+    """استخراج مقدار یک پارامتر از more_info_url"""
+    start = url.find(f"{name}=")
+    if start == -1:
+        return None
+    start += len(name) + 1
+    end = url.find("&", start)
+    if end == -1:
+        end = len(url)
+    return url[start:end]
+
+
+def process_search_data(data):
+    """پردازش داده‌های جستجو مطابق با api.py"""
+    try:
+        if not data or not isinstance(data, dict):
+            return None
+
+        # بررسی وجود results
+        if 'results' not in data:
+            logger.warning("❌ فیلد results یافت نشد")
+            return None
+
+        results = data['results']
+        if not isinstance(results, list):
+            logger.warning("❌ results یک لیست نیست")
+            return None
+
+        logger.debug("📋 پردازش %s محصول...", len(results))
+
+        # پردازش هر محصول مطابق با __get_search_data_from_url
+        for item in results:
+            if 'more_info_url' in item and item['more_info_url']:
+                try:
+                    # استخراج prk و search_id از more_info_url
+                    more_info_url = item['more_info_url']
+
+                    prk = _extract_param(more_info_url, "prk")
+                    if prk is not None:
+                        item["prk"] = prk
+
+                    search_id = _extract_param(more_info_url, "search_id")
+                    if search_id is not None:
+                        item["search_id"] = search_id
+
+                    logger.debug("✅ محصول پردازش شد: prk=%s, search_id=%s", item.get('prk', 'N/A'), item.get('search_id', 'N/A'))
+
+                except Exception as e:
+                    logger.warning("❌ خطا در پردازش more_info_url: %s", e)
+                    continue
+
+        return data
+
+    except Exception as e:
+        logger.warning("❌ خطا در پردازش داده‌ها: %s", e)
+        return None
+
+
+class AsyncTorob:
+    """کلاینت asyncio برای API ترب با محدودیت همزمانی قابل تنظیم"""
+
+    def __init__(self, concurrency=None):
+        self.base_url = TOROB_BASE_URL
+        self.headers = dict(TOROB_HEADERS)
+        self.concurrency = concurrency or settings.TOROB_CONCURRENCY
+        self._session = None
+        self._semaphore = None
+        self._details_inflight = {}
+        # آمار استفاده مجدد از اتصال‌ها (مثل http_client.pool_stats)
+        self.connection_hits = 0
+        self.connection_misses = 0
+
+    def _trace_config(self):
+        trace = aiohttp.TraceConfig()
+
+        async def on_reuse(session, ctx, params):
+            self.connection_hits += 1
+
+        async def on_create(session, ctx, params):
+            self.connection_misses += 1
+
+        # زمان DNS و ساخت اتصال (TCP + TLS) در span جاری، وقتی trace فعال است
+        async def on_dns_start(session, ctx, params):
+            ctx.dns_started = time.perf_counter()
+
+        async def on_dns_end(session, ctx, params):
+            annotate(dns_ms=round((time.perf_counter() - ctx.dns_started) * 1000, 2))
+
+        async def on_create_start(session, ctx, params):
+            ctx.connect_started = time.perf_counter()
+
+        async def on_create_end(session, ctx, params):
+            annotate(connect_ms=round((time.perf_counter() - ctx.connect_started) * 1000, 2))
+
+        trace.on_connection_reuseconn.append(on_reuse)
+        trace.on_connection_create_end.append(on_create)
+        trace.on_dns_resolvehost_start.append(on_dns_start)
+        trace.on_dns_resolvehost_end.append(on_dns_end)
+        trace.on_connection_create_start.append(on_create_start)
+        trace.on_connection_create_end.append(on_create_end)
+        return trace
+
+    def _get_session(self):
+        # session و semaphore باید داخل همان event loop ساخته شوند
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=settings.HTTP_POOL_MAXSIZE,
+                ttl_dns_cache=300,
+                ssl=False,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                trace_configs=[self._trace_config()],
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def _get(self, url, params, timeout, endpoint):
+        """ارسال GET از طریق circuit breaker و برگرداندن (status, body متنی)"""
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(endpoint)
+
+        session = self._get_session()
+        with span('http', endpoint=endpoint, host=TOROB_HOST) as current:
+            # انتظار نوبت rate limit بیرون از semaphore تا جای درخواست‌های آماده را نگیرد
+            try:
+                await acquire_async(TOROB_HOST, timeout)
+            except BaseException:
+                breaker.release()
+                raise
+            async with self._semaphore:
+                started = time.monotonic()
+                if current is not None:
+                    # انتظار برای semaphore همزمانی
+                    annotate(queued_ms=round((time.perf_counter() - current.started) * 1000, 2))
+                try:
+                    async with session.get(url, params=params,
+                                           timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                        body = await response.text()
+                except asyncio.CancelledError:
+                    # لغو از طرف ما (مثلا صفحه prefetch شده‌ای که لازم نشد) خطای upstream نیست
+                    breaker.release()
+                    raise
+                except BaseException:
+                    breaker.record(False, time.monotonic() - started)
+                    raise
+                breaker.record(not is_failure_status(response.status), time.monotonic() - started)
+                annotate(status=response.status)
+                return response.status, body
+
+    async def _get_json(self, url, params, endpoint, timeout=10):
+        """GET ساده که در صورت خطا {} برمی‌گرداند"""
+        status, body = await self._get(url, params, timeout, endpoint)
+        if status == 200:
+            return _decode_json(body)
+        return {}
+
+    @observe('torob_search')
+    async def search(self, q, page=0):
+        """جستجو در ترب با استفاده از API اصلی"""
+        logger.debug("🔍 Torob API: جستجو برای '%s' در صفحه %s", q, page)
+
+        try:
+            url = f"{self.base_url}/base-product/search/"
+            params = {
+                'q': q,
+                'page': page
+            }
+
+            logger.debug("📡 درخواست به: %s", url)
+            logger.debug("📋 پارامترها: %s", params)
+
+            status, body = await self._get(url, params, timeout=15, endpoint='torob_search')
+            logger.debug("📊 Status Code: %s", status)
+
+            if status == 200:
+                data = _decode_json(body)
+                logger.debug("📦 داده دریافت شد: %s", type(data))
+
+                processed_data = process_search_data(data)
+
+                if processed_data and processed_data.get('results'):
+                    logger.debug("✅ API موفق: %s محصول", len(processed_data['results']))
+                    return processed_data
+                else:
+                    logger.warning("❌ داده‌های معتبری دریافت نشد")
+                    return None
+            else:
+                logger.warning("❌ خطای HTTP: %s", status)
+                logger.debug("📄 پاسخ: %s...", body[:200])
+                return None
+
+        except asyncio.TimeoutError:
+            logger.warning("❌ خطای Timeout")
+            return None
+        except aiohttp.ClientConnectionError:
+            logger.warning("❌ خطای اتصال")
+            return None
+        except json.JSONDecodeError as e:
+            logger.warning("❌ خطای JSON: %s", e)
+            return None
+        except Exception as e:
+            logger.warning("❌ خطای عمومی: %s", e)
+            return None
+
+    def search_cursor(self, q, max_pages=None):
+        """SearchPages برای گرفتن صفحه به صفحه نتایج جستجو"""
+        return SearchPages(self, q, max_pages or settings.TOROB_SEARCH_MAX_PAGES)
+
+    async def search_pages(self, q, max_pages=None, prefetch_remaining=None):
+        """
+        async generator محصولات جستجو، صفحه به صفحه و بدون محصول تکراری (prk).
+        صفحه بعد فقط وقتی مصرف‌کننده به prefetch_remaining محصول آخر صفحه فعلی رسید
+        در پس‌زمینه درخواست می‌شود؛ اگر مصرف‌کننده زودتر متوقف شود (break / aclose)
+        درخواست صفحه بعد لغو می‌شود.
+        """
+        if prefetch_remaining is None:
+            prefetch_remaining = settings.TOROB_SEARCH_PREFETCH_REMAINING
+        cursor = self.search_cursor(q, max_pages)
+        try:
+            while True:
+                products = await cursor.next_page()
+                if products is None:
+                    return
+                for i, product in enumerate(products):
+                    if len(products) - i <= prefetch_remaining:
+                        cursor.prefetch()
+                    yield product
+        finally:
+            cursor.cancel()
+
+    @observe('torob_details')
+    async def _fetch_details(self, prk, search_id):
+        try:
+            url = f"{self.base_url}/base-product/details/"
+            params = {'prk': prk}
+            if search_id:
+                params['search_id'] = search_id
+
+            logger.debug("📡 درخواست جزئیات: %s", url)
+            logger.debug("📋 پارامترها: %s", params)
+
+            status, body = await self._get(url, params, timeout=10, endpoint='torob_details')
+
+            if status == 200:
+                logger.debug("✅ جزئیات دریافت شد")
+                return _decode_json(body)
+            else:
+                logger.warning("❌ خطا در دریافت جزئیات: %s", status)
+                return {}
+
+        except Exception as e:
+            logger.warning("❌ خطا در details: %r", e)
+            return {}
+
+    async def details(self, prk, search_id=None):
+        """دریافت جزئیات محصول؛ درخواست‌های همزمان برای یک prk ادغام می‌شوند"""
+        if not prk:
+            return {}
+        task = self._details_inflight.get(prk)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_details(prk, search_id))
+            self._details_inflight[prk] = task
+            task.add_done_callback(lambda _: self._details_inflight.pop(prk, None))
+        return await asyncio.shield(task)
+
+    async def details_many(self, prks, search_ids=None):
+        """
+        دریافت همزمان جزئیات چند محصول (به جای N درخواست پشت سر هم).
+        خروجی لیستی هم‌ترتیب با prks است.
+        """
+        if search_ids is None:
+            search_ids = [None] * len(prks)
+        return await asyncio.gather(*(
+            self.details(prk, search_id) for prk, search_id in zip(prks, search_ids)
+        ))
+
+    @observe('torob_suggestion')
+    async def suggestion(self, q):
+        """پیشنهادات محصول"""
+        try:
+            return await self._get_json(TOROB_SUGGESTION_URL, {"q": q}, endpoint='torob_suggestion')
+        except Exception as e:
+            logger.warning("❌ خطا در suggestion: %r", e)
+            return {}
+
+    @observe('torob_special_offers')
+    async def special_offers(self, page=0):
+        """پیشنهادات ویژه"""
+        try:
+            return await self._get_json(f"{self.base_url}/special-offers/", {"page": page},
+                                        endpoint='torob_special_offers')
+        except Exception as e:
+            logger.warning("❌ خطا در special_offers: %r", e)
+            return {}
+
+    @observe('torob_price_chart')
+    async def price_chart(self, prk, search_id=None):
+        """نمودار قیمت محصول"""
+        try:
+            params = {"prk": prk}
+            if search_id:
+                params['search_id'] = search_id
+            return await self._get_json(f"{self.base_url}/base-product/price-chart/", params,
+                                        endpoint='torob_price_chart')
+        except Exception as e:
+            logger.warning("❌ خطا در price_chart: %r", e)
+            return {}
+
+    def pool_stats(self):
+        """آمار استفاده مجدد از اتصال‌ها برای api.torob.com"""
+        return {
+            "requests": self.connection_hits + self.connection_misses,
+            "hits": self.connection_hits,
+            "misses": self.connection_misses,
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class SearchPages:
+    """
+    وضعیت صفحه‌بندی یک جستجوی ترب: next_page صفحه بعد را (اگر از قبل prefetch نشده
+    باشد همان موقع) می‌گیرد و prefetch آن را در پس‌زمینه شروع می‌کند. همه متدها باید
+    داخل event loop کلاینت صدا زده شوند.
+    """
+
+    def __init__(self, client, q, max_pages):
+        self.client = client
+        self.q = q
+        self.max_pages = max_pages
+        self.page = 0
+        self.has_next = True
+        self._pending = None
+        self._seen = set()
+
+    def prefetch(self):
+        if self._pending is None and self.has_next:
+            self._pending = asyncio.ensure_future(self.client.search(self.q, self.page))
+
+    @property
+    def pending(self):
+        return self._pending is not None and not self._pending.done()
+
+    async def next_page(self):
+        """محصولات جدید صفحه بعد؛ None وقتی صفحه دیگری نیست"""
+        self.prefetch()
+        if self._pending is None:
+            return None
+        data = await self._pending
+        self._pending = None
+        self.page += 1
+        results = (data or {}).get('results') or []
+        self.has_next = bool(results and data.get('next')) and self.page < self.max_pages
+        if not results:
+            return None
+        products = []
+        for product in results:
+            prk = product.get('prk')
+            if prk:
+                if prk in self._seen:
+                    continue
+                self._seen.add(prk)
+            products.append(product)
+        return products
+
+    def cancel(self):
+        """لغو صفحه‌ای که prefetch شده ولی دیگر لازم نیست"""
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+
+    async def aclose(self):
+        self.cancel()
+
+
+class _LoopThread:
+    """یک event loop در thread پس‌زمینه برای اجرای coroutineها از کد همگام"""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=loop.run_forever,
+                                              name='torob-loop', daemon=True)
+                    thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def run(self, coro):
+        # span جاری thread فراخوان به task داخل loop منتقل می‌شود
+        return asyncio.run_coroutine_threadsafe(bind_coroutine(coro), self._ensure_loop()).result()
+
+
+# loop مشترک پروسه برای نسخه همگام Torob
+background_loop = _LoopThread()
@@ -0,0 +1,322 @@
+# نمودار قیمت محصولات ترب در SQLite محلی: محصولاتی که در جستجو دیده می‌شوند (با prk)
+# در پس‌زمینه همگام می‌شوند، هر همگام‌سازی فقط نقطه‌های جدید را اضافه می‌کند و تا
+# TOROB_CHART_TTL بدون درخواست به ترب از همین ذخیره محلی خوانده می‌شوند.
+import datetime
+import queue
+import sqlite3
+import statistics
+import threading
+import time
+
+import settings
+from log_setup import get_logger
+from price_parser import TOMAN, parse_price
+
+logger = get_logger('torob_chart')
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS torob_chart_points ("
+    " prk TEXT NOT NULL,"
+    " ts INTEGER NOT NULL,"
+    " price INTEGER NOT NULL,"
+    " PRIMARY KEY (prk, ts)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS torob_chart_sync ("
+    " prk TEXT PRIMARY KEY,"
+    " synced_at REAL NOT NULL,"
+    " last_ts INTEGER)",
+)
+
+# کلیدهای محتمل در پاسخ price-chart
+_CONTAINER_KEYS = ('price_chart', 'chart', 'data', 'results', 'points', 'prices')
+_TIME_KEYS = ('date', 'time', 'timestamp', 'ts', 'x', 'day')
+_PRICE_KEYS = ('price', 'min_price', 'y', 'value')
+_PARALLEL_KEYS = (('dates', 'prices'), ('x', 'y'), ('date', 'price'))
+
+
+def _jalali_to_gregorian(jy, jm, jd):
+    """تبدیل تاریخ شمسی به میلادی (الگوریتم محاسباتی استاندارد)"""
+    jy += 1595
+    days = -355668 + 365 * jy + (jy // 33) * 8 + ((jy % 33) + 3) // 4 + jd
+    days += (jm - 1) * 31 if jm < 7 else (jm - 7) * 30 + 186
+    gy = 400 * (days // 146097)
+    days %= 146097
+    if days > 36524:
+        days -= 1
+        gy += 100 * (days // 36524)
+        days %= 36524
+        if days >= 365:
+            days += 1
+    gy += 4 * (days // 1461)
+    days %= 1461
+    if days > 365:
+        gy += (days - 1) // 365
+        days = (days - 1) % 365
+    gd = days + 1
+    month_days = [0, 31, 29 if (gy % 4 == 0 and gy % 100 != 0) or gy % 400 == 0 else 28,
+                  31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    gm = 1
+    while gm <= 12 and gd > month_days[gm]:
+        gd -= month_days[gm]
+        gm += 1
+    return datetime.date(gy, gm, gd)
+
+
+def parse_timestamp(value):
+    """ثانیه unix از عدد (ثانیه یا میلی‌ثانیه)، تاریخ ISO یا تاریخ شمسی 1403/02/11"""
+    if isinstance(value, (int, float)):
+        return int(value / 1000 if value > 1e11 else value)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    text = value.strip()
+    parts = text.replace('-', '/').split('/')
+    try:
+        if len(parts) == 3 and len(parts[0]) == 4 and int(parts[0]) < 1700:
+            day = _jalali_to_gregorian(int(parts[0]), int(parts[1]), int(parts[2][:2]))
+            return int(datetime.datetime(day.year, day.month, day.day).timestamp())
+        return int(datetime.datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp())
+    except ValueError:
+        return None
+
+
+def _first(item, keys):
+    for key in keys:
+        if item.get(key) not in (None, ''):
+            return item[key]
+    return None
+
+
+def parse_chart(data):
+    """
+    نقطه‌های (ts, price) مرتب و یکتا از پاسخ price-chart ترب. قالب‌های پذیرفته شده:
+    لیست نقطه‌ها (dict با تاریخ و قیمت) در ریشه یا زیر یکی از _CONTAINER_KEYS،
+    یا دو آرایه موازی تاریخ و قیمت. قیمت با price_parser به تومان تبدیل می‌شود.
+    """
+    if isinstance(data, dict):
+        for dates_key, prices_key in _PARALLEL_KEYS:
+            if isinstance(data.get(dates_key), list) and isinstance(data.get(prices_key), list):
+                data = [{'date': d, 'price': p} for d, p in zip(data[dates_key], data[prices_key])]
+                break
+        else:
+            for key in _CONTAINER_KEYS:
+                if isinstance(data.get(key), (list, dict)):
+                    return parse_chart(data[key])
+            return []
+    if not isinstance(data, list):
+        return []
+
+    points = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        ts = parse_timestamp(_first(item, _TIME_KEYS))
+        price = parse_price(_first(item, _PRICE_KEYS), TOMAN)
+        if ts is not None and price and price > 1000:
+            points[ts] = int(price)
+    return sorted(points.items())
+
+
+def chart_momentum(points, now=None, recent_days=None, baseline_days=None):
+    """
+    تغییر نسبی میانگین قیمت روزهای اخیر نسبت به دوره پایه قبل از آن
+    (مثلا 0.05 یعنی 5٪ گران‌تر)؛ None اگر یکی از دو بازه نقطه‌ای نداشته باشد.
+    """
+    now = time.time() if now is None else now
+    recent_start = now - (settings.PRICE_MOMENTUM_RECENT_DAYS if recent_days is None else recent_days) * 86400
+    baseline_start = now - (settings.PRICE_MOMENTUM_BASELINE_DAYS if baseline_days is None else baseline_days) * 86400
+    recent = [price for ts, price in points if ts >= recent_start]
+    baseline = [price for ts, price in points if baseline_start <= ts < recent_start]
+    if not recent or not baseline:
+        return None
+    return statistics.fmean(recent) / statistics.fmean(baseline) - 1
+
+
+class PriceChartStore:
+    """نقطه‌های نمودار قیمت هر prk و زمان آخرین همگام‌سازی"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        for statement in _SCHEMA:
+            conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def sync_state(self, prk):
+        """(synced_at, last_ts) یا None"""
+        return self._connect().execute(
+            "SELECT synced_at, last_ts FROM torob_chart_sync WHERE prk = ?", (prk,)).fetchone()
+
+    def merge(self, prk, points, synced_at=None):
+        """
+        افزودن نقطه‌های جدیدتر از آخرین نقطه ذخیره شده (نقطه آخر به‌روز می‌شود چون
+        قیمت روز جاری ممکن است تغییر کند). تعداد نقطه‌های نوشته شده برگردانده می‌شود.
+        """
+        synced_at = time.time() if synced_at is None else synced_at
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            state = conn.execute(
+                "SELECT last_ts FROM torob_chart_sync WHERE prk = ?", (prk,)).fetchone()
+            last_ts = state[0] if state and state[0] is not None else None
+            new_points = [(prk, ts, price) for ts, price in points
+                          if last_ts is None or ts >= last_ts]
+            conn.executemany(
+                "INSERT OR REPLACE INTO torob_chart_points (prk, ts, price) VALUES (?, ?, ?)",
+                new_points)
+            if new_points:
+                last_ts = max(last_ts or 0, new_points[-1][1])
+            conn.execute(
+                "INSERT OR REPLACE INTO torob_chart_sync (prk, synced_at, last_ts) VALUES (?, ?, ?)",
+                (prk, synced_at, last_ts))
+        return len(new_points)
+
+    def points(self, prk, start=None):
+        rows = self._connect().execute(
+            "SELECT ts, price FROM torob_chart_points WHERE prk = ? AND ts >= ? ORDER BY ts",
+            (prk, start or 0))
+        return rows.fetchall()
+
+    def points_many(self, prks, start=None):
+        """{prk: [(ts, price), ...]} در یک پرس‌وجو"""
+        prks = list(dict.fromkeys(prks))
+        if not prks:
+            return {}
+        rows = self._connect().execute(
+            f"SELECT prk, ts, price FROM torob_chart_points"
+            f" WHERE prk IN ({', '.join('?' * len(prks))}) AND ts >= ? ORDER BY prk, ts",
+            prks + [start or 0])
+        series = {}
+        for prk, ts, price in rows:
+            series.setdefault(prk, []).append((ts, price))
+        return series
+
+
+class PriceChartSync:
+    """
+    همگام‌سازی نمودارها با ترب. schedule غیرمسدودکننده است و prkهایی که در TTL
+    همگام شده‌اند یا در صف هستند دوباره درخواست نمی‌شوند.
+    """
+
+    def __init__(self, store, fetch_chart, ttl, workers=2, queue_size=1000):
+        self.store = store
+        self.fetch_chart = fetch_chart
+        self.ttl = ttl
+        self.synced = 0
+        self.new_points = 0
+        self.errors = 0
+        self.dropped = 0
+        self._synced_at = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f'torob-chart-{i}', daemon=True).start()
+
+    def _synced_time(self, prk):
+        synced_at = self._synced_at.get(prk)
+        if synced_at is None:
+            state = self.store.sync_state(prk)
+            synced_at = state[0] if state else 0.0
+            self._synced_at[prk] = synced_at
+        return synced_at
+
+    def is_fresh(self, prk):
+        return time.time() - self._synced_time(prk) < self.ttl
+
+    def schedule(self, prk, search_id=None):
+        prk = str(prk)
+        with self._lock:
+            if prk in self._pending or time.time() - self._synced_at.get(prk, 0.0) < self.ttl:
+                return
+            self._pending.add(prk)
+        try:
+            self._queue.put_nowait((prk, search_id))
+        except queue.Full:
+            self.dropped += 1
+            with self._lock:
+                self._pending.discard(prk)
+
+    def sync(self, prk, search_id=None):
+        """دریافت نمودار و ادغام نقطه‌های جدید؛ تعداد نقطه‌های نوشته شده"""
+        data = self.fetch_chart(prk, search_id)
+        if not data:
+            # پاسخ خالی یا خطا: تا TTL بعدی دوباره درخواست نمی‌شود
+            self.errors += 1
+            self._synced_at[prk] = time.time()
+            return 0
+        written = self.store.merge(prk, parse_chart(data))
+        self._synced_at[prk] = time.time()
+        self.synced += 1
+        self.new_points += written
+        return written
+
+    def _run(self):
+        while True:
+            prk, search_id = self._queue.get()
+            try:
+                # ممکن است worker دیگری (یا پروسه دیگری) همین حالا آن را همگام کرده باشد
+                self._synced_at.pop(prk, None)
+                if not self.is_fresh(prk):
+                    self.sync(prk, search_id)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("⚠️ خطا در همگام‌سازی نمودار ترب %s: %s", prk, e)
+            finally:
+                with self._lock:
+                    self._pending.discard(prk)
+
+    def chart(self, prk, search_id=None, start=None):
+        """نقطه‌های نمودار از ذخیره محلی؛ اگر از TTL گذشته باشد ابتدا همگام می‌شود"""
+        prk = str(prk)
+        if not self.is_fresh(prk):
+            self.sync(prk, search_id)
+        return self.store.points(prk, start)
+
+    def momentum(self, prks, now=None):
+        """
+        میانه momentum محصولات دارای نمودار محلی (بدون درخواست به ترب):
+        {"momentum": ..., "products": n} یا None
+        """
+        now = time.time() if now is None else now
+        start = now - settings.PRICE_MOMENTUM_BASELINE_DAYS * 86400
+        values = [m for m in (chart_momentum(points, now)
+                              for points in self.store.points_many([str(p) for p in prks], start).values())
+                  if m is not None]
+        if not values:
+            return None
+        return {"momentum": statistics.median(values), "products": len(values)}
+
+    def stats(self):
+        return {
+            "path": self.store.path,
+            "synced": self.synced,
+            "new_points": self.new_points,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+        }
+
+
+def _create_default_sync():
+    if not settings.TOROB_CHART_DB:
+        return None
+    from torob_integration.api import Torob
+    try:
+        store = PriceChartStore(settings.TOROB_CHART_DB)
+    except sqlite3.Error as e:
+        logger.warning("⚠️ ذخیره نمودار ترب غیرفعال شد: %s", e)
+        return None
+    return PriceChartSync(store, Torob().price_chart, settings.TOROB_CHART_TTL,
+                          workers=settings.TOROB_CHART_WORKERS)
+
+
+# همگام‌ساز پیش‌فرض پروسه (در صورت غیرفعال بودن None است)
+chart_sync = _create_default_sync()
@@ -0,0 +1,146 @@
+# درخت زمان‌بندی مراحل یک درخواست (فقط وقتی درخواست trace خواسته باشد)
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('price_finder_span', default=None)
+
+
+class Span:
+    """یک مرحله با زمان شروع نسبی، مدت و زیرمرحله‌ها"""
+
+    __slots__ = ('name', 'attrs', 'children', 'started', 'duration', '_origin', '_lock')
+
+    def __init__(self, name, origin=None, attrs=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.children = []
+        self.started = time.perf_counter()
+        self.duration = None
+        self._origin = self.started if origin is None else origin
+        self._lock = threading.Lock()
+
+    def child(self, name, attrs=None):
+        span = Span(name, self._origin, attrs)
+        with self._lock:
+            self.children.append(span)
+        return span
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def to_dict(self):
+        with self._lock:
+            children = sorted(self.children, key=lambda span: span.started)
+        entry = {
+            "name": self.name,
+            "start_ms": round((self.started - self._origin) * 1000, 2),
+            # مرحله‌ای که هنوز تمام نشده (مثلا فروشگاهی که از مهلت گذشت) مدت ندارد
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+        }
+        if self.attrs:
+            entry["attrs"] = self.attrs
+        if children:
+            entry["children"] = [span.to_dict() for span in children]
+        return entry
+
+
+def current_span():
+    return _current.get()
+
+
+@contextmanager
+def trace(name, **attrs):
+    """شروع درخت جدید برای درخواست جاری؛ ریشه برگردانده می‌شود"""
+    root = Span(name, attrs=attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    finally:
+        root.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    زیرمرحله زیر span جاری. وقتی trace فعال نیست None برمی‌گرداند و هزینه‌ای
+    جز یک ContextVar.get ندارد.
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, attrs)
+    token = _current.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current.reset(token)
+
+
+def traced(name):
+    """دکوراتور: اجرای تابع (همگام یا async) در یک span"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attrs):
+    """افزودن ویژگی به span جاری (در صورت وجود)"""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+# contextvarهای دیگری که همراه span به threadها و loop پس‌زمینه منتقل می‌شوند
+# (مثل مهلت rate limit)؛ با carry ثبت می‌شوند
+_carried = [_current]
+
+
+def carry(var):
+    """ثبت یک ContextVar (با پیش‌فرض None) برای انتقال با bind و bind_coroutine"""
+    if var not in _carried:
+        _carried.append(var)
+
+
+def _has_context():
+    return any(var.get() is not None for var in _carried)
+
+
+def bind(func):
+    """
+    اجرای func در thread دیگر (ThreadPoolExecutor) با همان span جاری؛
+    executorها context را خودکار منتقل نمی‌کنند.
+    """
+    if not _has_context():
+        return func
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def bind_coroutine(coro):
+    """انتقال span جاری (و contextvarهای carry شده) به coroutineی که در event loop thread دیگر اجرا می‌شود"""
+    if not _has_context():
+        return coro
+    values = [(var, var.get()) for var in _carried]
+
+    async def runner():
+        for var, value in values:
+            var.set(value)
+        return await coro
+    return runner()
@@ -0,0 +1,260 @@
+# پیشنهاد تکمیل خودکار (typeahead) برای /suggest: یک index پیشوندی در حافظه (آرایه
+# مرتب از عبارت‌های نرمال‌شده با bisect) که از پاسخ‌های Torob.suggestion و عبارت‌های
+# جستجو شده در /search (و تاریخچه قیمت هنگام شروع) پر می‌شود. فقط وقتی index برای
+# پیشوندی جواب کافی ندارد و آن پیشوند اخیرا از upstream پرسیده نشده، با single-flight
+# و تا سقف بودجه مشخص به ترب درخواست داده می‌شود.
+import bisect
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+import rate_limit
+import settings
+from log_setup import get_logger
+from prewarm import TokenBucket
+from query_utils import normalize_query
+from singleflight import flights
+
+logger = get_logger('typeahead')
+
+# بزرگ‌ترین کاراکتر unicode برای پیدا کردن انتهای بازه یک پیشوند در آرایه مرتب
+_MAX_CHAR = '\U0010ffff'
+
+# امتیاز پیشنهادهای ترب؛ هر جستجوی کاربر UPSTREAM_SCORE / history_min_seen امتیاز دارد تا
+# عبارت جستجو شده (مثلا با غلط تایپی) فقط بعد از چند بار تکرار هم‌وزن پیشنهاد ترب شود
+UPSTREAM_SCORE = 0.5
+
+
+def parse_suggestions(data):
+    """متن پیشنهادها از پاسخ suggestion ترب (لیست یا {results: [...]}، رشته یا dict)"""
+    if isinstance(data, dict):
+        data = data.get('results') or data.get('suggestions') or data.get('data') or []
+    if not isinstance(data, list):
+        return []
+    texts = []
+    for item in data:
+        if isinstance(item, dict):
+            item = item.get('text') or item.get('title') or item.get('name') or item.get('q')
+        if isinstance(item, str) and item.strip():
+            texts.append(item.strip())
+    return texts
+
+
+class PrefixIndex:
+    """
+    عبارت‌های نرمال‌شده در یک لیست مرتب؛ پیشنهادهای یک پیشوند بازه پیوسته‌ای از آن
+    هستند که با دو bisect پیدا و به ترتیب امتیاز مرتب می‌شوند.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._keys = []
+        # عبارت نرمال‌شده → [امتیاز، متن نمایشی]
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def add(self, text, score=1.0, increment=False):
+        """افزودن عبارت؛ با increment امتیاز جمع می‌شود و در غیر این صورت بیشینه می‌ماند"""
+        key = normalize_query(text)
+        if not key:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [score, text.strip()]
+                bisect.insort(self._keys, key)
+                if len(self._keys) > self.max_entries:
+                    self._prune()
+            elif increment:
+                entry[0] += score
+                entry[1] = text.strip()
+            elif score > entry[0]:
+                entry[0] = score
+
+    def _prune(self):
+        """نگه داشتن 90٪ عبارت‌ها با بیشترین امتیاز"""
+        keep = heapq.nlargest(int(self.max_entries * 0.9), self._entries.items(),
+                              key=lambda item: item[1][0])
+        self._entries = dict(keep)
+        self._keys = sorted(self._entries)
+
+    def lookup(self, prefix, limit):
+        """حداکثر limit متن با پیشوند داده شده (نرمال‌شده) به ترتیب امتیاز"""
+        with self._lock:
+            lo = bisect.bisect_left(self._keys, prefix)
+            hi = bisect.bisect_left(self._keys, prefix + _MAX_CHAR, lo)
+            entries = self._entries
+            best = heapq.nlargest(limit, self._keys[lo:hi], key=lambda key: entries[key][0])
+            return [entries[key][1] for key in best]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class Typeahead:
+    """
+    پاسخ /suggest از index؛ پیشوندی که کمتر از limit پیشنهاد دارد و در miss_ttl اخیر
+    از upstream پرسیده نشده (یا پیشوند کوتاه‌تر آن بدون نتیجه برنگشته) miss است.
+    درخواست‌های upstream برای یک پیشوند ادغام می‌شوند و از بودجه (هر شیء با try_acquire،
+    پیش‌فرض TokenBucket همین پروسه) کم می‌کنند؛ بعد از اتمام بودجه فقط از index پاسخ
+    داده می‌شود.
+    عبارت‌های جستجو شده به تعداد دفعات جستجو امتیاز می‌گیرند و بعد از history_min_seen
+    جستجو هم‌وزن یک پیشنهاد ترب می‌شوند.
+    """
+
+    def __init__(self, index, limit=8, min_chars=2, miss_ttl=3600, budget_per_minute=30,
+                 burst=5, max_fetched=10000, budget=None, history_min_seen=3):
+        self.index = index
+        self.search_score = UPSTREAM_SCORE / max(1, history_min_seen)
+        self.limit = limit
+        self.min_chars = min_chars
+        self.miss_ttl = miss_ttl
+        self.max_fetched = max_fetched
+        if budget is None:
+            budget = TokenBucket(budget_per_minute / 60, burst)
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self.upstream = 0
+        self.throttled = 0
+        # پیشوند → (زمان درخواست upstream، تعداد پیشنهاد دریافتی)
+        self._fetched = OrderedDict()
+        self._lock = threading.Lock()
+
+    def note_search(self, query):
+        """ثبت یک جستجوی کاربر در index"""
+        self.index.add(query, self.search_score, increment=True)
+
+    def _covered(self, prefix, now):
+        """آیا این پیشوند (یا پیشوند کوتاه‌تری که پیشنهادی نداشت) اخیرا پرسیده شده؟"""
+        with self._lock:
+            for end in range(len(prefix), self.min_chars - 1, -1):
+                fetched = self._fetched.get(prefix[:end])
+                if fetched and now - fetched[0] < self.miss_ttl and (end == len(prefix) or not fetched[1]):
+                    return True
+        return False
+
+    def _remember(self, prefix, count):
+        with self._lock:
+            self._fetched[prefix] = (time.time(), count)
+            self._fetched.move_to_end(prefix)
+            while len(self._fetched) > self.max_fetched:
+                self._fetched.popitem(last=False)
+
+    def _lookup(self, query):
+        """(پیشوند، پیشنهادهای index، آیا upstream لازم است)"""
+        prefix = normalize_query(query)
+        if len(prefix) < self.min_chars:
+            return prefix, [], False
+        suggestions = self.index.lookup(prefix, self.limit)
+        if len(suggestions) >= self.limit or self._covered(prefix, time.time()):
+            self.hits += 1
+            return prefix, suggestions, False
+        self.misses += 1
+        return prefix, suggestions, True
+
+    def _store(self, prefix, data):
+        texts = parse_suggestions(data)
+        for text in texts:
+            self.index.add(text, UPSTREAM_SCORE)
+        self._remember(prefix, len(texts))
+        return len(texts)
+
+    def _response(self, query, suggestions, source, started):
+        return {
+            "query": query,
+            "suggestions": suggestions,
+            "source": source,
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def suggest(self, query, fetch):
+        """پیشنهادهای query؛ fetch(prefix) پاسخ suggestion ترب را برمی‌گرداند"""
+        started = time.perf_counter()
+        prefix, suggestions, miss = self._lookup(query)
+        if not miss:
+            return self._response(query, suggestions, "index", started)
+
+        def fetch_once():
+            if not self.budget.try_acquire():
+                return None
+            self.upstream += 1
+            try:
+                return self._store(prefix, fetch(prefix))
+            except Exception as e:
+                logger.warning("⚠️ خطا در دریافت پیشنهاد ترب: %s", e)
+                return self._store(prefix, None)
+
+        return self._after_fetch(query, prefix, suggestions,
+                                 flights.do(('suggest', prefix), fetch_once), started)
+
+    async def suggest_async(self, query, fetch):
+        """نسخه asyncio از suggest؛ fetch(prefix) یک coroutine برمی‌گرداند"""
+        started = time.perf_counter()
+        prefix, suggestions, miss = self._lookup(query)
+        if not miss:
+            return self._response(query, suggestions, "index", started)
+
+        async def fetch_once():
+            if not self.budget.try_acquire():
+                return None
+            self.upstream += 1
+            try:
+                return self._store(prefix, await fetch(prefix))
+            except Exception as e:
+                logger.warning("⚠️ خطا در دریافت پیشنهاد ترب: %s", e)
+                return self._store(prefix, None)
+
+        return self._after_fetch(query, prefix, suggestions,
+                                 await flights.do_async(('suggest', prefix), fetch_once), started)
+
+    def _after_fetch(self, query, prefix, suggestions, fetched, started):
+        if fetched is None:
+            # بودجه upstream تمام شده؛ همان پاسخ index
+            self.throttled += 1
+            return self._response(query, suggestions, "index", started)
+        return self._response(query, self.index.lookup(prefix, self.limit), "upstream", started)
+
+    def seed(self, queries):
+        """پر کردن index از [(عبارت، تعداد جستجو)] مثلا عبارت‌های پرتکرار تاریخچه قیمت"""
+        for query, searches in queries:
+            self.index.add(query, searches * self.search_score, increment=True)
+
+    def stats(self):
+        return {
+            "entries": len(self.index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "upstream": self.upstream,
+            "throttled": self.throttled,
+            "fetched_prefixes": len(self._fetched),
+        }
+
+
+def _seed_from_history(typeahead, history, limit):
+    try:
+        typeahead.seed(history.top_queries(limit))
+    except Exception as e:
+        logger.warning("⚠️ خواندن عبارت‌های تاریخچه برای typeahead ممکن نشد: %s", e)
+
+
+def create_typeahead(history=None):
+    """typeahead پیش‌فرض پروسه طبق settings؛ None اگر غیرفعال باشد"""
+    if not settings.SUGGEST_ENABLED:
+        return None
+    typeahead = Typeahead(
+        PrefixIndex(settings.SUGGEST_MAX_ENTRIES),
+        limit=settings.SUGGEST_LIMIT,
+        min_chars=settings.SUGGEST_MIN_CHARS,
+        miss_ttl=settings.SUGGEST_MISS_TTL,
+        history_min_seen=settings.SUGGEST_HISTORY_MIN_SEEN,
+        # بودجه در bucket مشترک rate_limit، برای کل سرویس نه هر worker
+        budget=rate_limit.get_bucket('suggest', settings.SUGGEST_UPSTREAM_BUDGET / 60,
+                                     settings.SUGGEST_UPSTREAM_BURST),
+    )
+    if history is not None and settings.SUGGEST_SEED_QUERIES:
+        # خواندن تاریخچه ممکن است روی فایل بزرگ طول بکشد؛ شروع اپ منتظر نمی‌ماند
+        threading.Thread(target=_seed_from_history, name='typeahead-seed', daemon=True,
+                         args=(typeahead, history, settings.SUGGEST_SEED_QUERIES)).start()
+    return typeahead